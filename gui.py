@@ -1,5 +1,10 @@
+# 启动耗时分析需要最先导入
+from sakura.startup import profiler
+
 import sys
+from multiprocessing import freeze_support
 
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication
 from qfluentwidgets import FluentIcon as FIF, setTheme, Theme
@@ -7,9 +12,9 @@ from qfluentwidgets import NavigationItemPosition, FluentWindow
 
 import resources.resources_rc  # noqa
 from sakura import children_windows
+from sakura.config import conf, config_service
 from sakura.components.ui.Home import Home
-from sakura.components.ui.PlayerUi import PlayerUi
-from sakura.components.ui.Settings import SettingsUi
+from sakura.components.ui.LazyPage import LazyPage
 
 
 class Window(FluentWindow):
@@ -21,9 +26,11 @@ class Window(FluentWindow):
         # 初始化主页面
         self.init_window()
         # 创建子界面，实际使用时将 Widget 换成自己的子界面
-        self.homeInterface = Home(self)
-        self.playerInterface = PlayerUi(self)
-        self.settingInterface = SettingsUi(self)
+        with profiler.step('create Home page'):
+            self.homeInterface = Home(self)
+        # 其余页面在第一次打开时才创建
+        self.playerInterface = LazyPage('Player', 'sakura.components.ui.PlayerUi', 'PlayerUi', self)
+        self.settingInterface = LazyPage('Settings', 'sakura.components.ui.Settings', 'SettingsUi', self)
         self.init_navigation()
 
     def init_navigation(self):
@@ -41,18 +48,36 @@ class Window(FluentWindow):
 
     def closeEvent(self, event):
         super().closeEvent(event)
+        config_service.close()
         for item in children_windows:
             item.close()
 
 
 if __name__ == '__main__':
+    # 乐谱导入使用进程池，打包后需要
+    freeze_support()
     setTheme(Theme.AUTO)
     app = QApplication(sys.argv)
     screen = app.primaryScreen()
     screen_rect = screen.availableGeometry()
-    w = Window()
+    with profiler.step('create main window'):
+        w = Window()
     x = (screen_rect.width() - w.width()) // 2
     y = (screen_rect.height() - w.height()) // 2
     w.move(x, y)
     w.show()
+    # config.yaml 被修改后立即生效
+    config_service.start_watching()
+    if conf.metrics.enabled:
+        from sakura.metrics import start_server
+        start_server(conf.metrics.host, conf.metrics.port)
+    if conf.api.enabled:
+        # 控制接口需要播放器页面，提前创建
+        from sakura.api import start_control_server
+        from sakura.components.ui.PlayBarController import PlayBarController
+        w.playerInterface.ensure_page()
+        start_control_server(PlayBarController(w.playerInterface.page.play), conf.api.host, conf.api.port,
+                             conf.api.push_interval)
+    # 窗口显示后的第一次事件循环中输出
+    QTimer.singleShot(0, profiler.report)
     app.exec()
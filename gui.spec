@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('sakura','sakura')],
-    hiddenimports=['pygame', 'pydirectinput', 'pynput', 'requests'],
+    hiddenimports=['pygame', 'pydirectinput', 'pynput', 'requests', 'sakura.components.ui.PlayerUi',
+                   'sakura.components.ui.Settings'],
     hookspath=['./hooks'],
     hooksconfig={},
     runtime_hooks=[],
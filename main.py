@@ -1,55 +1,364 @@
-import time
+# 启动耗时分析需要最先导入
+from sakura.startup import PROFILE_FLAG, profiler
 
-from pynput import keyboard
+import argparse
+import os
+import time
+from multiprocessing import freeze_support
+from typing import Iterator, TYPE_CHECKING
 
-from sakura.components.TimeManager import TimeManager
+from sakura.components.PlaybackClock import PlaybackClock
 from sakura.components.mapper.JsonMapper import JsonMapper
 from sakura.components.player.SakuraPlayer import SakuraPlayer
-from sakura.config import conf
-from sakura.db.JsonPick import load_json, get_file_list
+from sakura.config import conf, save_conf
 from sakura.factory.PlayerFactory import get_player
-from sakura.listener import register_listener
+from sakura.interface.Player import Player
+
+if TYPE_CHECKING:
+    from sakura.db.SheetParser import SongRow
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Sky auto player')
+    parser.add_argument('--pack', help='choose the song from a song pack instead of the sheet folder')
+    parser.add_argument('--song', help='number or name of the song to play, skips the interactive prompt')
+    parser.add_argument('--backend', help='player backend to use instead of player.type')
+    parser.add_argument('--start', type=float, default=0, help='start offset in seconds')
+    parser.add_argument('--rate', type=float, default=1.0, help='playback rate, 1 is the original speed')
+    parser.add_argument('--no-hotkeys', action='store_true', help='do not install the global F4 pause/resume hotkey')
+    parser.add_argument('--trace', help='record every dispatched press to this file')
+    parser.add_argument(PROFILE_FLAG, action='store_true', help='print import and startup step timings')
+    subparsers = parser.add_subparsers(dest='command')
+    build = subparsers.add_parser('build-pack', help='build a song pack')
+    build.add_argument('output', help='path of the song pack to write')
+    build.add_argument('source', nargs='?',
+                       help='sheet folder to pack, the song library database is packed when omitted')
+    analyze = subparsers.add_parser('analyze', help='list the songs a backend can least keep up with')
+    analyze.add_argument('--backend', help='backend to compare against, defaults to player.type')
+    analyze.add_argument('--limit', type=int, default=20, help='number of songs to list')
+    measure = subparsers.add_parser('measure-backend',
+                                    help='measure the capability of player.type and save it (sends real key presses)')
+    measure.add_argument('--presses', type=int, default=30, help='number of presses for the throughput test')
+    subparsers.add_parser('measure-devices', help='measure the clock offset and latency of each device in adb.devices')
+    simulate = subparsers.add_parser('simulate-sessions',
+                                     help='play the chosen song in many sessions on one scheduler thread '
+                                          'without sending presses')
+    simulate.add_argument('--sessions', type=int, default=200, help='number of concurrent sessions')
+    simulate.add_argument('--seconds', type=float, default=10, help='how long to run')
+    simulate.add_argument('--press-workers', type=int, default=4, help='threads shared by all sessions for presses')
+    simulate.add_argument('--spin-us', type=int, default=1000, help='busy-wait this long before each deadline')
+    replay = subparsers.add_parser('replay-trace', help='play the presses of a trace with their original timing')
+    replay.add_argument('trace', help='trace file to replay')
+    replay.add_argument('--backend', help='player backend to use instead of player.type')
+    replay.add_argument('--record', help='also record the replayed presses to this file')
+    diff = subparsers.add_parser('diff-trace', help='compare the chords of two traces')
+    diff.add_argument('a', help='reference trace')
+    diff.add_argument('b', help='trace to compare')
+    diff.add_argument('--limit', type=int, default=20, help='number of chords with the largest deltas to list')
+    return parser.parse_args()
 
-paused = True
 
-def listener() -> None:
-    global paused
-    paused = not paused
+def select_index(names: list[str], query: str | None) -> int | None:
+    """按编号或名称选择歌曲，query 为空时列出所有歌曲并提示输入"""
+    if query is None:
+        for index, name in enumerate(names, 1):
+            print(f"{index}. {name}")
+        query = input('Enter the number to select a song: ')
+        if not query.strip().isdigit():
+            print("Invalid input. Program terminated.")
+            return None
+    query = query.strip()
+    if query.isdigit():
+        if not 1 <= int(query) <= len(names):
+            print(f"Invalid song number {query}, there are {len(names)} song(s).")
+            return None
+        return int(query) - 1
+    folded = query.casefold()
+    exact = [i for i, name in enumerate(names)
+             if folded in (name.casefold(), os.path.splitext(name)[0].casefold())]
+    matches = exact or [i for i, name in enumerate(names) if folded in name.casefold()]
+    if len(matches) == 1:
+        return matches[0]
+    if not matches:
+        print(f"No song matches {query!r}.")
+    else:
+        print(f"{len(matches)} songs match {query!r}:")
+        for i in matches[:20]:
+            print(f"{i + 1}. {names[i]}")
+    return None
 
 
-def main() -> None:
+def load_song_notes(pack_path: str | None, query: str | None) -> tuple[str, list] | None:
+    """Returns: (歌曲名, 音符列表)，未选择歌曲时为 None"""
+    if pack_path:
+        from sakura.db.SongPack import SongPack
+        with SongPack(pack_path) as pack:
+            songs = pack.select_by_name('', -1)
+            index = select_index([song.name for song in songs], query)
+            return None if index is None else (songs[index].name, pack.select_by_id(songs[index].id).songNotes)
+    from sakura.db.JsonPick import load_json, get_file_list
     file_path = conf.file_path
     file_list = get_file_list(file_path)
-    for index, file in enumerate(file_list, 1):
-        print(f"{index}. {file}")
+    index = select_index(file_list, query)
+    if index is None:
+        return None
+    path = f'{file_path}/{file_list[index]}'
+    from sakura.db.SheetParser import MIDI_EXTENSIONS
+    if os.path.splitext(path)[1].lower() in MIDI_EXTENSIONS:
+        # MIDI 文件按 config.yaml 中的 midi 选项转换，与导入乐谱库时相同
+        from sakura.db.MidiParser import MidiOptions
+        from sakura.db.NoteCodec import decode_notes, to_song_notes
+        from sakura.db.SheetParser import parse_midi_sheet
+        with open(path, 'rb') as f:
+            row = parse_midi_sheet(f.read(), path, MidiOptions(**conf.midi.model_dump()))
+        return row.name, to_song_notes(*decode_notes(row.notes))
+    json_list = load_json(path)
+    return json_list[0].get('name') or file_list[index], json_list[0]['songNotes']
+
+
+def sheet_rows(directory: str) -> Iterator['SongRow']:
+    """并行解析目录下的所有乐谱文件，解析失败的文件会被跳过"""
+    from sakura.db.BulkImporter import ImportTask, parse_files
+    from sakura.db.LibraryIndexer import scan_sheet_files
+    from sakura.db.MidiParser import MidiOptions
+    tasks = [ImportTask(path, mtime, size) for path, (mtime, size) in scan_sheet_files(directory).items()]
+    for parsed in parse_files(tasks, midi_options=MidiOptions(**conf.midi.model_dump())):
+        if parsed.error is not None:
+            print(f"Skipped {parsed.path}: {parsed.error}")
+        else:
+            yield parsed.row
+
+
+def build_pack_command(output: str, source: str | None) -> None:
+    from sakura.db.SongPack import build_pack
+    start = time.perf_counter()
+    if source is None:
+        from sakura.db.DBManager import song_client
+        rows = song_client.iter_song_rows()
+    else:
+        rows = sheet_rows(source)
+    count = build_pack(output, rows)
+    print(f"{count} song(s) written to {output} in {time.perf_counter() - start:.2f}s")
+
+
+def analyze_command(backend: str, limit: int) -> None:
+    from sakura.db.DBManager import song_client
+    from sakura.db.PlayabilityAnalyzer import PlayabilityAnalyzer
+    capability = conf.capabilities.get(backend)
+    if capability is None:
+        print(f"No capability profile for backend {backend}")
+        return
+    analyzed = PlayabilityAnalyzer(song_client).run()
+    print(f"{analyzed} song(s) analyzed, least playable with {backend} "
+          f"({capability.max_nps} nps, {capability.min_gap}ms gap, {capability.max_chord}-key chords):")
+    for song, score in song_client.select_by_feasibility(capability, limit):
+        gap = '-' if song.minChordGap is None else f'{song.minChordGap}ms'
+        print(f"{score:5.0%}  {song.peakNps:5.1f} nps  gap {gap:>6}  chord {song.maxChord:2d}  {song.name}")
+
+
+def measure_backend_command(presses: int) -> None:
+    from sakura.components.player.CapabilityProbe import measure_capability
+    player = get_player(conf.player.type, conf)
+    key = JsonMapper().get_key_mapping()['1Key0']
+    print(f"Measuring {conf.player.type}, switch to the game window if needed...")
+    time.sleep(3)
+    capability = measure_capability(player, key, presses)
+    conf.capabilities[conf.player.type] = capability
+    save_conf(conf)
+    print(f"{conf.player.type}: {capability.max_nps} nps, {capability.min_gap}ms gap, "
+          f"{capability.max_chord}-key chords (saved to config.yaml)")
+
+
+def measure_devices_command() -> None:
+    from sakura.components.player.AndroidFleet import adb_command, calibrate_devices
+    shells, timings = calibrate_devices(adb_command(conf.adb.path), conf.adb.devices, conf.adb.calibration_samples)
+    for shell in shells:
+        shell.close()
+    if not timings:
+        print("No device in adb.devices could be reached")
+        return
+    max_latency = max(timing.latency_ns for timing in timings)
+    print(f"{'serial':<24}{'offset':>12}{'rtt':>10}{'input':>10}{'delay':>10}")
+    for timing in timings:
+        print(f"{timing.serial:<24}{timing.offset_ns / 1e6:10.1f}ms{timing.rtt_ns / 1e6:8.1f}ms"
+              f"{timing.input_ns / 1e6:8.1f}ms{(max_latency - timing.latency_ns) / 1e6:8.1f}ms")
+    unreachable = len(conf.adb.devices) - len(timings)
+    if unreachable:
+        print(f"{unreachable} device(s) could not be reached")
+
+
+class CountingPlayer(Player):
+    """不发送按键，只统计次数，用于模拟大量会话"""
+
+    def __init__(self, conf=None):
+        super().__init__(conf)
+        self.presses = 0
+
+    def press(self, key, conf):
+        self.presses += 1
+
+    def cleanup(self):
+        pass
+
+
+def simulate_sessions_command(args: argparse.Namespace) -> None:
+    import threading
+    from sakura.components.player.SessionScheduler import SessionScheduler, Timeline
+    from sakura.db.NoteCodec import KEY_COUNT, normalize_notes
+    from sakura.metrics import chords_scheduled, late_notes, scheduler_lateness
+    song = load_song_notes(args.pack, args.song)
+    if song is None:
+        return
+    name, song_notes = song
+    timeline = Timeline(*normalize_notes(song_notes), [f'1Key{i}' for i in range(KEY_COUNT)])
+    if not len(timeline):
+        print(f"{name} has no notes")
+        return
+    threads_before = threading.active_count()
+    scheduler = SessionScheduler(args.press_workers, args.spin_us)
+    players = [CountingPlayer() for _ in range(args.sessions)]
+    sessions = [scheduler.create_session(timeline, player, rate=0.75 + (i % 4) * 0.25)
+                for i, player in enumerate(players)]
+    chords_before = chords_scheduled.value()
+    late_before = late_notes.value()
+    _, count_before, sum_before = scheduler_lateness.snapshot()
+    cpu_before = time.process_time()
+    # 各会话从乐谱的不同位置开始，和弦的到期时间均匀分布，播放完后从头再来
+    for i, session in enumerate(sessions):
+        session.callback = session.play
+        session.play(timeline.duration * i // args.sessions)
+    print(f"Simulating {args.sessions} session(s) of {name} for {args.seconds:g}s...")
+    time.sleep(args.seconds)
+    threads_during = threading.active_count()
+    for session in sessions:
+        session.close()
+    scheduler.close()
+    chords = chords_scheduled.value() - chords_before
+    _, count, total = scheduler_lateness.snapshot()
+    mean = (total - sum_before) / max(1, count - count_before) * 1000
+    print(f"{chords:.0f} chords ({sum(p.presses for p in players)} presses), {chords / args.seconds:.0f} chords/s, "
+          f"mean lateness {mean:.2f}ms, {late_notes.value() - late_before:.0f} late notes")
+    print(f"threads: {threads_before} before, {threads_during} while playing; "
+          f"CPU time {time.process_time() - cpu_before:.2f}s")
+
+
+def replay_trace_command(path: str, backend: str, record: str | None) -> None:
+    from sakura.components.player.PressTrace import PressTraceWriter, read_trace, replay
+    from sakura.db.NoteCodec import KEY_COUNT
+    records = read_trace(path)
+    if not len(records):
+        print(f"{path} contains no presses")
+        return
+    mapping = JsonMapper().get_key_mapping()
+    key_names = [mapping[f'1Key{i}'] for i in range(KEY_COUNT)]
+    player = get_player(backend, conf)
+    writer = PressTraceWriter(record) if record else None
+    duration = (int(records['ns'][-1]) - int(records['ns'][0])) / 1e9
+    print(f"Replaying {len(records)} presses ({duration:.1f}s) with {backend}, press Ctrl+C to stop")
     try:
-        select_index = int(input('Enter the number to select a song: '))
-        if not 1 <= select_index <= len(file_list):
-            raise ValueError("Invalid input")
-    except ValueError:
-        print("Invalid input. Program terminated.")
+        replay(records, player, key_names, writer=writer)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+        if hasattr(player, 'cleanup'):
+            player.cleanup()
+
+
+def diff_trace_command(a: str, b: str, limit: int) -> None:
+    from sakura.components.player.PressTrace import diff_traces, read_trace
+    chords = diff_traces(read_trace(a), read_trace(b))
+    matched = [c for c in chords if c.delta is not None]
+    missing = len(chords) - len(matched)
+    different_keys = [c for c in matched if c.keys_a != c.keys_b]
+    deltas = sorted(matched, key=lambda c: abs(c.delta), reverse=True)
+    print(f"{len(chords)} chord(s), {missing} only in one trace, {len(different_keys)} with different keys")
+    if matched:
+        worst = abs(deltas[0].delta)
+        mean = sum(abs(c.delta) for c in matched) / len(matched)
+        print(f"timing delta: mean {mean:.2f}ms, max {worst:.2f}ms")
+    if not missing and not different_keys:
+        print("Both traces press the same keys in the same order")
+    for c in different_keys[:limit]:
+        print(f"#{c.index:<6} {c.time_a:10.1f}ms  keys {list(c.keys_a)} -> {list(c.keys_b)}")
+    for c in deltas[:limit]:
+        print(f"#{c.index:<6} {c.time_a:10.1f}ms  {c.delta:+8.2f}ms  keys {list(c.keys_a)}")
+
+
+def register_hotkeys(player: SakuraPlayer) -> None:
+    # pynput 需要图形环境，只在使用快捷键时导入
+    from pynput import keyboard
+    from sakura.listener import register_listener
+
+    def toggle() -> None:
+        if player.is_playing:
+            player.pause()
+        else:
+            player.continue_play()
+
+    register_listener(keyboard.Key.f4, toggle, 'Pause/Resume')
+
+
+def main(args: argparse.Namespace) -> None:
+    song = load_song_notes(args.pack, args.song)
+    if song is None:
         return
-    
-    file_name = file_list[select_index - 1]
-    json_list = load_json(f'{file_path}/{file_name}')
-    song_notes = json_list[0]['songNotes']
-    register_listener(keyboard.Key.f4, listener, 'Pause/Resume')
-    
-    player = SakuraPlayer(song_notes, time_manager)
-    player.play(p, km)
-    time.sleep(2)
+    name, song_notes = song
+    backend = args.backend or conf.player.type
+    mapping_dict = {
+        "json": JsonMapper()
+    }
+    with profiler.step('load key mapping'):
+        km = mapping_dict[conf.mapping.type].get_key_mapping()
+    with profiler.step('create player'):
+        p = get_player(backend, conf)
+    clock = PlaybackClock()
+    clock.set_rate(args.rate)
+    capability = conf.capabilities.get(backend) if conf.player.reduce_density else None
+    player = SakuraPlayer(song_notes, clock, capability=capability)
+    player.last_time = max((note['time'] for note in song_notes), default=0)
+    if args.trace:
+        from sakura.components.player.PressTrace import PressTraceWriter
+        player.trace = PressTraceWriter(args.trace)
+    if not args.no_hotkeys:
+        register_hotkeys(player)
+    if conf.metrics.enabled:
+        from sakura.metrics import start_server
+        start_server(conf.metrics.host, conf.metrics.port)
+    profiler.report()
+    print(f"Playing {name} with {backend} from {args.start:g}s at {args.rate:g}x"
+          + ('' if args.no_hotkeys else ', press F4 to pause or resume'))
+    player.play(p, km, args.start)
+    try:
+        while not player.is_finished:
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        player.stop()
+    finally:
+        player.cleanup(force=True)
 
 
 if __name__ == '__main__':
+    # 打包时使用进程池解析乐谱
+    freeze_support()
+    args = parse_args()
     try:
-        mapping_dict = {
-            "json": JsonMapper()
-        }
-        mapping_type = conf.mapping.type
-        km = mapping_dict[mapping_type].get_key_mapping()
-        player_type = conf.player.type
-        p = get_player(player_type, conf)
-        time_manager = TimeManager()
-        main()
+        if args.command == 'build-pack':
+            build_pack_command(args.output, args.source)
+        elif args.command == 'analyze':
+            analyze_command(args.backend or conf.player.type, args.limit)
+        elif args.command == 'measure-backend':
+            measure_backend_command(args.presses)
+        elif args.command == 'measure-devices':
+            measure_devices_command()
+        elif args.command == 'simulate-sessions':
+            simulate_sessions_command(args)
+        elif args.command == 'replay-trace':
+            replay_trace_command(args.trace, args.backend or conf.player.type, args.record)
+        elif args.command == 'diff-trace':
+            diff_trace_command(args.a, args.b, args.limit)
+        else:
+            main(args)
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -1,4 +1,7 @@
-from PySide6.QtWidgets import QWidget
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PySide6.QtWidgets import QWidget
 
 # 声明一个子窗口集合，方便管理
-children_windows: list[QWidget] = []
\ No newline at end of file
+children_windows: list['QWidget'] = []
\ No newline at end of file
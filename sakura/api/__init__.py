@@ -0,0 +1,343 @@
+"""
+本机控制接口
+
+在单独线程的 asyncio 事件循环中提供 HTTP 和 WebSocket 接口，只依赖标准库：
+
+    GET|POST /state                  当前播放状态
+    POST     /play?id=1              播放歌曲，省略 id 时继续播放
+    POST     /pause
+    POST     /seek?ms=30000
+    POST     /rate?rate=1.5
+    GET|POST /queue                  播放队列
+    POST     /enqueue?id=1
+    POST     /clear_queue
+    GET|POST /search?q=abc&limit=20
+    GET      /ws                     WebSocket
+
+参数可以放在查询字符串中，也可以以 JSON 放在请求体中。WebSocket 连接后每隔 push_interval 秒推送变化后的
+{"type": "state", ...}，客户端可以发送 {"action": "seek", "ms": 30000}，结果以 {"type": "result", ...} 返回。
+操作都在线程池中调用 PlaybackController，事件循环不会被播放器阻塞，也不会占用播放线程。
+
+浏览器中的任意网页都能访问本机端口：改变播放状态的操作只接受 POST，响应不带 CORS 头，
+Host 或 Origin（如有）不是本机时返回 403，网页无法借此向游戏发送按键。
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+from typing import Any, Callable
+from urllib.parse import parse_qsl, urlsplit
+
+from sakura.config.sakura_logging import get_logger
+from sakura.interface.PlaybackController import PlaybackController
+
+logger = get_logger(__name__)
+
+_WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# 请求体和 WebSocket 消息的最大字节数
+_MAX_BODY = 64 * 1024
+# WebSocket 客户端未读取的推送超过此字节数时断开，避免停止读取的客户端占用越来越多的内存
+_MAX_WRITE_BUFFER = 1024 * 1024
+# 只接受 POST 的操作
+_MUTATING = {'play', 'pause', 'seek', 'rate', 'enqueue', 'clear_queue'}
+_LOOPBACK = {'localhost', '127.0.0.1', '::1'}
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _int(params: dict, name: str, required: bool = True) -> int | None:
+    value = params.get(name)
+    if value is None:
+        if required:
+            raise ApiError(400, f"Missing parameter {name}")
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Invalid integer {name}: {value!r}")
+
+
+def _float(params: dict, name: str) -> float:
+    try:
+        return float(params[name])
+    except KeyError:
+        raise ApiError(400, f"Missing parameter {name}")
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Invalid number {name}: {params[name]!r}")
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    """服务端发送的 WebSocket 帧，不加掩码"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """读取一个客户端帧，不支持分片消息"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    if length > _MAX_BODY:
+        raise ApiError(413, 'WebSocket message too large')
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class ControlServer:
+    """
+    控制接口服务器
+
+    start 后在后台线程中运行，stop 可以在任意线程中调用。
+    """
+
+    def __init__(self, controller: PlaybackController, host: str = '127.0.0.1', port: int = 9465,
+                 push_interval: float = 0.1):
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.push_interval = push_interval
+        self._actions: dict[str, Callable[[dict], Any]] = {
+            'state': lambda p: controller.state(),
+            'play': lambda p: controller.play(_int(p, 'id', required=False)),
+            'pause': lambda p: controller.pause(),
+            'seek': lambda p: controller.seek(_int(p, 'ms')),
+            'rate': lambda p: controller.set_rate(_float(p, 'rate')),
+            'queue': lambda p: controller.state().get('queue', []),
+            'enqueue': lambda p: controller.enqueue(_int(p, 'id')),
+            'clear_queue': lambda p: controller.clear_queue(),
+            'search': lambda p: controller.search(str(p.get('q', '')), _int(p, 'limit', required=False) or 20),
+        }
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.Server | None = None
+        self._clients: set[asyncio.StreamWriter] = set()
+        self._thread = None
+
+    def start(self) -> int:
+        """
+        启动服务器
+
+        Returns:
+            实际监听的端口，port 为 0 时由系统分配
+        """
+        started = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            try:
+                self._server = loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                loop.close()
+                return
+            self.port = self._server.sockets[0].getsockname()[1]
+            push = loop.create_task(self._push_states())
+            started.set()
+            try:
+                loop.run_until_complete(self._server.serve_forever())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                push.cancel()
+                loop.run_until_complete(asyncio.gather(push, return_exceptions=True))
+                loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True, name='ControlServer')
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        logger.info('Serving control API on http://%s:%d', self.host, self.port)
+        return self.port
+
+    def stop(self) -> None:
+        if self._loop is None or self._server is None:
+            return
+        self._loop.call_soon_threadsafe(self._server.close)
+        for writer in list(self._clients):
+            self._loop.call_soon_threadsafe(writer.close)
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _is_local(self, headers: dict[str, str]) -> bool:
+        """Host 为本机或监听的地址，有 Origin 时也是如此"""
+        allowed = _LOOPBACK | {self.host}
+        host = urlsplit(f"//{headers.get('host', '')}").hostname
+        if host not in allowed:
+            return False
+        origin = headers.get('origin')
+        return origin is None or urlsplit(origin).hostname in allowed
+
+    async def _call(self, action: str, params: dict) -> Any:
+        handler = self._actions.get(action)
+        if handler is None:
+            raise ApiError(404, f"Unknown action {action}")
+        try:
+            # 控制器可能等待界面线程，放到线程池中执行
+            return await asyncio.get_running_loop().run_in_executor(None, handler, params)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            while (line := (await reader.readline()).decode('latin-1').strip()):
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            action = url.path.strip('/')
+            local = self._is_local(headers)
+            if local and action == 'ws' and headers.get('upgrade', '').lower() == 'websocket':
+                await self._websocket(reader, writer, headers)
+                return
+            status, result = 200, None
+            try:
+                if not local:
+                    raise ApiError(403, 'Only local clients may use the control API')
+                if method not in ('GET', 'POST') or (method != 'POST' and action in _MUTATING):
+                    raise ApiError(405, f"Method {method} not allowed for {action}")
+                params = dict(parse_qsl(url.query))
+                length = int(headers.get('content-length') or 0)
+                if length > _MAX_BODY:
+                    raise ApiError(413, 'Request body too large')
+                if length:
+                    body = json.loads(await reader.readexactly(length) or b'{}')
+                    if not isinstance(body, dict):
+                        raise ApiError(400, 'Request body must be a JSON object')
+                    params.update(body)
+                result = await self._call(action, params)
+            except ApiError as e:
+                status, result = e.status, {'error': str(e)}
+            except json.JSONDecodeError as e:
+                status, result = 400, {'error': f"Invalid JSON: {e}"}
+            except Exception as e:
+                logger.error('Error handling control request %s: %s', target, e)
+                status, result = 500, {'error': str(e)}
+            body = json.dumps({'ok': True} if result is None else result).encode('utf-8')
+            writer.write(f'HTTP/1.1 {status} {_STATUS_TEXT.get(status, "")}\r\n'
+                         f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+                         f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         headers: dict[str, str]) -> None:
+        key = headers.get('sec-websocket-key', '').encode('latin-1')
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode('latin-1')
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        # 连接后立即发送一次当前状态
+        self._send(writer, {'type': 'state', **self.controller.state()})
+        self._clients.add(writer)
+        try:
+            while True:
+                opcode, payload = await _read_frame(reader)
+                if opcode == _OP_CLOSE:
+                    writer.write(_frame(_OP_CLOSE, payload[:2]))
+                    break
+                if opcode == _OP_PING:
+                    writer.write(_frame(_OP_PONG, payload))
+                elif opcode == _OP_TEXT:
+                    self._send(writer, await self._ws_message(payload))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ApiError):
+            pass
+        finally:
+            self._clients.discard(writer)
+
+    async def _ws_message(self, payload: bytes) -> dict:
+        action = ''
+        try:
+            message = json.loads(payload)
+            if not isinstance(message, dict):
+                raise ApiError(400, 'Message must be a JSON object')
+            action = str(message.pop('action', ''))
+            result = await self._call(action, message)
+            return {'type': 'result', 'action': action, 'ok': True, 'result': result}
+        except ApiError as e:
+            return {'type': 'result', 'ok': False, 'error': str(e)}
+        except json.JSONDecodeError as e:
+            return {'type': 'result', 'ok': False, 'error': f"Invalid JSON: {e}"}
+        except Exception as e:
+            # 与 HTTP 的 500 相同，返回错误而不是断开连接
+            logger.error('Error handling control message %s: %s', action, e)
+            return {'type': 'result', 'action': action, 'ok': False, 'error': str(e)}
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, message: dict) -> None:
+        writer.write(_frame(_OP_TEXT, json.dumps(message).encode('utf-8')))
+
+    async def _push_states(self) -> None:
+        last = None
+        while True:
+            await asyncio.sleep(self.push_interval)
+            if not self._clients:
+                last = None
+                continue
+            try:
+                state = {'type': 'state', **self.controller.state()}
+            except Exception as e:
+                logger.error('Error reading playback state: %s', e)
+                continue
+            if state == last:
+                continue
+            last = state
+            for writer in list(self._clients):
+                try:
+                    if writer.transport.get_write_buffer_size() > _MAX_WRITE_BUFFER:
+                        logger.warning('Dropping WebSocket client %s that stopped reading',
+                                       writer.get_extra_info('peername'))
+                        self._clients.discard(writer)
+                        writer.close()
+                        continue
+                    self._send(writer, state)
+                except Exception:
+                    self._clients.discard(writer)
+
+
+def start_control_server(controller: PlaybackController, host: str, port: int,
+                         push_interval: float = 0.1) -> ControlServer | None:
+    """在后台线程中提供控制接口，返回的服务器可通过 stop() 停止，端口被占用时返回 None"""
+    server = ControlServer(controller, host, port, push_interval)
+    try:
+        server.start()
+    except OSError as e:
+        logger.error('Failed to serve control API on %s:%d: %s', host, port, e)
+        return None
+    return server
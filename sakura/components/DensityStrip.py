@@ -0,0 +1,70 @@
+from PySide6.QtCore import QRectF, Qt, Signal
+from PySide6.QtGui import QColor, QPainter, QPixmap
+from PySide6.QtWidgets import QWidget
+from qfluentwidgets import themeColor
+
+
+class DensityStrip(QWidget):
+    """
+    进度条上方的音符密度条，点击后跳转到对应位置
+
+    密度在导入时已按时长等分统计，这里只把各段画成柱状图并缓存为 QPixmap，尺寸或歌曲变化时才重新绘制。
+    """
+    # 点击位置对应的时间，单位毫秒
+    seek_requested = Signal(int)
+
+    def __init__(self, parent=None, height: int = 16):
+        super().__init__(parent)
+        self.setFixedHeight(height)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self._density: list[int] = []
+        self._duration = 0
+        self._pixmap: QPixmap | None = None
+
+    def set_density(self, density: list[int], duration: int) -> None:
+        """
+        Args:
+            density: 按 [0, duration] 等分的每段音符数
+            duration: 歌曲时长，单位毫秒
+        """
+        self._density = density
+        self._duration = duration
+        self._pixmap = None
+        self.update()
+
+    def _render(self) -> QPixmap:
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        peak = max(self._density, default=0)
+        if peak == 0:
+            return pixmap
+        painter = QPainter(pixmap)
+        color = QColor(themeColor())
+        color.setAlpha(160)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(color)
+        width = self.width() / len(self._density)
+        for i, count in enumerate(self._density):
+            height = self.height() * count / peak
+            painter.drawRect(QRectF(i * width, self.height() - height, width, height))
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event) -> None:
+        if self._pixmap is None:
+            self._pixmap = self._render()
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._pixmap)
+        painter.end()
+
+    def resizeEvent(self, event) -> None:
+        self._pixmap = None
+        super().resizeEvent(event)
+
+    def mousePressEvent(self, event) -> None:
+        if event.button() == Qt.MouseButton.LeftButton and self._duration > 0:
+            position = min(max(event.position().x() / max(1, self.width()), 0.0), 1.0)
+            self.seek_requested.emit(int(position * self._duration))
+            event.accept()
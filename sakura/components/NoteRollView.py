@@ -0,0 +1,133 @@
+from collections import OrderedDict
+
+import numpy as np
+from PySide6.QtCore import QRectF, QTimer, Qt
+from PySide6.QtGui import QColor, QPainter, QPixmap
+from PySide6.QtWidgets import QWidget
+from qfluentwidgets import isDarkTheme, themeColor
+
+from sakura.components.PlaybackClock import PlaybackClock
+from sakura.db.NoteCodec import KEY_COUNT
+
+
+class NoteRollView(QWidget):
+    """
+    下落式音符视图，音符从上方落到底部的判定线时被按下
+
+    时间轴按固定高度切成若干段，每段的音符只绘制一次并缓存为 QPixmap，
+    每帧只按当前时间平移绘制可见的两三段，段内的音符通过二分查找得到。
+    帧率受 max_fps 限制，时间没有变化时不重绘。
+    """
+    # 判定线上方可见的时长，单位毫秒
+    window_ms: int = 3000
+    # 每段缓存的高度，单位像素
+    chunk_px: int = 256
+    max_cached_chunks: int = 16
+    max_fps: int = 60
+    # 音符方块的高度，单位像素
+    tile_px: int = 10
+    # 判定线到底部的距离，单位像素
+    hit_margin: int = 24
+
+    def __init__(self, clock: PlaybackClock, parent=None):
+        super().__init__(parent)
+        self.clock = clock
+        self.times = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=np.uint8)
+        self._chunks: OrderedDict[int, QPixmap] = OrderedDict()
+        self._painted_time = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000 // self.max_fps)
+        self._timer.timeout.connect(self._next_frame)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def set_notes(self, times: np.ndarray, keys: np.ndarray) -> None:
+        """切换显示的歌曲，times 需按升序排列"""
+        self.times = np.asarray(times, dtype=np.int64)
+        self.keys = np.asarray(keys, dtype=np.uint8)
+        self._chunks.clear()
+        self.update()
+
+    def _px_per_ms(self) -> float:
+        return max(1, self.height() - self.hit_margin) / self.window_ms
+
+    def _chunk_ms(self) -> float:
+        return self.chunk_px / self._px_per_ms()
+
+    def _chunk(self, index: int) -> QPixmap:
+        pixmap = self._chunks.get(index)
+        if pixmap is not None:
+            self._chunks.move_to_end(index)
+            return pixmap
+        pixmap = self._render_chunk(index)
+        self._chunks[index] = pixmap
+        while len(self._chunks) > self.max_cached_chunks:
+            self._chunks.popitem(last=False)
+        return pixmap
+
+    def _render_chunk(self, index: int) -> QPixmap:
+        """绘制时间段 [index * chunk_ms, (index + 1) * chunk_ms) 内的音符，图片顶部为段的结束时间"""
+        ratio = self.devicePixelRatioF()
+        width = self.width()
+        pixmap = QPixmap(int(width * ratio), int(self.chunk_px * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        px_per_ms = self._px_per_ms()
+        chunk_ms = self.chunk_px / px_per_ms
+        start, end = index * chunk_ms, (index + 1) * chunk_ms
+        # 方块从音符时间向上延伸，上一段末尾的音符也会画进本段底部
+        first, last = np.searchsorted(self.times, [start - self.tile_px / px_per_ms, end], side='left')
+        if first == last:
+            return pixmap
+        lane = width / KEY_COUNT
+        tops = (end - self.times[first:last]) * px_per_ms - self.tile_px
+        lefts = self.keys[first:last] * lane + 2
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(themeColor())
+        for left, top in zip(lefts.tolist(), tops.tolist()):
+            painter.drawRoundedRect(QRectF(left, top, lane - 4, self.tile_px), 3, 3)
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        dark = isDarkTheme()
+        painter.fillRect(self.rect(), QColor(32, 32, 32) if dark else QColor(249, 249, 249))
+        width, height = self.width(), self.height()
+        hit_y = height - self.hit_margin
+        lane = width / KEY_COUNT
+        painter.setPen(QColor(255, 255, 255, 16) if dark else QColor(0, 0, 0, 16))
+        for i in range(1, KEY_COUNT):
+            painter.drawLine(round(i * lane), 0, round(i * lane), height)
+        now = self.clock.get_current_time()
+        self._painted_time = now
+        if len(self.times):
+            px_per_ms = self._px_per_ms()
+            chunk_ms = self.chunk_px / px_per_ms
+            # 可见范围 [now - hit_margin 对应的时长, now + window_ms]
+            visible_start = now - self.hit_margin / px_per_ms
+            visible_end = now + self.window_ms
+            for index in range(max(0, int(visible_start // chunk_ms)), int(visible_end // chunk_ms) + 1):
+                chunk_top = hit_y - ((index + 1) * chunk_ms - now) * px_per_ms
+                painter.drawPixmap(0, round(chunk_top), self._chunk(index))
+        painter.setPen(themeColor())
+        painter.drawLine(0, hit_y, width, hit_y)
+        painter.end()
+
+    def _next_frame(self) -> None:
+        if self.clock.get_current_time() != self._painted_time:
+            self.update()
+
+    def resizeEvent(self, event) -> None:
+        self._chunks.clear()
+        super().resizeEvent(event)
+
+    def showEvent(self, event) -> None:
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self._timer.stop()
+        super().hideEvent(event)
@@ -0,0 +1,103 @@
+import math
+import threading
+import time
+from typing import Callable
+
+
+class PlaybackClock:
+    """
+    播放时钟，不依赖 Qt
+
+    播放时由后台线程按 rate 推进当前时间，时间变化时依次调用 add_listener 注册的回调（在推进时间的线程中执行）。
+    """
+
+    def __init__(self):
+        self._current_time = 0
+        self._total_duration = 0
+        self._update_interval = 10
+        self._rate = 1.0
+        self._is_playing = False
+        self._force_update = False
+        self._update_thread = None
+        self._stop_thread = False
+        self._thread_lock = threading.Lock()
+        self._listeners: list[Callable[[int], None]] = []
+
+    def __del__(self):
+        self.cleanup()
+
+    def cleanup(self):
+        with self._thread_lock:
+            self._stop_thread = True
+            self._is_playing = False
+        if self._update_thread:
+            self._update_thread.join(timeout=0.2)
+            self._update_thread = None
+
+    def add_listener(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def _notify(self, time_ms: int):
+        for listener in self._listeners:
+            listener(time_ms)
+
+    def _update_time(self):
+        last_update = time.time() * 1000
+        # 不足 1 毫秒的部分累计到下一次
+        carry = 0.0
+        while not self._stop_thread:
+            current = time.time() * 1000
+            with self._thread_lock:
+                if self._is_playing:
+                    elapsed = (current - last_update) * self._rate + carry
+                    carry = elapsed - int(elapsed)
+                    self.set_current_time(min(
+                        self._current_time + int(elapsed),
+                        self._total_duration
+                    ))
+            last_update = current
+            time.sleep(self._update_interval / 1000)
+
+    def set_update_interval(self, interval_ms: int):
+        self._update_interval = max(10, interval_ms)
+
+    def set_rate(self, rate: float):
+        """播放速度倍率，1 为原速"""
+        if not math.isfinite(rate) or rate <= 0:
+            raise ValueError(f"Invalid playback rate: {rate}")
+        self._rate = rate
+
+    def get_rate(self) -> float:
+        return self._rate
+
+    def set_current_time(self, time_ms: int):
+        if not self._force_update and self._current_time != time_ms:
+            self._current_time = time_ms
+            self._notify(time_ms)
+
+    def force_set_time(self, time_ms: int):
+        self._force_update = True
+        self._current_time = time_ms
+        self._notify(time_ms)
+        self._force_update = False
+
+    def set_duration(self, duration_ms: int):
+        self._total_duration = duration_ms
+
+    def get_current_time(self) -> int:
+        return self._current_time
+
+    def get_duration(self) -> int:
+        return self._total_duration
+
+    def set_playing(self, is_playing: bool):
+        self._is_playing = is_playing
+        if is_playing and not self._update_thread:
+            self._stop_thread = False
+            self._update_thread = threading.Thread(target=self._update_time, daemon=True)
+            self._update_thread.start()
+        elif not is_playing:
+            self.cleanup()
+
+    def is_playing(self) -> bool:
+        return self._is_playing
@@ -3,31 +3,50 @@ import time
 from decimal import Decimal
 from typing import Any
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from pynput import keyboard
-from qfluentwidgets import ListWidget, FluentIcon
+from qfluentwidgets import ListView, FluentIcon
 from qfluentwidgets.multimedia import StandardMediaPlayBar
 
 from sakura import children_windows
+from sakura.components.DensityStrip import DensityStrip
 from sakura.components.SpeedControl import SpeedControl
 from sakura.components.TimeManager import TimeManager
 from sakura.components.mapper.JsonMapper import JsonMapper
+from sakura.components.player.DensityReducer import reduce_notes
 from sakura.components.player.SakuraPlayer import SakuraPlayer
 from sakura.components.ui import main_width
 from sakura.components.ui.BottomRightButton import BottomRightButton
+from sakura.components.ui.ConfigBridge import config_bridge
+from sakura.components.ui.HotkeyBridge import hotkey_bridge
+from sakura.components.ui.SongListModel import SongListModel
 from sakura.config import conf, save_conf
-from sakura.config.sakura_logging import logger
+from sakura.config.Config import Capability
+from sakura.config.sakura_logging import get_logger
 from sakura.db.DBManager import song_client
+from sakura.db.NoteCodec import normalize_notes
 from sakura.factory.PlayerFactory import get_player
+from sakura.interface.SongSource import SongSource
 from sakura.listener import register_listener
 from sakura.registrar.listener_registers import listener_registers
 
+logger = get_logger(__name__)
+
 
 class SakuraPlayBar(StandardMediaPlayBar):
+    # 开始播放新歌曲时发出实际演奏的 (times, keys)，停止时发出空数组
+    song_loaded = Signal(object, object)
+    # 歌曲播放完毕，在播放线程中发出
+    song_finished = Signal()
+    # 调度子进程播放失败，在同步线程中发出
+    playback_failed = Signal()
     is_playing: bool = False
-    file_list_box: ListWidget
+    file_list_box: ListView
+    # 播放的歌曲从此来源读取，与歌曲列表使用的来源一致
+    source: SongSource = song_client
     playing_id: int = 0
+    playing_name: str = ''
     '''
         此变量本意是为了减少重复解析json文件，因为只需要 song_notes 字段 (因为除了 song_notes 字段外，其他字段全是无效字段），
         所以将 SakuraPlayer 对象放到数组中，等用户播放重复性的 song 时，可以跳过 json 解析。
@@ -44,6 +63,8 @@ class SakuraPlayBar(StandardMediaPlayBar):
     wait_time: Decimal = 0
     progress_slider_clicked: bool = False
     user_is_seeking: bool = False
+    # 时间标签上显示的 (已播放秒数, 剩余秒数)，秒数不变时不更新标签
+    _shown_seconds: tuple[int, int] | None = None
     
     _user_volume: float = 0
     _is_muted: bool = False
@@ -51,12 +72,16 @@ class SakuraPlayBar(StandardMediaPlayBar):
     _volume_timer = None
     _volume_lock = threading.Lock()
 
-    def __init__(self, file_list_box: ListWidget = None, temp_layout: QVBoxLayout = None):
+    def __init__(self, file_list_box: ListView = None, temp_layout: QVBoxLayout = None):
         super().__init__()
         self.temp_layout = temp_layout
         self.setFixedWidth(main_width * 0.8)
         self.file_list_box = file_list_box
+        # 进度条以毫秒为单位
         self.progressSlider.setRange(0, 100)
+        self.density_strip = DensityStrip(self)
+        self.density_strip.seek_requested.connect(self.seek_to)
+        self.vBoxLayout.insertWidget(0, self.density_strip)
         self.currentTimeLabel.setText('0:00')
         self.remainTimeLabel.setText('0:00')
         self.rightButtonLayout.setContentsMargins(0, 0, 8, 0)
@@ -64,7 +89,8 @@ class SakuraPlayBar(StandardMediaPlayBar):
         self.progressSlider.sliderReleased.connect(self.progress_slider_released)
         self.progressSlider.valueChanged.connect(self.progress_slider_value_changed)
         BottomRightButton(self, self.rightButtonLayout, FluentIcon.MINIMIZE, self.toggle_layout)
-        # 注册全局键盘监听
+        # 注册全局键盘监听，回调经 hotkey_bridge 在界面线程中执行
+        hotkey_bridge.install()
         register_listener(keyboard.Key.f4, self.togglePlayState, '暂停/继续')
         register_listener(keyboard.Key.up, self.add_wait_time, '增加等待时间')
         register_listener(keyboard.Key.down, self.reduce_wait_time, '减少等待时间')
@@ -72,6 +98,7 @@ class SakuraPlayBar(StandardMediaPlayBar):
         listener_registers.append(SpeedControl(lambda: float(self.wait_time)))
         self.time_manager = TimeManager()
         self.time_manager.timeChanged.connect(self.update_progress)
+        self.playback_failed.connect(self._playback_failed)
         
         # Add mouse click handling for the progress slider
         self.progressSlider.mousePressEvent = self.progress_slider_mouse_press
@@ -85,9 +112,55 @@ class SakuraPlayBar(StandardMediaPlayBar):
             # Connect volume signals
             self.volumeButton.volumeChanged.connect(self._handle_volume_change)
             self.volumeButton.mutedChanged.connect(self._handle_mute_change)
-            logger.info(f"Volume controls initialized with volume: {self._user_volume}")
+            logger.info("Volume controls initialized with volume: %s", self._user_volume)
         except Exception as e:
-            logger.error(f"Failed to initialize volume controls: {e}")
+            logger.error("Failed to initialize volume controls: %s", e)
+        # 配置变化后立即生效
+        config_bridge.config_changed.connect(self.config_changed)
+        self._prepare_backend()
+
+    def config_changed(self, changed: set[str]):
+        """
+        Apply configuration changes while running
+
+        Args:
+            changed: Changed configuration keys, e.g. 'player.type'
+        """
+        if any(key in ('player.type', 'player.instruments') or key.startswith('adb.') for key in changed):
+            self._prepare_backend()
+            self._switch_backend()
+        if 'player.volume' in changed and round(float(conf.player.volume) * 100) != round(self._user_volume * 100):
+            self._user_volume = float(conf.player.volume)
+            if not self._is_muted:
+                self.volumeButton.setVolume(int(self._user_volume * 100))
+
+    @staticmethod
+    def _prepare_backend():
+        """多设备演奏在后台连接并测量设备，不阻塞界面；使用调度进程时由调度进程负责"""
+        if conf.player.type == 'android_fleet' and not conf.scheduler.process:
+            from sakura.components.player.AndroidFleet import prepare_fleet
+            prepare_fleet(conf)
+
+    def _switch_backend(self):
+        """Replace the backend of the current song without interrupting playback"""
+        current_player = self.sakura_player_dict.get(self.playing_id)
+        if current_player is not None and hasattr(current_player, 'switch_backend'):
+            current_player.switch_backend(conf.player.type)
+            logger.info('Switched player to %s', conf.player.type)
+            return
+        if current_player is None or current_player.player is None:
+            return
+        old_backend = current_player.player
+        try:
+            current_player.player = get_player(conf.player.type, conf)
+        except Exception as e:
+            logger.error('Failed to switch player to %s: %s', conf.player.type, e)
+            return
+        if self._is_muted:
+            self._update_player_volume(0.0)
+        # 旧播放器释放时可能等待余音，放到后台线程
+        threading.Thread(target=old_backend.cleanup, daemon=True).start()
+        logger.info('Switched player to %s', conf.player.type)
 
     # Layout Control Methods
     def toggle_layout(self):
@@ -147,6 +220,20 @@ class SakuraPlayBar(StandardMediaPlayBar):
             self._is_dragging = False
             event.accept()
 
+    def set_source(self, source: SongSource):
+        """切换歌曲来源，不同来源的歌曲 ID 互不相关，正在播放的歌曲会被停止"""
+        if source is self.source:
+            return
+        self.pause()
+        for player in self.sakura_player_dict.values():
+            player.cleanup(force=True)
+        self.sakura_player_dict.clear()
+        self.playing_id = 0
+        self.playing_name = ''
+        self.source = source
+        self.density_strip.set_density([], 0)
+        self.song_loaded.emit(*normalize_notes([]))
+
     def togglePlayState(self):
         """Toggle between play and pause states"""
         if self.is_playing:
@@ -167,12 +254,23 @@ class SakuraPlayBar(StandardMediaPlayBar):
         Start or resume playback of the currently selected song
         Handles loading new songs and managing player instances
         """
-        current_item = self.file_list_box.currentItem()
-        if current_item is None:
+        current_index = self.file_list_box.currentIndex()
+        if not current_index.isValid():
             return
         
-        song_id = current_item.data(1)
-        
+        song_id = current_index.data(SongListModel.SongIdRole)
+        # 所在页尚未从数据库读取
+        if song_id is None:
+            return
+        self.play_song(song_id)
+
+    def play_song(self, song_id: int):
+        """
+        Play a song by ID, resuming it if it is the current song
+
+        Args:
+            song_id: Song ID in the current source
+        """
         # If the same song and not seeking - just continue
         if self.playing_id == song_id and not self.progress_slider_clicked:
             self.playButton.setPlay(True)
@@ -181,8 +279,8 @@ class SakuraPlayBar(StandardMediaPlayBar):
                 self.sakura_player_dict[song_id].continue_play()
                 self.time_manager.set_playing(True)
             return
-        song_model = song_client.select_by_id(song_id)
         try:
+            song_model = self.source.select_by_id(song_id)
             # Clear the previous player before loading a new song
             if self.playing_id in self.sakura_player_dict:
                 old_player = self.sakura_player_dict[self.playing_id]
@@ -192,31 +290,56 @@ class SakuraPlayBar(StandardMediaPlayBar):
             # 从数据库查询 song_notes
             song_notes = song_model.songNotes
 
-            # Create new player
-            player = get_player(conf.player.type, conf)  # Create player beforehand
-            sakura_player = SakuraPlayer(song_notes, self.time_manager, self.callback)
-            sakura_player.last_time = song_notes[-1]['time']
+            # 播放方式跟不上时按其演奏能力简化乐谱
+            capability = conf.capabilities.get(conf.player.type) if conf.player.reduce_density else None
+            if conf.scheduler.process:
+                # 播放方式由调度进程创建
+                from sakura.components.player.SchedulerProcess import RemoteSakuraPlayer
+                player = conf.player.type
+                sakura_player = RemoteSakuraPlayer(song_notes, self.time_manager, self.callback, capability,
+                                                   self.playback_failed.emit)
+            else:
+                # Create new player
+                player = get_player(conf.player.type, conf)  # Create player beforehand
+                sakura_player = SakuraPlayer(song_notes, self.time_manager, self.callback, capability)
+            # 时长在导入时已经计算好
+            sakura_player.last_time = song_model.duration
             
             # Update UI before playback starts
             self.playButton.setPlay(True)
-            total_seconds = sakura_player.last_time // 1000
-            self.progressSlider.setRange(0, total_seconds)
+            self.progressSlider.setRange(0, sakura_player.last_time)
+            self.density_strip.set_density(song_model.density, song_model.duration)
             
             # Save player and start playback
             self.sakura_player_dict[song_id] = sakura_player
             self.playing_id = song_id
+            self.playing_name = song_model.name
             self.is_playing = True
             
             # Start playback
             sakura_player.play(player, self.get_key_mapping())
-            logger.info('正在播放：%s', self.file_list_box.currentItem().text())
+            logger.info('正在播放：%s', song_model.name)
+            self.song_loaded.emit(*self._played_notes(song_notes, capability))
 
             
         except Exception as e:
-            logger.error(f"Error playing song {song_model.name}: {e}")
+            logger.error("Error playing song %s: %s", song_id, e)
             self.is_playing = False
             self.playButton.setPlay(False)
 
+    def _playback_failed(self):
+        """Reset the play button after the scheduler process failed to play"""
+        self.is_playing = False
+        self.playButton.setPlay(False)
+
+    @staticmethod
+    def _played_notes(song_notes: list, capability: Capability | None) -> tuple:
+        """实际演奏的音符，简化结果在 SakuraPlayer 中已缓存"""
+        times, keys = normalize_notes(song_notes)
+        if capability is not None:
+            times, keys = reduce_notes(times, keys, capability)
+        return times, keys
+
     def callback(self):
         """
         Callback executed when playback is finished
@@ -231,10 +354,11 @@ class SakuraPlayBar(StandardMediaPlayBar):
             self.is_playing = False
             
         except Exception as e:
-            logger.error(f"Error in playback callback: {e}")
+            logger.error("Error in playback callback: %s", e)
         finally:
             self.is_playing = False
             self.playButton.setPlay(False)
+            self.song_finished.emit()
 
     def termination_cb(self):
         pass
@@ -274,7 +398,7 @@ class SakuraPlayBar(StandardMediaPlayBar):
                     self.time_manager.set_playing(False)
                 
                 # Perform seeking
-                current_player.seek(value * 1000)
+                current_player.seek(value)
                 
                 # Resume playback
                 if was_playing:
@@ -289,21 +413,29 @@ class SakuraPlayBar(StandardMediaPlayBar):
         Update time labels when progress slider value changes
         
         Args:
-            value: New slider position in seconds
+            value: New slider position in milliseconds
         """
         if not self.user_is_seeking:
             return
-        
-        minutes = value // 60
-        seconds = value % 60
-        self.currentTimeLabel.setText(f'{minutes}:{seconds:02d}')
-        
+        self._update_time_labels(value)
+
+    def _update_time_labels(self, current_time_ms: int):
+        """
+        Show the played and remaining time, labels are only touched when a displayed second changes
+
+        Args:
+            current_time_ms: Playback position in milliseconds
+        """
+        current_seconds = current_time_ms // 1000
+        remain_seconds = None
         if self.playing_id and self.playing_id in self.sakura_player_dict:
-            total_seconds = self.sakura_player_dict[self.playing_id].last_time // 1000
-            remain_seconds = total_seconds - value
-            remain_minutes = remain_seconds // 60
-            remain_seconds = remain_seconds % 60
-            self.remainTimeLabel.setText(f'{remain_minutes}:{remain_seconds:02d}')
+            remain_seconds = self.sakura_player_dict[self.playing_id].last_time // 1000 - current_seconds
+        if (current_seconds, remain_seconds) == self._shown_seconds:
+            return
+        self._shown_seconds = (current_seconds, remain_seconds)
+        self.currentTimeLabel.setText(f'{current_seconds // 60}:{current_seconds % 60:02d}')
+        if remain_seconds is not None:
+            self.remainTimeLabel.setText(f'{remain_seconds // 60}:{remain_seconds % 60:02d}')
 
     def progress_slider_mouse_press(self, event):
         """
@@ -315,15 +447,22 @@ class SakuraPlayBar(StandardMediaPlayBar):
         if event.button() == Qt.MouseButton.LeftButton:
             # Calculate the clicked position as a percentage
             value = event.position().x() / self.progressSlider.width()
-            new_value = int(value * self.progressSlider.maximum())
-            
-            # Update the slider value
-            self.progressSlider.setValue(new_value)
-            
-            # Handle the position change similar to slider release
-            self.progress_slider_clicked = True
-            self.user_is_seeking = True
-            self.progress_slider_released()
+            self.seek_to(int(value * self.progressSlider.maximum()))
+
+    def seek_to(self, time_ms: int):
+        """
+        Jump to a position, used by clicks on the progress bar and the density strip
+
+        Args:
+            time_ms: Target position in milliseconds
+        """
+        # Update the slider value
+        self.progressSlider.setValue(time_ms)
+
+        # Handle the position change similar to slider release
+        self.progress_slider_clicked = True
+        self.user_is_seeking = True
+        self.progress_slider_released()
 
     def update_progress(self, current_time_ms: int):
         """
@@ -333,31 +472,22 @@ class SakuraPlayBar(StandardMediaPlayBar):
             current_time_ms: Current playback time in milliseconds
         """
         if not self.user_is_seeking:
-            current_seconds = current_time_ms // 1000
-            
-            self.progressSlider.setValue(current_seconds)
-            
-            minutes = current_seconds // 60
-            seconds = current_seconds % 60
-            self.currentTimeLabel.setText(f'{minutes}:{seconds:02d}')
-            
-            if self.playing_id and self.playing_id in self.sakura_player_dict:
-                total_seconds = self.sakura_player_dict[self.playing_id].last_time // 1000
-                remain_seconds = total_seconds - current_seconds
-                remain_minutes = remain_seconds // 60
-                remain_seconds = remain_seconds % 60
-                self.remainTimeLabel.setText(f'{remain_minutes}:{remain_seconds:02d}')
+            # 时间每 10 毫秒变化一次，滑块只在移动至少一个像素时更新
+            step = max(1, self.progressSlider.maximum() // max(1, self.progressSlider.width()))
+            if abs(current_time_ms - self.progressSlider.value()) >= step:
+                self.progressSlider.setValue(current_time_ms)
+            self._update_time_labels(current_time_ms)
 
     def add_wait_time(self):
         """Increase playback wait time"""
         self.wait_time += Decimal(conf.control.speed)
-        logger.info(f'wait_time: {self.wait_time}')
+        logger.info('wait_time: %s', self.wait_time)
 
     def reduce_wait_time(self):
         """Decrease playback wait time"""
         if self.wait_time > 0:
             self.wait_time -= Decimal(conf.control.speed)
-        logger.info(f'wait_time: {self.wait_time}')
+        logger.info('wait_time: %s', self.wait_time)
 
     # Volume Control Methods
     def _handle_volume_change(self, value: int):
@@ -380,7 +510,7 @@ class SakuraPlayBar(StandardMediaPlayBar):
                 self._start_volume_timer(volume)
             self._update_player_volume(volume)
         except Exception as e:
-            logger.error(f"Failed to handle volume change: {e}")
+            logger.error("Failed to handle volume change: %s", e)
 
     def _handle_mute_change(self, is_muted: bool):
         """
@@ -398,7 +528,7 @@ class SakuraPlayBar(StandardMediaPlayBar):
             # Start delayed logging
             self._start_volume_timer(0.0 if is_muted else self._user_volume)
         except Exception as e:
-            logger.error(f"Failed to handle mute change: {e}")
+            logger.error("Failed to handle mute change: %s", e)
 
     def _update_player_volume(self, volume: float):
         """
@@ -410,11 +540,13 @@ class SakuraPlayBar(StandardMediaPlayBar):
         try:
             if self.playing_id in self.sakura_player_dict:
                 current_player = self.sakura_player_dict[self.playing_id]
-                if hasattr(current_player, 'player') and hasattr(current_player.player, 'audio'):
+                if hasattr(current_player, 'set_volume'):
+                    current_player.set_volume(volume)
+                elif hasattr(current_player, 'player') and hasattr(current_player.player, 'audio'):
                     for sound in current_player.player.audio:
                         sound.set_volume(volume)
         except Exception as e:
-            logger.error(f"Failed to update player volume: {e}")
+            logger.error("Failed to update player volume: %s", e)
 
     def _delayed_volume_logging(self):
         """Background thread for delayed (1 second) volume change logging"""
@@ -432,9 +564,9 @@ class SakuraPlayBar(StandardMediaPlayBar):
                 if self._last_volume_change is not None:
                     continue
                 if self._is_muted:
-                    logger.info(f"Final volume state: Muted (saved volume: {self._user_volume})")
+                    logger.info("Final volume state: Muted (saved volume: %s)", self._user_volume)
                 else:
-                    logger.info(f"Final volume state: {current_volume}")
+                    logger.info("Final volume state: %s", current_volume)
                 return
 
     def _start_volume_timer(self, volume: float):
@@ -0,0 +1,152 @@
+import threading
+from collections import OrderedDict, deque
+
+from PySide6.QtCore import QObject, Signal
+
+from sakura.config.sakura_logging import get_logger
+from sakura.interface.SongSource import SongSource
+
+logger = get_logger(__name__)
+
+
+class SearchWorker(QObject):
+    """
+    在后台线程中执行歌曲搜索和分页查询
+
+    每次新的搜索都会使之前的请求失效：排队中的旧请求直接丢弃，正在执行的查询通过 SQLite 的进度回调中断。
+    结果通过信号发回，连接到界面线程的槽时 Qt 会自动排队到界面线程执行。
+    查询结果保存在有大小上限的 LRU 缓存中，乐谱库变化时调用 invalidate 清空。
+    """
+    # (generation, keyword, total, 第一页)
+    searchFinished = Signal(int, str, int, object)
+    # (generation, keyword, 页号, 该页数据)
+    pageLoaded = Signal(int, str, int, object)
+    # (generation, keyword, 页号)，查询失败，之后可以重新请求该页
+    pageFailed = Signal(int, str, int)
+
+    client: SongSource
+    page_size: int
+    # 缓存的页数上限，每个关键字的结果总数也各占一项
+    cache_size: int
+
+    def __init__(self, client: SongSource, page_size: int, cache_size: int = 64, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self._generation = 0
+        self._cache: OrderedDict[tuple[str, int], object] = OrderedDict()
+        self._requests: deque[tuple[int, str, int]] = deque()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='SearchWorker')
+        self._thread.start()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def search(self, keyword: str) -> int:
+        """
+        开始新的搜索，命中缓存时同步发出 searchFinished
+
+        Returns:
+            本次搜索的 generation，用于识别过期的结果
+        """
+        keyword = ' '.join(keyword.split())
+        with self._condition:
+            self._generation += 1
+            generation = self._generation
+            self._requests.clear()
+            total = self._cache_get((keyword, -1))
+            first_page = self._cache_get((keyword, 0))
+            if total is None or first_page is None:
+                self._requests.append((generation, keyword, 0))
+                self._condition.notify()
+                return generation
+        self.searchFinished.emit(generation, keyword, total, first_page)
+        return generation
+
+    def load_page(self, generation: int, keyword: str, page: int) -> None:
+        """异步读取一页，命中缓存时同步发出 pageLoaded"""
+        with self._condition:
+            if generation != self._generation:
+                return
+            rows = self._cache_get((keyword, page))
+            if rows is None:
+                self._requests.append((generation, keyword, page))
+                self._condition.notify()
+                return
+        self.pageLoaded.emit(generation, keyword, page, rows)
+
+    def invalidate(self) -> None:
+        """乐谱库变化后清空缓存，之后的结果都会重新查询"""
+        with self._condition:
+            self._generation += 1
+            self._requests.clear()
+            self._cache.clear()
+
+    def set_client(self, client: SongSource) -> None:
+        """切换歌曲来源，之前的请求和缓存全部失效"""
+        with self._condition:
+            self.client = client
+            self._generation += 1
+            self._requests.clear()
+            self._cache.clear()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._generation = -1
+            self._requests.clear()
+            self._condition.notify()
+
+    def _cache_get(self, key: tuple[str, int]):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, key: tuple[str, int], value) -> None:
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._requests and self._generation >= 0:
+                    self._condition.wait()
+                if self._generation < 0:
+                    return
+                generation, keyword, page = self._requests.popleft()
+                if generation != self._generation:
+                    continue
+                client = self.client
+
+            def cancelled() -> bool:
+                return generation != self._generation
+
+            try:
+                if page == 0:
+                    total = client.count_by_name(keyword, cancelled)
+                rows = client.select_by_name(keyword, self.page_size, page * self.page_size, cancelled)
+            except Exception as e:
+                if cancelled():
+                    continue
+                logger.error('Search for %r failed: %s', keyword, e)
+                # 失败的结果不缓存；第一页失败时显示为空列表，其他页交给界面重新请求
+                if page == 0:
+                    self.searchFinished.emit(generation, keyword, 0, [])
+                else:
+                    self.pageFailed.emit(generation, keyword, page)
+                continue
+            with self._condition:
+                if cancelled():
+                    continue
+                self._cache_put((keyword, page), rows)
+                if page == 0:
+                    self._cache_put((keyword, -1), total)
+            if page == 0:
+                self.searchFinished.emit(generation, keyword, total, rows)
+            else:
+                self.pageLoaded.emit(generation, keyword, page, rows)
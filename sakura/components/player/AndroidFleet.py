@@ -0,0 +1,306 @@
+"""
+多台安卓设备同步演奏
+
+AndroidFleetPlayer 按 adb.devices 中的序列号为每台设备保持一个 adb shell 进程，SakuraPlayer 的每次按键都发给所有设备。
+shell 和测量结果按设备列表缓存，由所有歌曲共用，adb.devices 变化时在后台重新连接并测量每台设备：
+
+    - 时钟偏差：设备 date +%s%N 与电脑时间的差，取往返最快的一次，仅用于记录和排查
+    - 延迟：往返时间的一半加上设备上启动 input 命令的耗时，即写入命令到点击生效的时间
+
+按键由一个调度线程按同一时钟发出，延迟较小的设备推迟 (最大延迟 - 本设备延迟) 后再写入命令，使各设备同时生效。
+点击命令以 & 在后台执行，同一台设备的和弦在同一行中写入，不会因为 input 命令的耗时而相互等待。
+"""
+import atexit
+import heapq
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from typing import NamedTuple
+
+from sakura.components.player.AndroidPlayer import AndroidPlayer
+from sakura.config import Config
+from sakura.config.sakura_logging import get_logger
+from sakura.interface.Player import Player
+
+logger = get_logger(__name__)
+
+# 等待设备回应的最长时间，单位秒
+_RESPONSE_TIMEOUT = 5
+# 到期时间相差不超过多少纳秒的点击合并为一行
+_COALESCE_NS = 1_000_000
+# 最后多少纳秒忙等，减少 sleep 的误差
+_SPIN_NS = 2_000_000
+
+
+def adb_command(path: str) -> list[str]:
+    """adb.path 对应的命令，.py 文件（如 FakeAdb.py）以当前的 Python 运行"""
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    if path.endswith('.py'):
+        return [sys.executable, path]
+    return [path]
+
+
+class DeviceTiming(NamedTuple):
+    serial: str
+    # 设备时钟减去电脑时钟，单位纳秒
+    offset_ns: int
+    # 最快一次往返的时间，单位纳秒
+    rtt_ns: int
+    # 设备上启动 input 命令的耗时，单位纳秒
+    input_ns: int
+
+    @property
+    def latency_ns(self) -> int:
+        """从写入命令到点击生效的时间"""
+        return self.rtt_ns // 2 + self.input_ns
+
+
+class AdbShell:
+    """一台设备上常驻的 adb shell"""
+
+    def __init__(self, command: list[str], serial: str):
+        self.serial = serial
+        self.process = subprocess.Popen(command + ['-s', serial, 'shell'], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        self.lines: Queue[str] = Queue()
+        self._token = 0
+        # 持续读取输出，避免管道写满阻塞设备上的 shell
+        threading.Thread(target=self._read, daemon=True, name=f'AdbShell-{serial}').start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.put(line.decode('utf-8', 'replace').strip())
+
+    def write(self, line: str) -> None:
+        self.process.stdin.write(line.encode('utf-8') + b'\n')
+
+    def _request(self, line: str, tag: str) -> list[str]:
+        """发送命令，等待以 tag 开头的输出，返回其余字段"""
+        self._token += 1
+        tag = f'{tag}-{self._token}'
+        self.write(line.replace('{tag}', tag))
+        deadline = time.monotonic() + _RESPONSE_TIMEOUT
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                fields = self.lines.get(timeout=remaining).split()
+            except Empty:
+                break
+            if fields and fields[0] == tag:
+                return fields[1:]
+        raise TimeoutError(f"Device {self.serial} did not respond")
+
+    def calibrate(self, samples: int) -> DeviceTiming:
+        """测量时钟偏差、往返时间和 input 命令的耗时"""
+        best = None
+        for _ in range(samples):
+            sent = time.time_ns()
+            device_ns = int(self._request('echo {tag} $(date +%s%N)', 'sakura-sync')[0])
+            received = time.time_ns()
+            if best is None or received - sent < best[0]:
+                best = (received - sent, device_ns - (sent + received) // 2)
+        input_costs = []
+        for _ in range(max(1, samples // 3)):
+            # KEYCODE_UNKNOWN 不会触发任何操作
+            start, end = self._request('a=$(date +%s%N); input keyevent 0; echo {tag} $a $(date +%s%N)',
+                                       'sakura-input')
+            input_costs.append(int(end) - int(start))
+        rtt_ns, offset_ns = best
+        return DeviceTiming(self.serial, offset_ns, rtt_ns, int(statistics.median(input_costs)))
+
+    def close(self) -> None:
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def calibrate_devices(command: list[str], serials: list[str], samples: int) -> tuple[list[AdbShell], list[DeviceTiming]]:
+    """并发连接并测量所有设备，无法连接的设备被跳过"""
+    def connect(serial):
+        shell = AdbShell(command, serial)
+        try:
+            return shell, shell.calibrate(samples)
+        except (OSError, TimeoutError, ValueError, IndexError) as e:
+            logger.error('Failed to calibrate device %s: %s', serial, e)
+            shell.close()
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, len(serials))) as executor:
+        results = [r for r in executor.map(connect, serials) if r is not None]
+    return [shell for shell, _ in results], [timing for _, timing in results]
+
+
+class _Fleet:
+    """
+    一组设备的 adb shell、测量结果和调度线程，由所有 AndroidFleetPlayer 共用
+
+    创建后在后台线程中连接并测量设备，完成前的按键被丢弃。
+    """
+
+    def __init__(self, command: list[str], serials: list[str], samples: int):
+        self.key = (tuple(command), tuple(serials), samples)
+        self.shells: list[AdbShell] = []
+        self.delays_ns: list[int] = []
+        self.ready = threading.Event()
+        # 测量完成但没有可用的设备
+        self.failed = False
+        # (到期时间, 序号, 设备下标, 命令, 发出按键的播放器)
+        self._heap: list[tuple[int, int, int, str, int]] = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._calibrate, args=(command, serials, samples), daemon=True,
+                         name='AndroidFleetCalibration').start()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True, name='AndroidFleet')
+        self._thread.start()
+
+    def _calibrate(self, command: list[str], serials: list[str], samples: int):
+        shells, timings = calibrate_devices(command, serials, samples)
+        if not shells:
+            logger.error('No Android device could be reached')
+            self.failed = True
+            return
+        max_latency = max(timing.latency_ns for timing in timings)
+        # 各设备推迟写入的时间，使点击同时生效
+        delays_ns = [max_latency - timing.latency_ns for timing in timings]
+        for timing, delay in zip(timings, delays_ns):
+            logger.info('Device %s: offset %.1fms, rtt %.1fms, input %.1fms, delay %.1fms', timing.serial,
+                        timing.offset_ns / 1e6, timing.rtt_ns / 1e6, timing.input_ns / 1e6, delay / 1e6)
+        with self._condition:
+            if self._closed:
+                for shell in shells:
+                    shell.close()
+                return
+            self.shells, self.delays_ns = shells, delays_ns
+        self.ready.set()
+
+    def usable(self) -> bool:
+        """仍在测量或至少还有一台设备连接着"""
+        if self._closed or self.failed:
+            return False
+        return not self.ready.is_set() or any(shell.process.poll() is None for shell in self.shells)
+
+    def press(self, command: str, owner: int) -> bool:
+        """按各设备的延迟安排一次点击，尚未测量完成时返回 False"""
+        if not self.ready.is_set():
+            return False
+        now = time.perf_counter_ns()
+        with self._condition:
+            for index, delay in enumerate(self.delays_ns):
+                self._sequence += 1
+                heapq.heappush(self._heap, (now + delay, self._sequence, index, command, owner))
+            self._condition.notify()
+        return True
+
+    def discard(self, owner: int) -> None:
+        """丢弃 owner 尚未发出的点击"""
+        with self._condition:
+            self._heap[:] = [item for item in self._heap if item[4] != owner]
+            heapq.heapify(self._heap)
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._heap and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                due = self._heap[0][0]
+                remaining = due - time.perf_counter_ns()
+                if remaining > _SPIN_NS:
+                    # 等待期间可能有更早到期的按键加入
+                    self._condition.wait((remaining - _SPIN_NS) / 1e9)
+                    continue
+                # 取出即将到期的全部点击，同一设备的合并为一行
+                batch: dict[int, list[str]] = {}
+                while self._heap and self._heap[0][0] <= due + _COALESCE_NS:
+                    _, _, index, command, _ = heapq.heappop(self._heap)
+                    batch.setdefault(index, []).append(command)
+            while time.perf_counter_ns() < due:
+                pass
+            for index, commands in batch.items():
+                self._send(index, ' & '.join(commands) + ' &')
+
+    def _send(self, index: int, line: str):
+        shell = self.shells[index]
+        if shell.process.poll() is not None:
+            return
+        try:
+            shell.write(line)
+        except OSError as e:
+            logger.error('Lost device %s: %s', shell.serial, e)
+            shell.close()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._heap.clear()
+            self._condition.notify()
+        self._thread.join(timeout=1)
+        for shell in self.shells:
+            shell.close()
+
+
+_fleet: _Fleet | None = None
+_fleet_lock = threading.Lock()
+
+
+def _get_fleet(conf: Config) -> _Fleet:
+    """adb.path、adb.devices 或测量次数变化，或设备全部断开时重新连接并测量，否则沿用已有的"""
+    global _fleet
+    command = adb_command(conf.adb.path)
+    key = (tuple(command), tuple(conf.adb.devices), conf.adb.calibration_samples)
+    with _fleet_lock:
+        if _fleet is None or _fleet.key != key or not _fleet.usable():
+            if _fleet is not None:
+                # 关闭 shell 时可能等待进程退出，不阻塞调用方
+                threading.Thread(target=_fleet.close, daemon=True).start()
+            _fleet = _Fleet(command, conf.adb.devices, conf.adb.calibration_samples)
+        return _fleet
+
+
+def prepare_fleet(conf: Config) -> None:
+    """player.type 为 android_fleet 时在后台连接并测量 adb.devices，首次播放时不必等待"""
+    if conf.player.type == 'android_fleet' and conf.adb.devices:
+        _get_fleet(conf)
+
+
+@atexit.register
+def _close_fleet():
+    if _fleet is not None:
+        _fleet.close()
+
+
+class AndroidFleetPlayer(Player):
+    """
+    发给 adb.devices 中所有设备的播放方式
+
+    连接和测量设备在后台进行，结果按设备列表缓存，切换歌曲时不再重复；测量完成前的按键被丢弃。
+    """
+    key_mapping = AndroidPlayer.key_mapping
+
+    def __init__(self, conf: Config):
+        super().__init__(conf)
+        if not conf.adb.devices:
+            raise ValueError('adb.devices is empty')
+        self.fleet = _get_fleet(conf)
+        self._warned = False
+
+    def press(self, key, conf):
+        position = self.key_mapping[key]
+        if not self.fleet.press(f'input tap {position["x"]} {position["y"]}', id(self)) and not self._warned:
+            self._warned = True
+            logger.warning('Android devices are still being calibrated, skipping presses')
+
+    def cleanup(self):
+        self.fleet.discard(id(self))
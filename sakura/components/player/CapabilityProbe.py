@@ -0,0 +1,69 @@
+import math
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from sakura.config import conf
+from sakura.config.Config import Capability
+from sakura.db.NoteCodec import KEY_COUNT
+from sakura.interface.Player import Player
+
+# 每次缩小和弦间隔的比例
+_GAP_STEP = 0.7
+
+
+def measure_capability(player: Player, key: str, presses: int = 30, samples: int = 5,
+                       chord_tolerance_ms: float = 30, workers: int = 15, gap_chords: int = 10) -> Capability:
+    """
+    实测播放方式的演奏能力，测量过程中会真实发送按键
+
+    - min_gap：与 SakuraPlayer 相同，按计划时间依次发送 gap_chords 个单音和弦，间隔从单次耗时的两倍起逐步缩小，
+      每个按键完成的时间都不晚于计划时间 + 单次耗时（取中位数）+ chord_tolerance_ms 的最小间隔
+    - max_nps：在 workers 个线程中并发发送 presses 次按键的吞吐量
+    - max_chord：并发发送 k 个按键时，全部完成的耗时不超过单次耗时 + chord_tolerance_ms 的最大 k
+
+    Args:
+        key: 传给 player.press 的按键
+    """
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        player.press(key, conf)
+        latencies.append(time.perf_counter() - start)
+    latency = statistics.median(latencies)
+    limit = latency + chord_tolerance_ms / 1000
+
+    def press(_=None) -> float:
+        player.press(key, conf)
+        return time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start = time.perf_counter()
+        list(executor.map(press, range(presses)))
+        max_nps = presses / max(time.perf_counter() - start, 1e-6)
+        max_chord = 1
+        for chord in range(2, KEY_COUNT + 1):
+            start = time.perf_counter()
+            list(executor.map(press, range(chord)))
+            if time.perf_counter() - start > limit:
+                break
+            max_chord = chord
+        gap = min_gap = max(2, math.ceil(latency * 2000))
+        while gap >= 1 and _keeps_up(executor, press, gap / 1000, gap_chords, limit):
+            min_gap = gap
+            gap = math.floor(gap * _GAP_STEP)
+    return Capability(max_nps=round(max_nps, 1), min_gap=min_gap, max_chord=max_chord)
+
+
+def _keeps_up(executor: ThreadPoolExecutor, press: Callable[[], float], gap: float, chords: int,
+              limit: float) -> bool:
+    """按 gap 秒的间隔发送 chords 个和弦，每个按键都在计划时间后 limit 秒内完成时返回 True"""
+    start = time.perf_counter() + gap
+    scheduled = []
+    for i in range(chords):
+        deadline = start + i * gap
+        if (remaining := deadline - time.perf_counter()) > 0:
+            time.sleep(remaining)
+        scheduled.append((deadline, executor.submit(press)))
+    return all(future.result() - deadline <= limit for deadline, future in scheduled)
@@ -5,9 +5,11 @@ from typing import Dict, List, Optional
 
 import pygame
 
-from sakura.config.sakura_logging import logger
+from sakura.config.sakura_logging import get_logger
 from sakura.interface.Player import Player
 
+logger = get_logger(__name__)
+
 
 class DemoPlayer(Player):
     key_mapping = {
@@ -111,7 +113,7 @@ class DemoPlayer(Player):
                 
                 self._audio_initialized = True
         except Exception as e:
-            logger.error(f"Failed to initialize audio: {e}")
+            logger.error("Failed to initialize audio: %s", e)
             raise
 
     def _find_available_channel(self) -> pygame.mixer.Channel:
@@ -142,7 +144,7 @@ class DemoPlayer(Player):
             channel.play(sound)
             
         except Exception as e:
-            logger.error(f"Error playing audio sound: {e}")
+            logger.error("Error playing audio sound: %s", e)
 
     def set_volume(self, volume: float):
         """Set volume for all sounds"""
@@ -152,7 +154,7 @@ class DemoPlayer(Player):
                 if sound:
                     sound.set_volume(volume)
         except Exception as e:
-            logger.error(f"Error setting volume: {e}")
+            logger.error("Error setting volume: %s", e)
 
     def cleanup(self):
         """Proper cleanup of audio resources"""
@@ -194,7 +196,7 @@ class DemoPlayer(Player):
                 self._audio_initialized = False
                 
         except Exception as e:
-            logger.error(f"Error in audio cleanup: {e}")
+            logger.error("Error in audio cleanup: %s", e)
             
     def __del__(self):
         """Destructor for guaranteed cleanup"""
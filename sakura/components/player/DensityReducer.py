@@ -0,0 +1,154 @@
+"""
+按播放方式的演奏能力简化乐谱
+
+播放方式跟不上时，按键会在线程池中堆积并延迟送达，整首歌都会走样。
+这里在编译音符时预先删减：和弦只保留最高的几个音，间隔过近的和弦按旋律优先保留一个，
+按键过密的片段先把和弦缩减为旋律音，仍然过密时再按时间网格抽稀。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from sakura.config.Config import Capability
+from sakura.db.NoteCodec import KEY_COUNT, notes_hash, encode_notes
+
+# 统计按键速度的滑动窗口，单位毫秒
+_WINDOW_MS = 1000
+# 缓存的简化结果数
+_CACHE_SIZE = 32
+_cache: OrderedDict[tuple, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def reduce_notes(times: np.ndarray, keys: np.ndarray, capability: Capability) -> tuple[np.ndarray, np.ndarray]:
+    """
+    简化后的音符，结果按 (歌曲内容, 演奏能力) 缓存
+
+    Args:
+        times: 已按 (time, key) 排序的音符时间，单位毫秒
+        keys: 琴键下标，越大音越高
+    """
+    cache_key = (notes_hash(encode_notes(times, keys)), capability.max_nps, capability.min_gap, capability.max_chord)
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            _cache.move_to_end(cache_key)
+            return cached
+    result = _reduce(np.asarray(times, dtype=np.int64), np.asarray(keys, dtype=np.int64), capability)
+    with _cache_lock:
+        _cache[cache_key] = result
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _reduce(times: np.ndarray, keys: np.ndarray, capability: Capability) -> tuple[np.ndarray, np.ndarray]:
+    if len(times) == 0:
+        return times, keys.astype(np.uint8)
+    # 同一时刻内按音高从高到低排列，靠前的是旋律音
+    order = np.lexsort((-keys, times))
+    times, keys = times[order], keys[order]
+    keep = _rank_in_chord(times) < max(1, capability.max_chord)
+    times, keys = times[keep], keys[keep]
+    if capability.min_gap > 0:
+        keep = _enforce_min_gap(times, keys, capability.min_gap)
+        times, keys = times[keep], keys[keep]
+    if capability.max_nps > 0:
+        keep = _enforce_max_rate(times, keys, capability.max_nps)
+        times, keys = times[keep], keys[keep]
+    # 恢复 (time, key) 升序
+    order = np.lexsort((keys, times))
+    return times[order], keys[order].astype(np.uint8)
+
+
+def _chord_starts(times: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, np.diff(times) != 0])
+
+
+def _rank_in_chord(times: np.ndarray) -> np.ndarray:
+    """每个音符在所在和弦中的序号，0 为和弦中最高的音"""
+    starts = _chord_starts(times)
+    sizes = np.diff(np.r_[starts, len(times)])
+    return np.arange(len(times)) - np.repeat(starts, sizes)
+
+
+def _chord_priority(top_keys: np.ndarray) -> np.ndarray:
+    """和弦的保留优先级：最高音越高越优先，与前一个和弦最高音相同的重复音视为装饰音"""
+    repeated = np.r_[False, top_keys[1:] == top_keys[:-1]]
+    return top_keys - repeated * KEY_COUNT
+
+
+def _enforce_min_gap(times: np.ndarray, keys: np.ndarray, min_gap: int) -> np.ndarray:
+    """
+    删除与前一个和弦间隔小于 min_gap 的和弦，每对冲突中保留优先级高的一个
+
+    连续的冲突中每轮处理互不相邻的第 1、3、5... 对，每轮约减少一半冲突。
+
+    Returns:
+        保留的音符的布尔掩码
+    """
+    starts = _chord_starts(times)
+    chord_times = times[starts]
+    priority = _chord_priority(keys[starts])
+    alive = np.arange(len(starts))
+    while len(alive) > 1:
+        gaps = np.diff(chord_times[alive])
+        bad = gaps < min_gap
+        if not bad.any():
+            break
+        positions = np.arange(len(bad))
+        # 每个冲突在所在连续冲突段中的序号
+        run_starts = np.maximum.accumulate(np.where(bad & ~np.r_[False, bad[:-1]], positions, 0))
+        pairs = np.flatnonzero(bad & ((positions - run_starts) % 2 == 0))
+        left, right = alive[pairs], alive[pairs + 1]
+        # 优先级相同时保留较早的和弦
+        drop = np.where(priority[right] > priority[left], left, right)
+        alive = np.setdiff1d(alive, drop, assume_unique=True)
+    kept_chords = np.zeros(len(starts), dtype=bool)
+    kept_chords[alive] = True
+    return np.repeat(kept_chords, np.diff(np.r_[starts, len(times)]))
+
+
+def _overloaded(times: np.ndarray, budget: int) -> np.ndarray:
+    """位于任意按键数超过 budget 的窗口内的音符"""
+    count = len(times)
+    window_ends = np.searchsorted(times, times + _WINDOW_MS, side='left')
+    over = np.flatnonzero(window_ends - np.arange(count) > budget)
+    # 差分数组标记 [over, window_ends[over]) 区间
+    marks = np.zeros(count + 1, dtype=np.int64)
+    np.add.at(marks, over, 1)
+    np.add.at(marks, window_ends[over], -1)
+    return np.cumsum(marks[:-1]) > 0
+
+
+def _enforce_max_rate(times: np.ndarray, keys: np.ndarray, max_nps: float) -> np.ndarray:
+    """
+    按键过密的片段先去掉和弦中旋律音以外的音，仍然过密时按时间网格每格保留优先级最高的一个和弦
+
+    网格只作用于过密的片段，与相邻片段交界处的窗口可能仍略超出限制。
+
+    Returns:
+        保留的音符的布尔掩码
+    """
+    budget = max(1, int(max_nps * _WINDOW_MS / 1000))
+    keep = np.ones(len(times), dtype=bool)
+    overloaded = _overloaded(times, budget)
+    if not overloaded.any():
+        return keep
+    keep &= ~overloaded | (_rank_in_chord(times) == 0)
+    index = np.flatnonzero(keep)
+    overloaded = _overloaded(times[index], budget)
+    if not overloaded.any():
+        return keep
+    # 网格宽度保证任意窗口最多覆盖 budget 个格子
+    cell = _WINDOW_MS / max(budget - 1, 0.5)
+    dense = index[overloaded]
+    cells = (times[dense] // cell).astype(np.int64)
+    priority = _chord_priority(keys[dense])
+    # 每格内按优先级从高到低排序，取第一个
+    order = np.lexsort((times[dense], -priority, cells))
+    first = np.r_[True, cells[order][1:] != cells[order][:-1]]
+    keep[dense] = False
+    keep[dense[order[first]]] = True
+    return keep
@@ -0,0 +1,216 @@
+"""
+按键记录与回放
+
+SakuraPlayer 发送给播放方式的每一次按键都可以以 (单调时钟纳秒, 琴键下标, 播放方式) 依次写入一个二进制文件，
+用于复现时序问题，或比较两次演奏（如修改调度前后）实际发出的按键。文件结构（小端）：
+
+    文件头    16 字节，见 _HEADER
+    记录      定长记录，见 RECORD_DTYPE，按发送顺序排列
+
+记录时只把打包好的 10 字节放入队列，由后台线程每隔 flush_interval 秒写入文件，不会在播放线程上做文件 I/O。
+进程异常退出时最多丢失最后 flush_interval 秒的记录，已写入的部分仍然可以读取。
+"""
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from sakura.config import conf
+from sakura.factory import player_mapper
+from sakura.interface.Player import Player
+
+TRACE_EXTENSION = '.saktrace'
+
+_MAGIC = b'SAKTRACE'
+_VERSION = 1
+# 魔数、版本、保留
+_HEADER = struct.Struct('<8sH6x')
+_RECORD = struct.Struct('<QBB')
+
+RECORD_DTYPE = np.dtype([('ns', '<u8'), ('key', 'u1'), ('backend', 'u1')])
+
+# 记录中的播放方式编号为在此元组中的下标，只能在末尾添加
+BACKENDS = ('win', 'android', 'demo', 'android_fleet')
+UNKNOWN_BACKEND = 255
+
+# 间隔不超过多少纳秒的按键视为同一个和弦
+CHORD_WINDOW_NS = 2_000_000
+
+_KEY_PATTERN = re.compile(r'Key(\d+)$')
+
+
+def key_indices(key_mapping: dict[str, str]) -> dict[str, int]:
+    """乐谱中的按键（如 1Key9）对应的琴键下标"""
+    return {key: int(match.group(1)) for key in key_mapping if (match := _KEY_PATTERN.search(key))}
+
+
+def backend_id(player: Player) -> int:
+    """播放方式在记录中的编号"""
+    class_name = type(player).__name__
+    for name, entry in player_mapper.items():
+        if entry['class'] == class_name and name in BACKENDS:
+            return BACKENDS.index(name)
+    return UNKNOWN_BACKEND
+
+
+def backend_name(backend: int) -> str:
+    return BACKENDS[backend] if backend < len(BACKENDS) else 'unknown'
+
+
+class PressTraceWriter:
+    """
+    写入按键记录，record 可以在多个线程中调用
+
+    每个文件只保存一次演奏，文件已存在时被覆盖：不同进程的单调时钟相互独立，追加的记录无法与原有记录一起回放。
+    """
+    # 写入文件的间隔，单位秒
+    flush_interval: float = 1.0
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+        self._pending: deque[bytes] = deque()
+        self._closed = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='PressTraceWriter')
+        self._thread.start()
+
+    def record(self, key: int, backend: int) -> None:
+        # deque.append 是原子的，不需要加锁
+        self._pending.append(_RECORD.pack(time.monotonic_ns(), key, backend))
+
+    def flush(self) -> None:
+        with self._write_lock:
+            if self._file.closed:
+                return
+            chunks = []
+            while self._pending:
+                chunks.append(self._pending.popleft())
+            if chunks:
+                self._file.write(b''.join(chunks))
+                self._file.flush()
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+        with self._write_lock:
+            self._file.close()
+
+
+def new_trace_path(directory: str) -> str:
+    """按当前时间生成不与已有文件重名的记录文件名"""
+    stem = os.path.join(directory, time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}')
+    path = stem + TRACE_EXTENSION
+    number = 0
+    while os.path.exists(path):
+        number += 1
+        path = f'{stem}-{number}{TRACE_EXTENSION}'
+    return path
+
+
+def read_trace(path: str) -> np.ndarray:
+    """
+    读取按键记录
+
+    Returns:
+        RECORD_DTYPE 数组，末尾不完整的记录会被忽略
+    """
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Not a press trace: {path}")
+        magic, version = _HEADER.unpack(header)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a press trace: {path}")
+        if version != _VERSION:
+            raise ValueError(f"Unsupported press trace version {version}: {path}")
+        data = f.read()
+    return np.frombuffer(data, dtype=RECORD_DTYPE, count=len(data) // RECORD_DTYPE.itemsize)
+
+
+def replay(records: np.ndarray, player: Player, key_names: list[str],
+           stopped: Callable[[], bool] = lambda: False, writer: PressTraceWriter = None) -> None:
+    """
+    按原来的时间间隔把记录中的按键发送给 player，与记录时使用的播放方式无关
+
+    Args:
+        key_names: 琴键下标对应的传给 player.press 的按键
+        writer: 同时把回放发出的按键记录下来，可以再与原记录比较
+    """
+    if not len(records):
+        return
+    # 无符号数相减在时间倒退时会回绕成极大的值
+    offsets = np.maximum(records['ns'].astype(np.int64) - np.int64(records['ns'][0]), 0)
+    backend = backend_id(player)
+    start = time.perf_counter_ns()
+    for offset, key in zip(offsets.tolist(), records['key'].tolist()):
+        if stopped():
+            return
+        remaining = start + offset - time.perf_counter_ns()
+        # 先粗略休眠，最后 2 毫秒忙等以减少 sleep 的误差
+        if remaining > 2_000_000:
+            time.sleep((remaining - 2_000_000) / 1e9)
+        while time.perf_counter_ns() < start + offset:
+            pass
+        if writer is not None:
+            writer.record(key, backend)
+        player.press(key_names[key], conf)
+
+
+class ChordDelta(NamedTuple):
+    index: int
+    # 和弦相对于记录开始的时间，单位毫秒，缺失时为 None
+    time_a: float | None
+    time_b: float | None
+    keys_a: tuple[int, ...]
+    keys_b: tuple[int, ...]
+
+    @property
+    def delta(self) -> float | None:
+        if self.time_a is None or self.time_b is None:
+            return None
+        return self.time_b - self.time_a
+
+
+def _chords(records: np.ndarray, window_ns: int) -> tuple[np.ndarray, list[tuple[int, ...]]]:
+    """把记录分组为和弦，返回 (各和弦相对于开始的毫秒数, 各和弦排序后的琴键)"""
+    if not len(records):
+        return np.empty(0), []
+    ns = records['ns'].astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, np.diff(ns) > window_ns])
+    keys = np.split(records['key'], starts[1:])
+    return (ns[starts] - ns[0]) / 1e6, [tuple(sorted(k.tolist())) for k in keys]
+
+
+def diff_traces(a: np.ndarray, b: np.ndarray, window_ns: int = CHORD_WINDOW_NS) -> list[ChordDelta]:
+    """
+    按顺序逐个比较两份记录中的和弦
+
+    Returns:
+        每个和弦的时间和琴键，和弦数不同时较短一方缺失的和弦时间为 None
+    """
+    times_a, keys_a = _chords(a, window_ns)
+    times_b, keys_b = _chords(b, window_ns)
+    result = []
+    for i in range(max(len(keys_a), len(keys_b))):
+        result.append(ChordDelta(
+            i,
+            float(times_a[i]) if i < len(keys_a) else None,
+            float(times_b[i]) if i < len(keys_b) else None,
+            keys_a[i] if i < len(keys_a) else (),
+            keys_b[i] if i < len(keys_b) else (),
+        ))
+    return result
@@ -0,0 +1,116 @@
+"""
+性能模式
+
+开启 scheduler.performance 后，SakuraPlayer 在播放期间：
+
+    - 加载乐谱后回收一次垃圾并 gc.freeze()，已加载的乐谱等对象之后不再被扫描，暂停后继续播放时不再重复
+    - 停止或限制循环垃圾回收（scheduler.gc），暂停、停止或播放完后恢复
+    - Linux 上把调度线程和发送按键的线程固定到 scheduler.cpu，并以 SCHED_FIFO 运行；
+      没有权限时改为降低 nice 值，仍然失败时只记录警告，不影响播放
+
+垃圾回收的设置对整个进程生效，多个 SakuraPlayer 同时播放时在最后一个结束后才恢复。
+"""
+import gc
+import os
+import sys
+import threading
+
+from sakura.config.sakura_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 没有实时优先级时退而求其次使用的 nice 值
+_FALLBACK_NICE = -10
+
+_gc_lock = threading.Lock()
+_gc_users = 0
+# 进入性能模式前的 (是否启用, 阈值)
+_gc_saved: tuple[bool, tuple[int, int, int]] | None = None
+# 是否有 gc.freeze() 冻结的对象
+_frozen = False
+
+
+def enter_gc_mode(mode: str, threshold: int, refreeze: bool = False) -> None:
+    """
+    Args:
+        mode: disable 停止循环垃圾回收，limit 把第 0 代的阈值提高到 threshold，其他值只冻结
+        refreeze: 加载了新的乐谱，重新回收并冻结；否则只在尚未冻结时回收并冻结
+    """
+    global _gc_users, _gc_saved, _frozen
+    with _gc_lock:
+        _gc_users += 1
+        if refreeze or not _frozen:
+            # 先解冻，上一首歌曲留下的垃圾也能被回收
+            gc.unfreeze()
+            gc.collect()
+            gc.freeze()
+            _frozen = True
+        if _gc_users > 1:
+            return
+        _gc_saved = (gc.isenabled(), gc.get_threshold())
+        if mode == 'disable':
+            gc.disable()
+        elif mode == 'limit':
+            gc.set_threshold(threshold, *_gc_saved[1][1:])
+
+
+def exit_gc_mode(unfreeze: bool = True) -> None:
+    """
+    Args:
+        unfreeze: 解冻对象，暂停时为 False，继续播放时不必重新回收
+    """
+    global _gc_users, _gc_saved, _frozen
+    with _gc_lock:
+        if _gc_users == 0:
+            return
+        _gc_users -= 1
+        if _gc_users or _gc_saved is None:
+            return
+        enabled, threshold = _gc_saved
+        _gc_saved = None
+        gc.set_threshold(*threshold)
+        if unfreeze:
+            gc.unfreeze()
+            _frozen = False
+        if enabled:
+            gc.enable()
+
+
+def tune_current_thread(cpu: int | None, priority: int) -> list[str]:
+    """
+    固定当前线程的 CPU 并提高优先级
+
+    Returns:
+        未能生效的设置的说明，全部生效时为空
+    """
+    if not sys.platform.startswith('linux'):
+        return [f"CPU affinity and priority are only tuned on Linux, not on {sys.platform}"]
+    problems = []
+    if cpu is not None:
+        try:
+            # pid 为 0 时只作用于当前线程
+            os.sched_setaffinity(0, {cpu})
+        except (OSError, ValueError) as e:
+            problems.append(f"Could not pin the thread to CPU {cpu}: {e}")
+    if priority > 0:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except OSError as e:
+            problems.append(f"Could not use SCHED_FIFO priority {priority}: {e}")
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), _FALLBACK_NICE)
+                problems.append(f"Using nice {_FALLBACK_NICE} instead")
+            except OSError as e:
+                problems.append(f"Could not lower nice to {_FALLBACK_NICE} either: {e}")
+    return problems
+
+
+_reported: set[str] = set()
+
+
+def tune_thread_or_warn(cpu: int | None, priority: int) -> None:
+    """tune_current_thread，并把未生效的设置记录为警告，同样的问题只记录一次"""
+    for problem in tune_current_thread(cpu, priority):
+        if problem not in _reported:
+            _reported.add(problem)
+            logger.warning('Performance mode: %s', problem)
@@ -1,24 +1,35 @@
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from itertools import groupby
-from queue import Queue, Empty
+from queue import Queue, Empty, SimpleQueue
 from typing import Callable, List
 
-from sakura.components.TimeManager import TimeManager
+from sakura.components.PlaybackClock import PlaybackClock
 from sakura.config import conf
-from sakura.config.sakura_logging import logger
+from sakura.config.Config import Capability
+from sakura.config.sakura_logging import get_logger
 from sakura.interface.Player import Player
+from sakura.metrics import (LATE_THRESHOLD, chords_scheduled, dropped_notes, late_notes, press_duration, queue_depth,
+                            scheduler_lateness)
+
+logger = get_logger(__name__)
+
+# 到期前最后多少秒忙等，sleep 的误差在 Windows 上可达 1-15 毫秒
+_SPIN = 0.001
+# 播放线程等待时检查暂停、跳转和停止的间隔，单位秒
+_CHECK_INTERVAL = 0.1
 
 
 class NoteEvent:
     """
     Represents a musical note event with timing and key information
     """
-    def __init__(self, time: int, keys: List[str]):
+    def __init__(self, time: int, keys: List[str], presses: tuple = ()):
         self.time = time  # Time in milliseconds
         self.keys = keys  # List of keys to be played
+        # 预先解析好的 (播放方式的按键, 琴键下标)，播放线程上不再查找映射
+        self.presses = presses
 
 class EventQueue:
     """
@@ -45,6 +56,10 @@ class EventQueue:
         """Check if the queue is empty"""
         return self.queue.empty()
 
+    def qsize(self):
+        """Approximate number of queued events"""
+        return self.queue.qsize()
+
     def clear(self):
         """Clear all events from the queue"""
         with self._lock:
@@ -65,15 +80,19 @@ class SakuraPlayer:
     """
     Main player class for handling music playback and note events
     """
-    def __init__(self, song_notes: list, time_manager: TimeManager, cb: Callable[[], None] = lambda: None):
+    def __init__(self, song_notes: list, time_manager: PlaybackClock, cb: Callable[[], None] = lambda: None,
+                 capability: Capability = None):
         """
         Initialize the player with song notes and time management
         
         Args:
             song_notes: List of note events for the song
-            time_manager: TimeManager instance for handling playback timing
+            time_manager: Clock for handling playback timing, TimeManager when used with Qt
             cb: Optional callback function called when playback finishes
+            capability: If given, notes are thinned to what the backend can play on time
         """
+        if capability is not None:
+            song_notes = self._reduce_notes(song_notes, capability)
         self.event_queue = EventQueue()
         self.time_manager = time_manager
         self.cb = cb
@@ -82,6 +101,11 @@ class SakuraPlayer:
         self.player = None
         self.key_mapping = None
         self.last_time = 0
+        # 发出的按键的记录，为 None 时不记录，见 PressTrace
+        self.trace = None
+        self._key_indices: dict[str, int] = {}
+        # 性能模式下的垃圾回收设置是否已生效，见 Realtime
+        self._performance_active = False
         
         self._song_notes = song_notes
         self._playback_thread = None
@@ -90,21 +114,48 @@ class SakuraPlayer:
         self._seek_lock = threading.Lock()
         self._shutdown = threading.Event()
 
+    @staticmethod
+    def _reduce_notes(song_notes: list, capability: Capability) -> list:
+        """
+        Thin chords and dense passages the backend cannot keep up with
+
+        Args:
+            song_notes: List of note events for the song
+            capability: Measured or configured capability of the backend
+        Returns:
+            Reduced note events, sorted by time
+        """
+        # numpy 较重，只在需要简化时导入
+        from sakura.components.player.DensityReducer import reduce_notes
+        from sakura.db.NoteCodec import normalize_notes, to_song_notes
+        times, keys = normalize_notes(song_notes)
+        reduced_times, reduced_keys = reduce_notes(times, keys, capability)
+        if len(reduced_times) < len(times):
+            logger.info('Reduced %d notes to %d for %s nps, %dms gap, %d-key chords', len(times),
+                        len(reduced_times), capability.max_nps, capability.min_gap, capability.max_chord)
+        return to_song_notes(reduced_times, reduced_keys)
+
     @contextmanager
-    def _thread_pool(self, max_workers: int = 15):
+    def _press_threads(self, workers: int = 15):
         """
-        Context manager for thread pool execution
-        
+        Start the threads that press keys for the playback worker
+
+        The playback worker puts the pre-built (backend key, key index) tuples of NoteEvent.presses
+        into the yielded queue, so dispatching a chord creates no Future or work item.
+
         Args:
-            max_workers: Maximum number of concurrent worker threads
+            workers: Number of concurrent press threads
         """
+        presses = SimpleQueue()
+        threads = [threading.Thread(target=self._press_loop, args=(presses,), daemon=True, name='SakuraPress')
+                   for _ in range(workers)]
+        for thread in threads:
+            thread.start()
         try:
-            self._executor = ThreadPoolExecutor(max_workers=max_workers)
-            yield self._executor
+            yield presses
         finally:
-            if self._executor:
-                self._executor.shutdown(wait=False)
-                self._executor = None
+            for _ in threads:
+                presses.put(None)
 
     def _prepare_notes(self, start_time: int = 0) -> List[NoteEvent]:
         """
@@ -120,10 +171,39 @@ class SakuraPlayer:
             if note['time'] >= start_time
         ]
         
-        return [
-            NoteEvent(t, [note['key'] for note in group])
-            for t, group in groupby(filtered_notes, key=lambda x: x['time'])
-        ]
+        events = []
+        for t, group in groupby(filtered_notes, key=lambda x: x['time']):
+            keys = [note['key'] for note in group]
+            events.append(NoteEvent(t, keys, self._resolve_presses(keys)))
+        return events
+
+    def _resolve_presses(self, keys: List[str]) -> tuple:
+        """Map the keys of a chord to backend keys and trace indices, skipping unmapped keys"""
+        key_mapping = self.key_mapping or {}
+        return tuple((key_mapping[key], self._key_indices.get(key, 0)) for key in keys if key_mapping.get(key))
+
+    @staticmethod
+    def _tune_thread():
+        from sakura.components.player.Realtime import tune_thread_or_warn
+        tune_thread_or_warn(conf.scheduler.cpu, conf.scheduler.priority)
+
+    def _enter_performance_mode(self, loaded: bool = False):
+        """
+        Freeze and pause the garbage collector while playing, see Realtime
+
+        Args:
+            loaded: Notes were just loaded and need to be frozen, False when resuming
+        """
+        if conf.scheduler.performance and not self._performance_active:
+            from sakura.components.player.Realtime import enter_gc_mode
+            enter_gc_mode(conf.scheduler.gc, conf.scheduler.gc_threshold, refreeze=loaded)
+            self._performance_active = True
+
+    def _exit_performance_mode(self, unfreeze: bool = True):
+        if self._performance_active:
+            from sakura.components.player.Realtime import exit_gc_mode
+            exit_gc_mode(unfreeze)
+            self._performance_active = False
 
     def _safe_stop_thread(self, thread: threading.Thread, timeout: float = 0.5):
         """
@@ -143,17 +223,31 @@ class SakuraPlayer:
         Main worker thread for handling playback events
         Processes events from queue and triggers note playback
         """
-        with self._thread_pool() as executor:
-            while not self.is_finished and not self._shutdown.is_set():
+        if conf.scheduler.performance:
+            self._tune_thread()
+        # 循环中用到的对象预先取出，每个和弦不再创建或查找
+        event_queue = self.event_queue
+        time_manager = self.time_manager
+        seek_event = self._seek_event
+        shutdown = self._shutdown
+        perf_counter = time.perf_counter
+        sleep = time.sleep
+        trace_backend_id = self._trace_backend_id
+        trace_player = None
+        trace = None
+        backend = 0
+        with self._press_threads() as press_queue:
+            put_press = press_queue.put
+            while not self.is_finished and not shutdown.is_set():
                 try:
                     # Skip processing if seeking is in progress
-                    if self._seeking or self._seek_event.is_set():
-                        time.sleep(0.1)
+                    if self._seeking or seek_event.is_set():
+                        sleep(_CHECK_INTERVAL)
                         continue
                     
                     try:
                         # Try to get next event from queue with timeout
-                        event = self.event_queue.get(block=True, timeout=0.1)
+                        event = event_queue.get(block=True, timeout=_CHECK_INTERVAL)
                     except Empty:
                         # Check if song has ended when queue is empty
                         current_time = self.time_manager.get_current_time()
@@ -166,46 +260,87 @@ class SakuraPlayer:
                             self.callback()  # Update UI via callback
                         continue
                     
+                    queue_depth.set(event_queue.qsize())
                     # Get current playback time
-                    current_time = self.time_manager.get_current_time()
+                    current_time = time_manager.get_current_time()
                     
                     # Skip events that are in the past
                     if event.time < current_time:
+                        dropped_notes.inc(len(event.keys))
                         continue
                     
-                    # Calculate wait time until next event
-                    wait_time = (event.time - current_time) / 1000
-                    elapsed_time = 0
-                    
-                    # Wait loop with periodic checks for seek/stop requests
-                    while elapsed_time < wait_time:
-                        if self._seek_event.is_set() or self._shutdown.is_set():
-                            break
+                    # 到期时刻按播放速度换算，等待期间只与 perf_counter 比较，分段 sleep 的误差不会累积
+                    deadline = perf_counter() + (event.time - current_time) / 1000 / time_manager.get_rate()
+                    while not seek_event.is_set() and not shutdown.is_set():
                         if not self.is_playing:
-                            time.sleep(0.1)
+                            paused_at = perf_counter()
+                            sleep(_CHECK_INTERVAL)
+                            # 暂停期间的等待不计入延迟
+                            deadline += perf_counter() - paused_at
                             continue
-                        sleep_time = min(0.1, wait_time - elapsed_time)
-                        time.sleep(sleep_time)
-                        elapsed_time += sleep_time
+                        remaining = deadline - perf_counter()
+                        if remaining <= 0:
+                            break
+                        if remaining > _SPIN:
+                            sleep(min(_CHECK_INTERVAL, remaining - _SPIN))
 
                     # Skip event processing if seeking or shutdown requested
-                    if self._seek_event.is_set() or self._shutdown.is_set():
+                    if seek_event.is_set() or shutdown.is_set():
                         continue
                     
+                    lateness = perf_counter() - deadline
+                    scheduler_lateness.observe(lateness)
+                    if lateness > LATE_THRESHOLD:
+                        late_notes.inc(len(event.keys))
+                    chords_scheduled.inc()
+
                     # Update current time to event time
-                    self.time_manager.set_current_time(event.time)
+                    time_manager.set_current_time(event.time)
                     
-                    # Process each key in the event and submit to thread pool
-                    for key in event.keys:
-                        if mapped_key := self.key_mapping.get(key):
-                            if not self._seek_event.is_set():
-                                executor.submit(self.player.press, mapped_key, conf)
+                    # 播放方式或记录可能在播放中切换或开启，变化后才重新查找记录编号
+                    if self.trace is not trace or self.player is not trace_player:
+                        trace = self.trace
+                        trace_player = self.player
+                        backend = trace_backend_id() if trace is not None else 0
+                    # 预先解析好的按键直接交给发送按键的线程
+                    for item in event.presses:
+                        if seek_event.is_set():
+                            break
+                        if trace is not None:
+                            trace.record(item[1], backend)
+                        put_press(item)
                     
                 except Exception as e:
-                    logger.error(f"Error in playback worker: {e}")
-                    if not self._seek_event.is_set():
+                    logger.error("Error in playback worker: %s", e)
+                    if not seek_event.is_set():
                         break
 
+    def _trace_backend_id(self) -> int:
+        from sakura.components.player.PressTrace import backend_id
+        return backend_id(self.player)
+
+    def _press_loop(self, presses: SimpleQueue):
+        """Press keys on the current backend and record how long each press took, until None is received"""
+        # 性能模式下发送按键的线程与调度线程使用相同的 CPU 和优先级
+        if conf.scheduler.performance:
+            self._tune_thread()
+        press_player = None
+        press_timer = None
+        while (item := presses.get()) is not None:
+            player = self.player
+            if player is None:
+                continue
+            if player is not press_player:
+                press_player = player
+                press_timer = press_duration.labels(type(player).__name__)
+            start = time.perf_counter()
+            try:
+                player.press(item[0], conf)
+            except Exception as e:
+                logger.error('Error pressing %s: %s', item[0], e)
+            finally:
+                press_timer.observe(time.perf_counter() - start)
+
     def play(self, player: Player, key_mapping: dict, start_time: int = None):
         """
         Start playback from specified position
@@ -220,16 +355,23 @@ class SakuraPlayer:
         self.player = player
         self.key_mapping = key_mapping
         self.is_finished = False
-        self.is_playing = True
-        
-        start_ms = (start_time or 0) * 1000
-        self.time_manager.set_current_time(start_ms)
-        self.time_manager.set_duration(self.last_time)
-        self.time_manager.set_playing(True)
+        if self.trace is None and conf.trace.enabled:
+            self.trace = self._open_trace()
+        if self.trace is not None:
+            from sakura.components.player.PressTrace import key_indices
+            self._key_indices = key_indices(key_mapping)
         
+        start_ms = int((start_time or 0) * 1000)
         # Load all notes at once
         notes = self._prepare_notes(start_ms)
         self.event_queue.load_all(notes)
+        # 乐谱加载完后再冻结垃圾回收
+        self._enter_performance_mode(loaded=True)
+
+        self.is_playing = True
+        self.time_manager.set_current_time(start_ms)
+        self.time_manager.set_duration(self.last_time)
+        self.time_manager.set_playing(True)
         
         # Start only the playback thread
         self._playback_thread = threading.Thread(
@@ -238,10 +380,20 @@ class SakuraPlayer:
         )
         self._playback_thread.start()
 
+    @staticmethod
+    def _open_trace():
+        # numpy 较重，只在记录按键时导入
+        from sakura.components.player.PressTrace import PressTraceWriter, new_trace_path
+        path = new_trace_path(conf.trace.path)
+        logger.info('Recording presses to %s', path)
+        return PressTraceWriter(path)
+
     def pause(self):
         """Pause the current playback"""
         self.is_playing = False
         self.time_manager.set_playing(False)
+        # 继续播放时乐谱未变，保持冻结
+        self._exit_performance_mode(unfreeze=False)
 
     def continue_play(self):
         """Resume playback from current position"""
@@ -254,6 +406,7 @@ class SakuraPlayer:
             self.is_finished = False
             self.seek(0)  # Rewind to the beginning
         
+        self._enter_performance_mode()
         self.is_playing = True
         self.time_manager.set_playing(True)
 
@@ -282,9 +435,10 @@ class SakuraPlayer:
                 
             self._seek_event.clear()
             self._shutdown.clear()
+            self._exit_performance_mode()
             
         except Exception as e:
-            logger.error(f"Error stopping playback: {e}")
+            logger.error("Error stopping playback: %s", e)
 
     def seek(self, position_ms: int):
         """
@@ -337,7 +491,7 @@ class SakuraPlayer:
             if self.cb:
                 self.cb()
         except Exception as e:
-            logger.error(f"Error in player callback: {e}")
+            logger.error("Error in player callback: %s", e)
 
     def cleanup(self, force=False):
         """
@@ -349,6 +503,7 @@ class SakuraPlayer:
         try:
             # Stop playback
             self.is_playing = False
+            self._exit_performance_mode()
             
             if force:
                 self.is_finished = True
@@ -368,6 +523,10 @@ class SakuraPlayer:
                 if self.player:
                     self.player.cleanup()
                     self.player = None
+
+                if self.trace is not None:
+                    self.trace.close()
+                    self.trace = None
                     
                 # Clear all references to data
                 self._song_notes = None
@@ -380,7 +539,7 @@ class SakuraPlayer:
                 self._seeking = False
                 
         except Exception as e:
-            logger.error(f"Error in cleanup: {e}")
+            logger.error("Error in cleanup: %s", e)
 
     def __del__(self):
         """Destructor ensuring cleanup is called"""
@@ -0,0 +1,405 @@
+"""
+在独立进程中调度音符
+
+调度线程与界面线程、全局快捷键和日志共用一个 GIL，界面上耗时的操作（刷新歌曲列表、导入乐谱、垃圾回收）都会让音符迟到。
+开启 scheduler.process 后，时钟、SakuraPlayer 和播放方式都在子进程中运行，界面进程只通过 SharedRing 发送命令、
+读取播放位置，界面的任何操作都不会影响按键的时间。
+
+子进程在第一次播放时启动，之后所有歌曲共用。每首歌曲的音符和按键映射序列化后放在单独的共享内存中，由 LOAD 命令传递。
+"""
+import atexit
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable
+
+from sakura.components.PlaybackClock import PlaybackClock
+from sakura.components.player.SharedRing import Command, SharedRing, Status
+from sakura.config.Config import Capability
+from sakura.config.sakura_logging import get_logger
+
+logger = get_logger(__name__)
+
+LOAD, PLAY, PAUSE, RESUME, SEEK, RATE, VOLUME, BACKEND, STOP, QUIT = range(1, 11)
+# 失败后界面应当停止播放的命令
+_STARTING = {LOAD, PLAY, RESUME, BACKEND}
+
+# 界面进程同步播放位置和速度的间隔，单位秒
+_MIRROR_INTERVAL = 0.01
+# 子进程没有命令时的轮询间隔，单位秒
+_POLL_INTERVAL = 0.001
+
+
+def _scheduler_log_file(file: str) -> str:
+    """子进程使用单独的日志文件，避免两个进程同时轮转同一个文件"""
+    root, ext = os.path.splitext(file)
+    return f'{root}.scheduler{ext}'
+
+
+class _Scheduler:
+    """子进程中执行命令，只有主线程读取命令环"""
+
+    def __init__(self, ring: SharedRing):
+        self.ring = ring
+        self.clock = PlaybackClock()
+        self.sakura_player = None
+        self.key_mapping: dict = {}
+        self.finished = 0
+        self.loaded = 0
+        self.failed = 0
+        # 时钟线程和主线程都会发布状态，seqlock 只允许一个写入方
+        self._publish_lock = threading.Lock()
+        self.clock.add_listener(lambda _: self.publish())
+
+    def publish(self):
+        with self._publish_lock:
+            self.ring.publish(Status(self.clock.get_current_time(), self.clock.is_playing(), self.finished,
+                                     self.loaded, self.failed))
+
+    def _on_finished(self):
+        self.finished += 1
+        self.publish()
+
+    def run(self):
+        parent = multiprocessing.parent_process()
+        last_check = time.monotonic()
+        while True:
+            command = self.ring.get()
+            if command is None:
+                time.sleep(_POLL_INTERVAL)
+                # 界面进程意外退出时随之退出
+                if time.monotonic() - last_check > 1:
+                    last_check = time.monotonic()
+                    if parent is not None and not parent.is_alive():
+                        command = Command(QUIT)
+                    else:
+                        continue
+                else:
+                    continue
+            if command.op == QUIT:
+                self._stop()
+                return
+            try:
+                self.execute(command)
+            except Exception as e:
+                logger.error('Error executing scheduler command %s: %s', command, e)
+                if command.op in _STARTING:
+                    self._fail()
+
+    def _fail(self):
+        """停止播放并通知界面进程，界面据此重置播放按钮"""
+        if self.sakura_player is not None:
+            self.sakura_player.pause()
+        self.clock.set_playing(False)
+        self.failed += 1
+        self.publish()
+
+    def execute(self, command: Command):
+        from sakura.config import conf
+        from sakura.factory.PlayerFactory import get_player
+        player = self.sakura_player
+        if command.op == LOAD:
+            try:
+                self._load(command.text, command.a)
+            finally:
+                # 加载失败时界面也要据此释放共享内存、收到失败通知
+                self.loaded = command.c
+            self.publish()
+        elif player is None:
+            return
+        elif command.op == PLAY:
+            player.play(get_player(command.text, conf), self.key_mapping, command.a / 1000)
+        elif command.op == PAUSE:
+            player.pause()
+        elif command.op == RESUME:
+            player.continue_play()
+        elif command.op == SEEK:
+            player.seek(command.a)
+        elif command.op == RATE:
+            self.clock.set_rate(command.x)
+        elif command.op == VOLUME:
+            # 只有能调节音量的播放方式（如 DemoPlayer）提供 set_volume
+            if hasattr(player.player, 'set_volume'):
+                player.player.set_volume(command.x)
+        elif command.op == BACKEND and player.player is not None:
+            old_backend = player.player
+            player.player = get_player(command.text, conf)
+            threading.Thread(target=old_backend.cleanup, daemon=True).start()
+        elif command.op == STOP:
+            player.cleanup(force=True)
+        self.publish()
+
+    def _load(self, name: str, size: int):
+        from sakura.components.player.SakuraPlayer import SakuraPlayer
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            song_notes, self.key_mapping, last_time = pickle.loads(bytes(block.buf[:size]))
+        finally:
+            block.close()
+        self._stop()
+        self.sakura_player = SakuraPlayer(song_notes, self.clock, self._on_finished)
+        self.sakura_player.last_time = last_time
+
+    def _stop(self):
+        if self.sakura_player is not None:
+            self.sakura_player.cleanup(force=True)
+            self.sakura_player = None
+
+
+def _run(ring_name: str):
+    """子进程入口"""
+    from sakura.config import _apply_logging, conf, config_service
+    from sakura.config.sakura_logging import configure_logging
+
+    def apply_logging(changed: set[str] = None):
+        if changed is None or any(key.startswith('logging.') for key in changed):
+            configure_logging(conf.logging.model_copy(update={'file': _scheduler_log_file(conf.logging.file)}))
+
+    def prepare_backend(changed: set[str] = None):
+        # 多设备演奏在收到播放命令前就连接并测量设备
+        if changed is None or any(key == 'player.type' or key.startswith('adb.') for key in changed):
+            from sakura.components.player.AndroidFleet import prepare_fleet
+            prepare_fleet(conf)
+
+    apply_logging()
+    prepare_backend()
+    config_service.unsubscribe(_apply_logging)
+    config_service.subscribe(apply_logging)
+    config_service.subscribe(prepare_backend)
+    # 界面中修改的配置写入 config.yaml 后在子进程中同样生效
+    config_service.start_watching()
+    ring = SharedRing(ring_name)
+    logger.info('Scheduler process %d started', os.getpid())
+    try:
+        _Scheduler(ring).run()
+    finally:
+        ring.close()
+
+
+class SchedulerProcess:
+    """界面进程中的子进程句柄，同一时间只有 current 一首歌曲接收播放位置"""
+
+    def __init__(self, capacity: int):
+        self.ring = SharedRing(capacity=capacity, create=True)
+        # 打包后的 Windows 程序只支持 spawn
+        self.process = multiprocessing.get_context('spawn').Process(
+            target=_run, args=(self.ring.name,), daemon=True, name='SakuraScheduler')
+        self.process.start()
+        self.current: RemoteSakuraPlayer | None = None
+        self._send_lock = threading.Lock()
+        self._token = 0
+        # 尚未被子进程读取的歌曲数据 (编号, 共享内存)
+        self._blocks: list[tuple[int, shared_memory.SharedMemory]] = []
+        self._rate = None
+        self._closed = False
+        threading.Thread(target=self._mirror, daemon=True, name='SchedulerMirror').start()
+
+    def send(self, op: int, a: int = 0, x: float = 0.0, text: str = '') -> None:
+        with self._send_lock:
+            self.ring.put(Command(op, a, 0, 0, x, text))
+
+    def load(self, player: 'RemoteSakuraPlayer', payload: bytes) -> int:
+        """把歌曲交给子进程，返回歌曲编号"""
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(payload)))
+        block.buf[:len(payload)] = payload
+        with self._send_lock:
+            self._token += 1
+            token = self._token
+            self._blocks.append((token, block))
+            self.current = player
+            self.ring.put(Command(LOAD, len(payload), 0, token, 0.0, block.name))
+        return token
+
+    def alive(self) -> bool:
+        return not self._closed and self.process.is_alive()
+
+    def status(self) -> Status:
+        """子进程最近发布的状态，子进程已退出时抛出 RuntimeError"""
+        while True:
+            try:
+                return self.ring.read_status()
+            except TimeoutError:
+                if not self.process.is_alive():
+                    raise RuntimeError(f'Scheduler process exited with code {self.process.exitcode}')
+
+    def _mirror(self):
+        """把子进程的播放位置同步到界面的时钟，并把界面上修改的速度发给子进程"""
+        while not self._closed:
+            time.sleep(_MIRROR_INTERVAL)
+            try:
+                if not self.process.is_alive():
+                    raise RuntimeError(f'Scheduler process exited with code {self.process.exitcode}')
+                status = self.status()
+            except RuntimeError as e:
+                logger.error('%s', e)
+                return
+            self._release_blocks(status.loaded)
+            current = self.current
+            if current is None or status.loaded != current.token:
+                continue
+            rate = current.time_manager.get_rate()
+            if rate != self._rate:
+                self._rate = rate
+                self.send(RATE, x=rate)
+            current.sync(status)
+
+    def _release_blocks(self, loaded: int):
+        while self._blocks and self._blocks[0][0] <= loaded:
+            _, block = self._blocks.pop(0)
+            block.close()
+            block.unlink()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.send(QUIT)
+        except (TimeoutError, ValueError):
+            pass
+        self._closed = True
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._release_blocks(self._token)
+        self.ring.close(unlink=True)
+
+
+_scheduler: SchedulerProcess | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> SchedulerProcess:
+    """共用的调度子进程，未启动或已退出时启动"""
+    global _scheduler
+    from sakura.config import conf
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.alive():
+            if _scheduler is not None:
+                _scheduler.close()
+            _scheduler = SchedulerProcess(conf.scheduler.ring_size)
+            atexit.register(_scheduler.close)
+        return _scheduler
+
+
+class RemoteSakuraPlayer:
+    """
+    与 SakuraPlayer 接口相同，实际在调度子进程中播放
+
+    play 的第一个参数为播放方式的名称（player.type），由子进程创建播放方式。
+    time_manager 只用于显示，由子进程的播放位置校准。
+    """
+
+    def __init__(self, song_notes: list, time_manager: PlaybackClock, cb: Callable[[], None] = lambda: None,
+                 capability: Capability = None, on_error: Callable[[], None] = None):
+        """
+        Args:
+            on_error: 子进程中播放、继续播放或切换播放方式失败时在同步线程中调用，原因见 sap.scheduler.log
+        """
+        if capability is not None:
+            from sakura.components.player.SakuraPlayer import SakuraPlayer
+            song_notes = SakuraPlayer._reduce_notes(song_notes, capability)
+        self._song_notes = song_notes
+        self.time_manager = time_manager
+        self.cb = cb
+        self.on_error = on_error
+        self.is_playing = False
+        self.is_finished = False
+        # 播放方式在子进程中，界面进程中始终为 None
+        self.player = None
+        self.last_time = 0
+        self.token = 0
+        self._scheduler: SchedulerProcess | None = None
+        self._finished_seen = 0
+        self._failed_seen = 0
+        # 最近一次 play 的参数，子进程换成其他歌曲后继续播放时重新加载
+        self._backend = ''
+        self._key_mapping: dict = {}
+
+    def play(self, player: str, key_mapping: dict, start_time: int = None):
+        self._backend = player
+        self._key_mapping = key_mapping
+        scheduler = get_scheduler()
+        payload = pickle.dumps((self._song_notes, key_mapping, self.last_time), pickle.HIGHEST_PROTOCOL)
+        status = scheduler.status()
+        self._finished_seen = status.finished
+        self._failed_seen = status.failed
+        self.token = scheduler.load(self, payload)
+        self._scheduler = scheduler
+        start_ms = int((start_time or 0) * 1000)
+        scheduler.send(PLAY, start_ms, text=player)
+        self.is_playing = True
+        self.is_finished = False
+        self.time_manager.set_current_time(start_ms)
+        self.time_manager.set_duration(self.last_time)
+        self.time_manager.set_playing(True)
+
+    def sync(self, status: Status):
+        """在同步线程中调用"""
+        if status.failed != self._failed_seen:
+            self._failed_seen = status.failed
+            self.is_playing = False
+            self.time_manager.set_playing(False)
+            self.time_manager.set_current_time(status.position)
+            from sakura.config import conf
+            logger.error('Scheduler process failed to play, see %s', _scheduler_log_file(conf.logging.file))
+            if self.on_error:
+                self.on_error()
+            return
+        if status.finished != self._finished_seen:
+            self._finished_seen = status.finished
+            self.is_finished = True
+            self.is_playing = False
+            self.time_manager.set_playing(False)
+            self.time_manager.force_set_time(0)
+            if self.cb:
+                self.cb()
+            return
+        if self.is_playing:
+            self.time_manager.set_current_time(status.position)
+
+    def _send(self, op: int, a: int = 0, x: float = 0.0, text: str = ''):
+        if self._scheduler is not None and self._scheduler.current is self:
+            self._scheduler.send(op, a, x, text)
+
+    def pause(self):
+        self.is_playing = False
+        self.time_manager.set_playing(False)
+        self._send(PAUSE)
+
+    def continue_play(self):
+        if self._scheduler is None:
+            logger.error("Player or key mapping not initialized")
+            return
+        if self._scheduler.current is not self or not self._scheduler.alive():
+            # 子进程中已是其他歌曲或子进程已退出，重新加载
+            start_ms = 0 if self.is_finished else self.time_manager.get_current_time()
+            self.play(self._backend, self._key_mapping, start_ms / 1000)
+            return
+        if self.is_finished:
+            self.is_finished = False
+            self.seek(0)
+        self.is_playing = True
+        self.time_manager.set_playing(True)
+        self._send(RESUME)
+
+    def seek(self, position_ms: int):
+        self.time_manager.force_set_time(position_ms)
+        self._send(SEEK, position_ms)
+
+    def set_volume(self, volume: float):
+        self._send(VOLUME, x=volume)
+
+    def switch_backend(self, player: str):
+        self._send(BACKEND, text=player)
+
+    def cleanup(self, force=False):
+        """与 SakuraPlayer 相同，只有 force 时才释放子进程中的歌曲，播放完后仍可以继续播放"""
+        self.is_playing = False
+        if not force:
+            return
+        self._send(STOP)
+        if self._scheduler is not None and self._scheduler.current is self:
+            self._scheduler.current = None
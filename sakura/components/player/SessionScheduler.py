@@ -0,0 +1,267 @@
+"""
+单线程多会话调度
+
+每个 SakuraPlayer 有自己的调度线程、15 个发送按键的线程，TimeManager 还有一个推进时间的线程，同时播放多首歌曲
+（预览、多台设备、测试）时线程数成倍增长。SessionScheduler 用一个线程服务任意数量的 PlaybackSession：
+
+    - 每个会话的时钟由 (锚点时刻, 锚点位置, 速度) 计算得出，不需要推进时间的线程
+    - 所有会话的下一个和弦按到期时间放在同一个堆中，调度线程只等待最早的一个
+    - 暂停、跳转、改变速度时会话的 generation 加 1，堆中旧的条目在取出时丢弃，不需要在堆中查找删除
+    - 按键交给共用的固定大小线程池发送，press_workers 为 0 时直接在调度线程中发送
+
+线程数只与 press_workers 有关，与会话数无关。同一首歌曲的 Timeline 可以被多个会话共用。
+"""
+import heapq
+import math
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence
+
+import numpy as np
+
+from sakura.config import conf
+from sakura.config.sakura_logging import get_logger
+from sakura.interface.Player import Player
+from sakura.metrics import LATE_THRESHOLD, chords_scheduled, late_notes, press_duration, scheduler_lateness
+
+logger = get_logger(__name__)
+
+
+class Timeline:
+    """按和弦分组的乐谱，创建后不再修改，可以被多个会话共用"""
+
+    def __init__(self, times: np.ndarray, keys: np.ndarray, key_names: Sequence[str]):
+        """
+        Args:
+            times: normalize_notes 得到的按时间排序的毫秒数
+            keys: 对应的琴键下标
+            key_names: 琴键下标对应的传给 player.press 的按键
+        """
+        starts = np.flatnonzero(np.r_[True, np.diff(times) > 0]) if len(times) else np.empty(0, dtype=int)
+        self.times: list[int] = times[starts].tolist() if len(times) else []
+        # 每个和弦的 (播放方式的按键, 琴键下标)
+        self.presses: list[tuple[tuple[str, int], ...]] = [
+            tuple((key_names[key], key) for key in chord.tolist())
+            for chord in np.split(keys, starts[1:])
+        ] if len(times) else []
+        self.duration = self.times[-1] if self.times else 0
+
+    def __len__(self):
+        return len(self.times)
+
+
+class PlaybackSession:
+    """一次独立的播放，方法可以在任意线程中调用，状态由 SessionScheduler 的锁保护"""
+
+    def __init__(self, scheduler: 'SessionScheduler', timeline: Timeline, player: Player,
+                 callback: Callable[[], None] = None, rate: float = 1.0, trace=None):
+        self.scheduler = scheduler
+        self.timeline = timeline
+        self.player = player
+        self.callback = callback
+        # 发出的按键的记录，见 PressTrace
+        self.trace = trace
+        self.rate = rate
+        self.is_playing = False
+        self.is_finished = False
+        self.index = 0
+        self.generation = 0
+        self._anchor_ns = time.perf_counter_ns()
+        self._anchor_ms = 0.0
+        self._press_timer = press_duration.labels(type(player).__name__)
+        self._backend = 0
+        if trace is not None:
+            from sakura.components.player.PressTrace import backend_id
+            self._backend = backend_id(player)
+
+    def _position(self, now_ns: int) -> float:
+        if not self.is_playing:
+            return self._anchor_ms
+        return self._anchor_ms + (now_ns - self._anchor_ns) * self.rate / 1e6
+
+    def position(self) -> int:
+        """当前位置，单位毫秒"""
+        return int(min(self._position(time.perf_counter_ns()), self.timeline.duration))
+
+    def deadline(self, time_ms: int) -> int:
+        """乐谱中 time_ms 处的和弦应当发出的 perf_counter_ns"""
+        return self._anchor_ns + int((time_ms - self._anchor_ms) * 1e6 / self.rate)
+
+    def _anchor(self, position_ms: float):
+        self._anchor_ns = time.perf_counter_ns()
+        self._anchor_ms = position_ms
+
+    def play(self, start_ms: int = 0):
+        with self.scheduler.lock:
+            self._anchor(start_ms)
+            self.index = bisect_left(self.timeline.times, start_ms)
+            self.is_playing = True
+            self.is_finished = False
+            self.scheduler.schedule(self)
+
+    def pause(self):
+        with self.scheduler.lock:
+            if not self.is_playing:
+                return
+            self._anchor(self._position(time.perf_counter_ns()))
+            self.is_playing = False
+            self.generation += 1
+
+    def resume(self):
+        with self.scheduler.lock:
+            if self.is_playing or self.is_finished:
+                return
+            self._anchor(self._anchor_ms)
+            self.is_playing = True
+            self.scheduler.schedule(self)
+
+    def seek(self, position_ms: int):
+        with self.scheduler.lock:
+            self._anchor(position_ms)
+            self.index = bisect_left(self.timeline.times, position_ms)
+            self.is_finished = False
+            self.scheduler.schedule(self)
+
+    def set_rate(self, rate: float):
+        """播放速度倍率，1 为原速"""
+        if not math.isfinite(rate) or rate <= 0:
+            raise ValueError(f"Invalid playback rate: {rate}")
+        with self.scheduler.lock:
+            self._anchor(self._position(time.perf_counter_ns()))
+            self.rate = rate
+            self.scheduler.schedule(self)
+
+    def close(self):
+        """停止播放，不再调用 callback"""
+        with self.scheduler.lock:
+            self.is_playing = False
+            self.is_finished = True
+            self.callback = None
+            self.generation += 1
+
+
+class SessionScheduler:
+    """
+    在一个线程中按到期时间调度所有会话的和弦
+
+    callback 在调度线程中调用，不能阻塞。
+    """
+
+    def __init__(self, press_workers: int = 4, spin_us: int = 1000):
+        """
+        Args:
+            press_workers: 所有会话共用的发送按键的线程数
+            spin_us: 到期前最后多少微秒忙等以减少 wait 的误差，会话多、和弦密集时调小可以减少 CPU 占用
+        """
+        self.spin_ns = spin_us * 1000
+        self.lock = threading.Condition()
+        # (到期时间, 序号, 会话的 generation, 会话)
+        self._heap: list[tuple[int, int, int, PlaybackSession]] = []
+        self._sequence = 0
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=press_workers, thread_name_prefix='SessionPress',
+                                        initializer=self._tune_thread if conf.scheduler.performance else None) \
+            if press_workers else None
+        self._thread = threading.Thread(target=self._run, daemon=True, name='SessionScheduler')
+        self._thread.start()
+
+    def create_session(self, timeline: Timeline, player: Player, callback: Callable[[], None] = None,
+                       rate: float = 1.0, trace=None) -> PlaybackSession:
+        return PlaybackSession(self, timeline, player, callback, rate, trace)
+
+    def schedule(self, session: PlaybackSession):
+        """使会话原有的条目失效，并按当前的时钟加入下一个和弦，调用方需持有 lock"""
+        session.generation += 1
+        if session.is_playing and session.index < len(session.timeline):
+            self._push(session)
+        self.lock.notify()
+
+    def _push(self, session: PlaybackSession):
+        self._sequence += 1
+        deadline = session.deadline(session.timeline.times[session.index])
+        heapq.heappush(self._heap, (deadline, self._sequence, session.generation, session))
+
+    @staticmethod
+    def _tune_thread():
+        from sakura.components.player.Realtime import tune_thread_or_warn
+        tune_thread_or_warn(conf.scheduler.cpu, conf.scheduler.priority)
+
+    def _run(self):
+        if conf.scheduler.performance:
+            self._tune_thread()
+        heap = self._heap
+        while True:
+            with self.lock:
+                while not heap and not self._closed:
+                    self.lock.wait()
+                if self._closed:
+                    return
+                deadline, _, generation, session = heap[0]
+                if generation != session.generation:
+                    heapq.heappop(heap)
+                    continue
+                remaining = deadline - time.perf_counter_ns()
+                if remaining > self.spin_ns:
+                    # 等待期间可能有更早到期的和弦加入
+                    self.lock.wait((remaining - self.spin_ns) / 1e9)
+                    continue
+                heapq.heappop(heap)
+            while time.perf_counter_ns() < deadline:
+                pass
+            with self.lock:
+                # 忙等期间会话被暂停、跳转或改变速度，index 尚未推进，和弦由重新调度的条目发出
+                if generation != session.generation:
+                    continue
+                presses = session.timeline.presses[session.index]
+                session.index += 1
+                finished = session.index >= len(session.timeline)
+                if finished:
+                    session.is_playing = False
+                    session.is_finished = True
+                    session._anchor(session.timeline.duration)
+                else:
+                    self._push(session)
+            self._dispatch(session, presses, deadline)
+            if finished and session.callback is not None:
+                try:
+                    session.callback()
+                except Exception as e:
+                    logger.error('Error in session callback: %s', e)
+
+    def _dispatch(self, session: PlaybackSession, presses: tuple[tuple[str, int], ...], deadline: int):
+        lateness = (time.perf_counter_ns() - deadline) / 1e9
+        scheduler_lateness.observe(lateness)
+        if lateness > LATE_THRESHOLD:
+            late_notes.inc(len(presses))
+        chords_scheduled.inc()
+        trace = session.trace
+        timer = session._press_timer
+        press = session.player.press
+        for key, index in presses:
+            if trace is not None:
+                trace.record(index, session._backend)
+            if self._pool is None:
+                self._timed_press(timer, press, key)
+            else:
+                self._pool.submit(self._timed_press, timer, press, key)
+
+    @staticmethod
+    def _timed_press(timer, press: Callable, key: str):
+        start = time.perf_counter()
+        try:
+            press(key, conf)
+        except Exception as e:
+            logger.error('Error pressing %s: %s', key, e)
+        finally:
+            timer.observe(time.perf_counter() - start)
+
+    def close(self):
+        with self.lock:
+            self._closed = True
+            self._heap.clear()
+            self.lock.notify()
+        self._thread.join(timeout=1)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
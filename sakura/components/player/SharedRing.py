@@ -0,0 +1,115 @@
+"""
+进程间共享内存中的命令环和播放状态
+
+一块 multiprocessing.shared_memory 依次保存：
+
+    状态      _STATUS，由调度进程以 seqlock 写入：写入前后各把序号加 1，序号为奇数或前后不一致时读取方重试
+    环的读写位置  _INDICES，写入位置只由界面进程修改，读取位置只由调度进程修改
+    命令      capacity 个定长的 _COMMAND
+
+只有一个写入方和一个读取方，不需要锁：先写好命令再发布写入位置，读取方处理完再发布读取位置。
+各字段 8 字节对齐，x86 和 ARM64 上对齐的 8 字节写入不会被拆开。
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+# 序号、位置（毫秒）、是否正在播放、已播放完的次数、已加载的歌曲编号、播放失败的次数
+_STATUS = struct.Struct('<QqQQQQ')
+# 写入位置、读取位置
+_INDICES = struct.Struct('<QQ')
+# 操作、三个整数参数、一个浮点数参数、一个字符串参数
+_COMMAND = struct.Struct('<B7xqqqd32s')
+
+_INDICES_OFFSET = _STATUS.size
+_COMMANDS_OFFSET = _INDICES_OFFSET + _INDICES.size
+
+
+class Command(NamedTuple):
+    op: int
+    a: int = 0
+    b: int = 0
+    c: int = 0
+    x: float = 0.0
+    text: str = ''
+
+
+class Status(NamedTuple):
+    position: int
+    playing: bool
+    # 每播放完一首歌曲加 1，读取方比较前后两次的值即可知道是否播放完
+    finished: int
+    # 最近一次加载的歌曲编号
+    loaded: int
+    # 每次播放、继续播放或切换播放方式失败时加 1，比较方式与 finished 相同
+    failed: int = 0
+
+
+class SharedRing:
+    """
+    命令环和播放状态，create 为 True 时创建共享内存，否则按 name 连接已有的共享内存
+
+    put 只能在一个进程中调用，get 和 publish 只能在另一个进程中调用。
+    """
+
+    def __init__(self, name: str = None, capacity: int = 256, create: bool = False):
+        size = _COMMANDS_OFFSET + capacity * _COMMAND.size
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.capacity = (self.shm.size - _COMMANDS_OFFSET) // _COMMAND.size
+        self._buf = self.shm.buf
+        if create:
+            self._buf[:_COMMANDS_OFFSET] = bytes(_COMMANDS_OFFSET)
+        self._sequence = 0
+
+    def put(self, command: Command, timeout: float = 1.0) -> None:
+        """写入一条命令，环已满时等待读取方处理，超时抛出 TimeoutError"""
+        head, tail = _INDICES.unpack_from(self._buf, _INDICES_OFFSET)
+        deadline = time.monotonic() + timeout
+        while head - tail >= self.capacity:
+            if time.monotonic() > deadline:
+                raise TimeoutError('Scheduler command ring is full')
+            time.sleep(0.001)
+            tail = _INDICES.unpack_from(self._buf, _INDICES_OFFSET)[1]
+        text = command.text.encode('utf-8')
+        if len(text) > 32:
+            raise ValueError(f"Command text too long: {command.text}")
+        _COMMAND.pack_into(self._buf, _COMMANDS_OFFSET + head % self.capacity * _COMMAND.size,
+                           command.op, command.a, command.b, command.c, command.x, text)
+        struct.pack_into('<Q', self._buf, _INDICES_OFFSET, head + 1)
+
+    def get(self) -> Command | None:
+        """取出一条命令，没有命令时返回 None"""
+        head, tail = _INDICES.unpack_from(self._buf, _INDICES_OFFSET)
+        if tail == head:
+            return None
+        op, a, b, c, x, text = _COMMAND.unpack_from(self._buf, _COMMANDS_OFFSET + tail % self.capacity * _COMMAND.size)
+        struct.pack_into('<Q', self._buf, _INDICES_OFFSET + 8, tail + 1)
+        return Command(op, a, b, c, x, text.rstrip(b'\0').decode('utf-8'))
+
+    def publish(self, status: Status) -> None:
+        self._sequence += 1
+        struct.pack_into('<Q', self._buf, 0, self._sequence)
+        _STATUS.pack_into(self._buf, 0, self._sequence, status.position, status.playing, status.finished,
+                          status.loaded, status.failed)
+        self._sequence += 1
+        struct.pack_into('<Q', self._buf, 0, self._sequence)
+
+    def read_status(self, timeout: float = 0.1) -> Status:
+        """读取最近发布的状态，写入方在两次写入序号之间退出时序号始终为奇数，超时抛出 TimeoutError"""
+        deadline = time.monotonic() + timeout
+        while True:
+            sequence, position, playing, finished, loaded, failed = _STATUS.unpack_from(self._buf, 0)
+            if sequence % 2 == 0 and struct.unpack_from('<Q', self._buf, 0)[0] == sequence:
+                return Status(position, bool(playing), finished, loaded, failed)
+            if time.monotonic() > deadline:
+                raise TimeoutError('Scheduler status is not readable')
+            # 让出 GIL，写入方可能是同一进程中的其他线程
+            time.sleep(0)
+
+    def close(self, unlink: bool = False) -> None:
+        self._buf.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
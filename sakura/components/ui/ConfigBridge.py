@@ -0,0 +1,23 @@
+from PySide6.QtCore import QObject, Signal
+
+from sakura.config import config_service
+from sakura.locales.locale import add_locale_listener
+
+
+class ConfigBridge(QObject):
+    """
+    把配置变化和语言切换转为 Qt 信号
+
+    配置可能在监听文件的后台线程中变化，界面应连接到控件的方法，由 Qt 排队到界面线程执行。
+    """
+    # 变化的配置项集合
+    config_changed = Signal(object)
+    locale_changed = Signal()
+
+    def __init__(self):
+        super().__init__()
+        config_service.subscribe(self.config_changed.emit)
+        add_locale_listener(self.locale_changed.emit)
+
+
+config_bridge = ConfigBridge()
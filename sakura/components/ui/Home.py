@@ -5,10 +5,10 @@ from PySide6.QtGui import QIcon, QPixmap
 from PySide6.QtWidgets import QFrame, QVBoxLayout, QSpacerItem, QSizePolicy
 from qfluentwidgets import FlowLayout, LargeTitleLabel, ElevatedCardWidget, SubtitleLabel, CaptionLabel, IconWidget, \
     FluentIcon, ImageLabel, qconfig
-from requests import request
 
 from sakura.components.ui import background_images, main_width
 from sakura.components.ui.BottomRightButton import BottomRightButton
+from sakura.components.ui.ConfigBridge import config_bridge
 from sakura.locales.locale import load_locale_messages
 
 
@@ -35,6 +35,11 @@ class Home(QFrame):
         pixiv_card = HomeCard('Pixiv',
                               locales.messages('pixiv_card.text'),
                               'https://www.pixiv.net/favicon.ico', 'https://www.pixiv.net/')
+        # (卡片, 文本键)，切换语言时更新
+        self.cards = [(home_card, 'home_card.text'), (component_card, 'component_card.text'),
+                      (pixiv_card, 'pixiv_card.text')]
+        self.locales = locales
+        config_bridge.locale_changed.connect(self.retranslate)
         body_layout = FlowLayout()
         body_layout.addWidget(home_card)
         body_layout.addWidget(component_card)
@@ -44,6 +49,12 @@ class Home(QFrame):
         BottomRightButton(self, layout, FluentIcon.LINK, lambda: webbrowser.open(background_images[qconfig.theme.value]['url']))
 
 
+    def retranslate(self) -> None:
+        """切换语言后更新界面文字"""
+        for card, key in self.cards:
+            card.text_label.setText(self.locales.messages(key))
+
+
 class HomeCard(ElevatedCardWidget):
 
     def __init__(self, title: str, text: str, icon: FluentIcon | QIcon | str, url: str, parent=None):
@@ -52,14 +63,17 @@ class HomeCard(ElevatedCardWidget):
         self.setFixedWidth(200)
         icon_label = IconWidget(icon, self)
         icon_label.setFixedSize(48, 48)
+        self.loader_thread = None
         if isinstance(icon, str) and icon.startswith('http'):
+            # 卡片第一次显示时才开始下载图标
             loader_thread = IconLoaderThread(icon, icon_label)
             loader_thread.finished.connect(lambda: icon_label.setIcon(loader_thread.icon))
             icon_label.setIcon(FluentIcon.SYNC)
-            loader_thread.start()
+            self.loader_thread = loader_thread
         title_label = SubtitleLabel(title, self)
         text_label = CaptionLabel(text, self)
         text_label.setWordWrap(True)
+        self.text_label = text_label
 
         # 创建主布局
         layout = QVBoxLayout(self)
@@ -75,6 +89,12 @@ class HomeCard(ElevatedCardWidget):
         layout.addItem(spacer)
         BottomRightButton(self, layout, FluentIcon.LINK, lambda: webbrowser.open(url))
 
+    def showEvent(self, event) -> None:
+        if self.loader_thread is not None and not self.loader_thread.isRunning() \
+                and not self.loader_thread.isFinished():
+            self.loader_thread.start()
+        super().showEvent(event)
+
 
 class IconLoaderThread(QThread):
     url: str
@@ -85,6 +105,8 @@ class IconLoaderThread(QThread):
         self.url = url
 
     def run(self):
+        # requests 导入较慢，在后台线程中导入
+        from requests import request
         try:
             resp = request('GET', self.url, timeout=5)
             if resp.status_code == 200:
@@ -0,0 +1,22 @@
+from PySide6.QtCore import QObject, Qt, Signal
+
+from sakura.listener import HotkeyEvent, dispatcher
+
+
+class HotkeyBridge(QObject):
+    """快捷键事件经排队连接交给界面线程执行，回调可以直接操作控件"""
+    triggered = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.triggered.connect(self._run_event, Qt.ConnectionType.QueuedConnection)
+
+    def install(self):
+        """之后的快捷键回调都在界面线程中执行"""
+        dispatcher.set_delivery(self.triggered.emit)
+
+    def _run_event(self, event: HotkeyEvent):
+        dispatcher.run_event(event)
+
+
+hotkey_bridge = HotkeyBridge()
\ No newline at end of file
@@ -0,0 +1,35 @@
+import importlib
+
+from PySide6.QtWidgets import QFrame, QVBoxLayout, QWidget
+
+from sakura.startup import profiler
+
+
+class LazyPage(QFrame):
+    """
+    导航页的占位控件，第一次显示时才导入模块并创建真正的页面
+
+    objectName 与真正的页面相同，供 FluentWindow.addSubInterface 作为路由键。
+    """
+    page: QWidget | None
+
+    def __init__(self, object_name: str, module: str, class_name: str, parent=None):
+        super().__init__(parent)
+        self.setObjectName(object_name)
+        self.module = module
+        self.class_name = class_name
+        self.page = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+    def ensure_page(self) -> QWidget:
+        if self.page is None:
+            with profiler.step(f'create {self.objectName()} page'):
+                class_ = getattr(importlib.import_module(self.module), self.class_name)
+                self.page = class_(self)
+            self.layout().addWidget(self.page)
+        return self.page
+
+    def showEvent(self, event) -> None:
+        self.ensure_page()
+        super().showEvent(event)
@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+from PySide6.QtCore import QObject, Qt, Signal
+
+from sakura.components.SakuraPlayBar import SakuraPlayBar
+from sakura.config.sakura_logging import get_logger
+from sakura.interface.PlaybackController import PlaybackController
+
+logger = get_logger(__name__)
+
+# 等待界面线程执行操作的最长时间，单位秒
+_GUI_TIMEOUT = 5
+
+
+class _GuiInvoker(QObject):
+    """经排队连接在界面线程中执行函数"""
+    invoked = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.invoked.connect(self._run, Qt.ConnectionType.QueuedConnection)
+
+    def call(self, func: Callable):
+        """在界面线程中执行 func 并等待结果，不能在界面线程中调用"""
+        future = Future()
+        self.invoked.emit((func, future))
+        return future.result(timeout=_GUI_TIMEOUT)
+
+    def post(self, func: Callable) -> None:
+        """在界面线程中执行 func，不等待"""
+        self.invoked.emit((func, None))
+
+    @staticmethod
+    def _run(item: tuple[Callable, Future | None]):
+        func, future = item
+        try:
+            result = func()
+        except Exception as e:
+            if future is None:
+                logger.error('Error running %s on the GUI thread: %s', func, e)
+            else:
+                future.set_exception(e)
+            return
+        if future is not None:
+            future.set_result(result)
+
+
+class PlayBarController(PlaybackController):
+    """通过控制接口操作 SakuraPlayBar，操作控件的方法都交给界面线程执行"""
+
+    def __init__(self, play_bar: SakuraPlayBar):
+        self.play_bar = play_bar
+        self._invoker = _GuiInvoker()
+        self._queue: list[int] = []
+        self._queue_lock = threading.Lock()
+        play_bar.song_finished.connect(self._play_next)
+
+    def play(self, song_id: int = None) -> None:
+        if song_id is None:
+            song_id = self.play_bar.playing_id
+            if not song_id:
+                raise ValueError('No song to resume')
+        self._invoker.call(lambda: self.play_bar.play_song(song_id))
+
+    def pause(self) -> None:
+        self._invoker.call(self.play_bar.pause)
+
+    def seek(self, time_ms: int) -> None:
+        if not self.play_bar.playing_id:
+            raise ValueError('No song is playing')
+        if time_ms < 0:
+            raise ValueError(f"Invalid position: {time_ms}")
+        self._invoker.call(lambda: self.play_bar.seek_to(time_ms))
+
+    def set_rate(self, rate: float) -> None:
+        # 时钟可以在任意线程中设置
+        self.play_bar.time_manager.set_rate(rate)
+
+    def enqueue(self, song_id: int) -> None:
+        with self._queue_lock:
+            self._queue.append(song_id)
+
+    def clear_queue(self) -> None:
+        with self._queue_lock:
+            self._queue.clear()
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        songs = self.play_bar.source.select_by_name(query, limit=max(1, min(limit, 200)))
+        return [{'id': song.id, 'name': song.name, 'author': song.author, 'duration': song.duration}
+                for song in songs]
+
+    def state(self) -> dict:
+        play_bar = self.play_bar
+        current_player = play_bar.sakura_player_dict.get(play_bar.playing_id)
+        with self._queue_lock:
+            queue = list(self._queue)
+        return {
+            'playing': play_bar.is_playing,
+            'song_id': play_bar.playing_id or None,
+            'name': play_bar.playing_name,
+            'position': play_bar.time_manager.get_current_time() if current_player else 0,
+            'duration': current_player.last_time if current_player else 0,
+            'rate': play_bar.time_manager.get_rate(),
+            'queue': queue,
+        }
+
+    def _play_next(self):
+        """当前歌曲播放完后播放队列中的下一首"""
+        with self._queue_lock:
+            if not self._queue:
+                return
+            song_id = self._queue.pop(0)
+        self._invoker.post(lambda: self.play_bar.play_song(song_id))
@@ -1,22 +1,44 @@
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QListWidgetItem
-from qfluentwidgets import ListWidget, SearchLineEdit
+import os
+import threading
 
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QFileDialog
+from qfluentwidgets import ListView, SearchLineEdit, ProgressBar, InfoBar, ComboBox, TransparentToolButton, FluentIcon
+
+from sakura.components.NoteRollView import NoteRollView
 from sakura.components.SakuraPlayBar import SakuraPlayBar
 from sakura.components.ui import main_width
+from sakura.components.ui.ConfigBridge import config_bridge
+from sakura.components.ui.SongListModel import SongListModel
 from sakura.config import conf
 from sakura.db.DBManager import song_client
-from sakura.db.JsonPick import get_file_list, load_locale_data
+from sakura.db.LibraryIndexer import LibraryIndexer, LibraryWatcher
+from sakura.db.MidiParser import MidiOptions
+from sakura.db.SongPack import PACK_EXTENSION, SongPack, build_pack, find_packs
+from sakura.interface.SongSource import SongSource
+from sakura.locales.locale import load_locale_messages
 
 
 class PlayerUi(QFrame):
-    file_list_box: ListWidget
+    file_list_box: ListView
+    song_list_model: SongListModel
     search_input: SearchLineEdit
     play: SakuraPlayBar
+    # 乐谱目录发生变化，由后台线程发出
+    library_changed = Signal(object)
+    # 乐谱导入进度 (已完成数, 总数)，由后台线程发出
+    import_progress = Signal(int, int)
+    # 歌曲包打包完成 (路径, 歌曲数, 错误信息)，由后台线程发出
+    pack_built = Signal(str, int, str)
+    # 来源下拉框中乐谱库之后各项对应的歌曲包路径
+    pack_paths: list[str]
+    # 已打开的歌曲包
+    _packs: dict[str, SongPack]
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setObjectName("Player")
+        self.locales = load_locale_messages('player')
         # 创建主布局
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -40,22 +62,49 @@ class PlayerUi(QFrame):
         search_input.returnPressed.connect(self.handle_search_complete)
         search_input.installEventFilter(self)
         self.search_input = search_input
+        # 歌曲来源：乐谱库或歌曲包
+        source_layout = QHBoxLayout()
+        source_box = ComboBox()
+        source_box.addItem(self.locales.messages('source.library'))
+        self.pack_paths = []
+        self._packs = {}
+        for path in find_packs(conf.library.pack_path):
+            self.pack_paths.append(os.path.abspath(path))
+            source_box.addItem(os.path.splitext(os.path.basename(path))[0])
+        source_box.currentIndexChanged.connect(self.source_changed)
+        self.source_box = source_box
+        open_pack_button = TransparentToolButton(FluentIcon.FOLDER)
+        open_pack_button.setToolTip(self.locales.messages('pack.open'))
+        open_pack_button.clicked.connect(self.open_pack)
+        self.open_pack_button = open_pack_button
+        build_pack_button = TransparentToolButton(FluentIcon.SAVE)
+        build_pack_button.setToolTip(self.locales.messages('pack.build'))
+        build_pack_button.clicked.connect(self.export_pack)
+        self.build_pack_button = build_pack_button
+        source_layout.addWidget(source_box, 1)
+        source_layout.addWidget(open_pack_button)
+        source_layout.addWidget(build_pack_button)
         # 加载文件列表
         file_list_layout = QVBoxLayout()
-        file_list_box = ListWidget()
+        file_list_box = ListView()
         file_list_box.setFixedSize(400, 600)
         file_list_box.setSpacing(0.5)
-        if song_client.db_is_null():
-            file_list = get_file_list(conf.file_path)
-            load_locale_data(conf.file_path, file_list)
-        songs = song_client.select_all()
-        for index, v in enumerate(songs):
-            item = QListWidgetItem()
-            item.setText(v.name)
-            item.setData(1, v.id)
-            file_list_box.addItem(item)
+        # 所有行高度相同，视图不需要逐行计算尺寸
+        file_list_box.setUniformItemSizes(True)
+        # 乐谱导入进度条，导入时显示
+        import_progress_bar = ProgressBar()
+        import_progress_bar.setFixedWidth(400)
+        import_progress_bar.hide()
+        self.import_progress_bar = import_progress_bar
+        # 列表按页从数据库读取，搜索时切换为过滤后的查询
+        song_list_model = SongListModel(song_client, self)
+        song_list_model.set_query('')
+        file_list_box.setModel(song_list_model)
+        self.song_list_model = song_list_model
         # 添加文件列表到主容器布局
+        file_list_layout.addLayout(source_layout)
         file_list_layout.addWidget(search_input)
+        file_list_layout.addWidget(import_progress_bar)
         file_list_layout.addWidget(file_list_box)
         file_info_layout.addLayout(file_list_layout)
         self.file_list_box = file_list_box
@@ -70,6 +119,13 @@ class PlayerUi(QFrame):
         play = SakuraPlayBar(file_list_box=self.file_list_box, temp_layout=player_layout)
         player_layout.addWidget(play)
         self.play = play
+        # 下落式音符视图，跟随播放时钟
+        note_roll = NoteRollView(play.time_manager, info_frame)
+        info_layout = QVBoxLayout(info_frame)
+        info_layout.setContentsMargins(0, 0, 0, 0)
+        info_layout.addWidget(note_roll)
+        play.song_loaded.connect(note_roll.set_notes)
+        self.note_roll = note_roll
         player_layout.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop)
         # 添加双击播放音频事件
         file_list_box.doubleClicked.connect(self.double_clicked)
@@ -80,7 +136,104 @@ class PlayerUi(QFrame):
         self._search_timer = QTimer()
         self._search_timer.setSingleShot(True)
         self._search_timer.timeout.connect(self._perform_search)
-        self._search_cache = {}
+        self._current_search = ''
+
+        # 在后台增量同步乐谱目录，只解析新增或变化的文件，运行期间继续监听目录的变化
+        self.library_changed.connect(self.reload_library)
+        self.import_progress.connect(self.update_import_progress)
+        self.pack_built.connect(self.on_pack_built)
+        self.library_indexer = LibraryIndexer(song_client, conf.file_path, MidiOptions(**conf.midi.model_dump()))
+        self.library_watcher = LibraryWatcher(self.library_indexer, conf.library.watch_interval,
+                                              self.library_changed.emit, self.import_progress.emit,
+                                              watch=conf.library.watch)
+        self.library_watcher.start()
+        config_bridge.locale_changed.connect(self.retranslate)
+        config_bridge.config_changed.connect(self.config_changed)
+
+    def config_changed(self, changed: set[str]) -> None:
+        """MIDI 转换选项变化后重新导入 MIDI 文件"""
+        if any(key.startswith('midi.') for key in changed):
+            self.library_indexer.set_midi_options(MidiOptions(**conf.midi.model_dump()))
+            self.library_watcher.sync_now()
+
+    def retranslate(self) -> None:
+        """切换语言后更新界面文字"""
+        self.source_box.setItemText(0, self.locales.messages('source.library'))
+        self.open_pack_button.setToolTip(self.locales.messages('pack.open'))
+        self.build_pack_button.setToolTip(self.locales.messages('pack.build'))
+
+    def update_import_progress(self, done: int, total: int) -> None:
+        self.import_progress_bar.setVisible(done < total)
+        self.import_progress_bar.setRange(0, total)
+        self.import_progress_bar.setValue(done)
+
+    def reload_library(self, result) -> None:
+        """乐谱目录变化后刷新列表"""
+        self.import_progress_bar.hide()
+        if result.errors:
+            InfoBar.warning(self.locales.messages('import_failed.title'),
+                            self.locales.messages('import_failed.content') % len(result.errors),
+                            parent=self, duration=5000)
+        if result.changed and self.play.source is song_client:
+            self.song_list_model.refresh()
+
+    def source_changed(self, index: int) -> None:
+        """切换列表和播放器使用的歌曲来源，0 为乐谱库，其余为歌曲包"""
+        source: SongSource = song_client
+        if index > 0:
+            path = self.pack_paths[index - 1]
+            try:
+                if path not in self._packs:
+                    self._packs[path] = SongPack(path)
+                source = self._packs[path]
+            except (OSError, ValueError) as e:
+                InfoBar.error(self.locales.messages('pack.failed.title'), str(e), parent=self, duration=5000)
+                self.source_box.setCurrentIndex(0)
+                return
+        self.play.set_source(source)
+        self.song_list_model.set_source(source)
+
+    def open_pack(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, self.locales.messages('pack.open'), conf.library.pack_path,
+                                              f'*{PACK_EXTENSION}')
+        if not path:
+            return
+        path = os.path.abspath(path)
+        if path not in self.pack_paths:
+            self.pack_paths.append(path)
+            self.source_box.addItem(os.path.splitext(os.path.basename(path))[0])
+        self.source_box.setCurrentIndex(self.pack_paths.index(path) + 1)
+
+    def export_pack(self) -> None:
+        """将乐谱库打包为歌曲包，在后台线程中执行"""
+        path, _ = QFileDialog.getSaveFileName(self, self.locales.messages('pack.build'), conf.library.pack_path,
+                                              f'*{PACK_EXTENSION}')
+        if not path:
+            return
+        if not path.lower().endswith(PACK_EXTENSION):
+            path += PACK_EXTENSION
+        if os.path.abspath(path) in self._packs:
+            # 已打开的歌曲包仍在被映射，不能覆盖
+            InfoBar.error(self.locales.messages('pack.failed.title'), self.locales.messages('pack.in_use'),
+                          parent=self, duration=5000)
+            return
+        self.build_pack_button.setEnabled(False)
+
+        def build():
+            try:
+                self.pack_built.emit(path, build_pack(path, song_client.iter_song_rows()), '')
+            except Exception as e:
+                self.pack_built.emit(path, 0, str(e))
+
+        threading.Thread(target=build, daemon=True, name='PackBuilder').start()
+
+    def on_pack_built(self, path: str, count: int, error: str) -> None:
+        self.build_pack_button.setEnabled(True)
+        if error:
+            InfoBar.error(self.locales.messages('pack.failed.title'), error, parent=self, duration=5000)
+            return
+        InfoBar.success(self.locales.messages('pack.built.title'),
+                        self.locales.messages('pack.built.content') % (count, path), parent=self, duration=5000)
 
     def clear_search(self) -> None:
         self.search('')
@@ -94,19 +247,8 @@ class PlayerUi(QFrame):
         self._current_search = text
 
     def _perform_search(self) -> None:
-        text = self._current_search
-        if text in self._search_cache:
-            results = self._search_cache[text]
-        else:
-            results = song_client.select_by_name(text)
-            self._search_cache[text] = results
-
-        self.file_list_box.clear()
-        for index, v in enumerate(results):
-            item = QListWidgetItem()
-            item.setText(v.name)
-            item.setData(1, v.id)
-            self.file_list_box.addItem(item)
+        self.song_list_model.set_query(self._current_search)
+
     def handle_search_complete(self) -> None:
         self.search(self.search_input.text())
         self.search_input.clearFocus()
@@ -123,7 +265,7 @@ class PlayerUi(QFrame):
             self.search_input.clearFocus()
         super().mousePressEvent(event)
 
-    def get_file_list_box(self) -> ListWidget:
+    def get_file_list_box(self) -> ListView:
         return self.file_list_box
 
     def double_clicked(self) -> None:
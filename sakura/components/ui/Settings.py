@@ -1,10 +1,8 @@
-import os
-import sys
-
 from PySide6.QtWidgets import QFrame, QVBoxLayout, QSizePolicy, QSpacerItem
-from qfluentwidgets import GroupHeaderCardWidget, FluentIcon, ComboBox, LineEdit, Dialog
+from qfluentwidgets import GroupHeaderCardWidget, FluentIcon, ComboBox, LineEdit, Dialog, CardGroupWidget
 
 from sakura.components.ui import languages
+from sakura.components.ui.ConfigBridge import config_bridge
 from sakura.config import conf, save_conf
 from sakura.locales.locale import load_locale_messages, Locale
 
@@ -19,22 +17,32 @@ class SystemSettingsGroup(BaseSettingsGroup):
     items: list[str] = ['demo', 'win']
     languages: list[str] = ['简体中文', '繁體中文', 'English']
     locales: Locale
+    # (分组, 标题的文本键, 内容的文本键)，切换语言时更新
+    _groups: list[tuple[CardGroupWidget, str, str]]
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.locales = load_locale_messages('settings')
+        self._groups = []
         self.setTitle(self.locales.messages('title'))
         self.create_combo_box(parent)
         self.create_speed_control(parent)
         self.create_language_change_box(parent)
+        config_bridge.config_changed.connect(self.config_changed)
+        config_bridge.locale_changed.connect(self.retranslate)
+
+    def add_group(self, icon: FluentIcon, key: str, widget) -> None:
+        group = self.addGroup(icon, self.locales.messages(f'{key}.title'), self.locales.messages(f'{key}.content'),
+                              widget)
+        self._groups.append((group, f'{key}.title', f'{key}.content'))
 
     def create_combo_box(self, parent):
         combo = ComboBox(parent)
         combo.addItems(self.items)
         combo.setCurrentIndex(self.items.index(conf.player.type))
         combo.currentIndexChanged.connect(self.current_index_changed)
-        self.addGroup(FluentIcon.TILES, self.locales.messages('play_type.title'),
-                      self.locales.messages('play_type.content'), combo)
+        self.type_combo = combo
+        self.add_group(FluentIcon.TILES, 'play_type', combo)
 
     def create_speed_control(self, parent):
         speed_control = LineEdit(parent)
@@ -42,30 +50,59 @@ class SystemSettingsGroup(BaseSettingsGroup):
         speed_control.setText(str(conf.control.speed))
         speed_control.editingFinished.connect(
             lambda: self.update_config('control.speed', speed_control.text(), speed_control))
-        self.addGroup(FluentIcon.ADD, self.locales.messages('speed_control.title'),
-                      self.locales.messages('speed_control.content'), speed_control)
+        self.speed_control = speed_control
+        self.add_group(FluentIcon.ADD, 'speed_control', speed_control)
 
     def create_language_change_box(self, parent):
         combo = ComboBox(parent)
         combo.addItems(self.languages)
-        current_items = next((k for k, v in languages.items() if v["key"] == conf.region), None)
-        combo.setCurrentIndex(self.languages.index(current_items))
+        combo.setCurrentIndex(self.languages.index(self.current_language()))
         combo.currentIndexChanged.connect(self.language_changed)
-        self.addGroup(FluentIcon.LANGUAGE, self.locales.messages('region.title'),
-                      self.locales.messages('region.content'), combo)
+        self.language_combo = combo
+        self.add_group(FluentIcon.LANGUAGE, 'region', combo)
+
+    @staticmethod
+    def current_language() -> str:
+        return next((k for k, v in languages.items() if v["key"] == conf.region), None)
+
+    def retranslate(self) -> None:
+        """切换语言后更新界面文字"""
+        self.setTitle(self.locales.messages('title'))
+        self.speed_control.setPlaceholderText(self.locales.messages('speed_control.PlaceholderText'))
+        for group, title, content in self._groups:
+            group.setTitle(self.locales.messages(title))
+            group.setContent(self.locales.messages(content))
+
+    def config_changed(self, changed: set[str]) -> None:
+        """config.yaml 被外部修改后同步控件，不再触发保存"""
+        if conf.player.type in self.items:
+            self.set_index_silently(self.type_combo, self.items.index(conf.player.type))
+        if self.current_language() in self.languages:
+            self.set_index_silently(self.language_combo, self.languages.index(self.current_language()))
+        if 'control.speed' in changed and not self.speed_control.hasFocus():
+            self.speed_control.setText(str(conf.control.speed))
+
+    @staticmethod
+    def set_index_silently(combo: ComboBox, index: int) -> None:
+        combo.blockSignals(True)
+        combo.setCurrentIndex(index)
+        combo.blockSignals(False)
 
     def current_index_changed(self, index: int) -> None:
         conf.player.type = self.items[index]
         save_conf(conf)
 
     def language_changed(self, index: int) -> None:
-        w = Dialog(languages[self.languages[index]]['title'], languages[self.languages[index]]['content'], self)
-        if conf.region == languages[self.languages[index]]["key"]:
+        language = languages[self.languages[index]]
+        if conf.region == language["key"]:
             return
+        w = Dialog(language['title'], language['content'], self)
         if w.exec():
-            conf.region = languages[self.languages[index]]["key"]
+            # 保存后语言文件会原地切换，界面通过 locale_changed 更新文字
+            conf.region = language["key"]
             save_conf(conf)
-            os.execl(sys.executable, sys.executable, *sys.argv)
+        else:
+            self.config_changed(set())
 
     def update_config(self, attribute: str, value: str, attributes: LineEdit) -> None:
         try:
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtGui import QBrush, QColor
+
+from sakura.components.SearchWorker import SearchWorker
+from sakura.components.ui.ConfigBridge import config_bridge
+from sakura.config import conf
+from sakura.db.Playability import feasibility
+from sakura.db.model.SongModel import SongModel
+from sakura.interface.SongSource import SongSource
+from sakura.locales.locale import load_locale_messages
+
+
+def format_duration(ms: int) -> str:
+    seconds = ms // 1000
+    return f'{seconds // 60}:{seconds % 60:02d}'
+
+
+class SongListModel(QAbstractListModel):
+    """
+    歌曲列表模型，按页从数据库读取
+
+    视图滚动到底部时通过 canFetchMore / fetchMore 逐页增加行数，
+    已读取的页只在一个很小的 LRU 缓存中保留，被淘汰的页再次显示时重新查询。
+    所有查询都由 SearchWorker 在后台线程执行，页面读取完成前对应的行显示为空。
+    """
+    SongIdRole = Qt.ItemDataRole.UserRole + 1
+    # 当前播放方式无法完整演奏的歌曲的文字颜色，比例低于一半时使用更醒目的颜色
+    _TIGHT_BRUSH = QBrush(QColor('#9d5d00'))
+    _INFEASIBLE_BRUSH = QBrush(QColor('#c42b1c'))
+    page_size: int = 200
+    # 缓存的页数
+    max_cached_pages: int = 8
+
+    worker: SearchWorker
+    keyword: str = ''
+    _generation: int = 0
+    _total: int = 0
+    _loaded: int = 0
+    _pages: OrderedDict[int, list[SongModel]]
+    # 已请求、尚未返回的页
+    _pending: set[int]
+
+    def __init__(self, client: SongSource, parent=None):
+        super().__init__(parent)
+        self._pages = OrderedDict()
+        self._pending = set()
+        self.locales = load_locale_messages('player')
+        self.worker = SearchWorker(client, self.page_size, parent=self)
+        self.worker.searchFinished.connect(self._on_search_finished)
+        # 缓存命中时 pageLoaded 会在 data() 中同步发出，排队执行以免在视图绘制过程中修改模型
+        self.worker.pageLoaded.connect(self._on_page_loaded, Qt.ConnectionType.QueuedConnection)
+        self.worker.pageFailed.connect(self._on_page_failed)
+        # 播放方式或其演奏能力变化后重新着色
+        config_bridge.config_changed.connect(self._on_config_changed)
+
+    def set_query(self, keyword: str) -> None:
+        """切换为按关键字过滤的查询，关键字为空时显示全部歌曲，结果就绪后重置模型"""
+        self._generation = self.worker.search(keyword)
+
+    def set_source(self, source: SongSource) -> None:
+        """切换歌曲来源（乐谱库或歌曲包），保留当前的搜索关键字"""
+        self.worker.set_client(source)
+        self.set_query(self.keyword)
+
+    def refresh(self) -> None:
+        """数据库内容变化后清空缓存并重新查询"""
+        self.worker.invalidate()
+        self.set_query(self.keyword)
+
+    def _on_config_changed(self, changed: set[str]) -> None:
+        if self._loaded and any(key == 'player.type' or key.startswith('capabilities.') for key in changed):
+            self.dataChanged.emit(self.index(0), self.index(self._loaded - 1),
+                                  [Qt.ItemDataRole.ForegroundRole, Qt.ItemDataRole.ToolTipRole])
+
+    def _on_search_finished(self, generation: int, keyword: str, total: int, first_page: list[SongModel]) -> None:
+        if generation != self._generation:
+            return
+        self.beginResetModel()
+        self.keyword = keyword
+        self._pages.clear()
+        self._pending.clear()
+        self._pages[0] = first_page
+        self._total = total
+        self._loaded = min(self.page_size, total)
+        self.endResetModel()
+
+    def _on_page_loaded(self, generation: int, keyword: str, page_index: int, rows: list[SongModel]) -> None:
+        # set_query 之后、新的第一页返回之前，滚动列表请求的页仍是旧关键字的
+        if generation != self._generation or keyword != self.keyword:
+            return
+        self._pending.discard(page_index)
+        self._pages[page_index] = rows
+        if len(self._pages) > self.max_cached_pages:
+            self._pages.popitem(last=False)
+        first = page_index * self.page_size
+        last = min(first + len(rows), self._loaded) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first), self.index(last))
+
+    def _on_page_failed(self, generation: int, keyword: str, page_index: int) -> None:
+        # 该页再次显示时重新请求
+        if generation == self._generation and keyword == self.keyword:
+            self._pending.discard(page_index)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._loaded < self._total
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        count = min(self.page_size, self._total - self._loaded)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < self._loaded:
+            return None
+        song = self.song_at(index.row())
+        if song is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return song.name
+        if role == self.SongIdRole:
+            return song.id
+        if role == Qt.ItemDataRole.ToolTipRole:
+            playability = self.locales.messages('playability.tooltip') % (conf.player.type,
+                                                                          round(self.feasibility(song) * 100))
+            return ' · '.join(v for v in (song.name, song.author, format_duration(song.duration), playability) if v)
+        if role == Qt.ItemDataRole.ForegroundRole:
+            score = self.feasibility(song)
+            if score < 0.5:
+                return self._INFEASIBLE_BRUSH
+            if score < 1:
+                return self._TIGHT_BRUSH
+        return None
+
+    @staticmethod
+    def feasibility(song: SongModel) -> float:
+        """当前播放方式能完成的比例，见 Playability.feasibility"""
+        capability = conf.capabilities.get(conf.player.type)
+        if capability is None:
+            return 1.0
+        return feasibility(song.peakNps, song.minChordGap, song.maxChord, capability)
+
+    def song_at(self, row: int) -> SongModel | None:
+        """返回缓存中的歌曲，所在页未读取时发起异步请求并返回 None"""
+        page_index, offset = divmod(row, self.page_size)
+        page = self._pages.get(page_index)
+        if page is None:
+            if page_index not in self._pending:
+                self._pending.add(page_index)
+                self.worker.load_page(self._generation, self.keyword, page_index)
+            return None
+        self._pages.move_to_end(page_index)
+        return page[offset] if offset < len(page) else None
@@ -13,17 +13,17 @@ languages = {
     "简体中文": {
         "key": "zh-CN",
         "title": "您确定要更改语言吗？",
-        "content": "语言更改后需要重新啟動软件"
+        "content": "界面文字将立即切换为简体中文"
     },
     "繁體中文": {
         "key": "zh-TW",
         "title": "您確定要更改語言嗎？",
-        "content": "語言更改後需要重新啟動軟件"
+        "content": "界面文字將立即切換為繁體中文"
     },
     "English": {
         "key": "en",
         "title": "Are you sure you want to change the language?",
-        "content": "The software needs to be restarted after the language is changed."
+        "content": "The interface will switch to English immediately."
     }
 }
 
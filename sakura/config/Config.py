@@ -1,4 +1,6 @@
 
+from typing import Literal
+
 from pydantic import BaseModel
 
 
@@ -6,6 +8,8 @@ class Player(BaseModel):
     instruments: str
     type: str
     volume: float
+    # 播放方式跟不上时是否按 capabilities 简化乐谱
+    reduce_density: bool = False
 
 
 class Mapping(BaseModel):
@@ -14,6 +18,10 @@ class Mapping(BaseModel):
 
 class ADB(BaseModel):
     path: str
+    # android_fleet 同时演奏的设备序列号，见 adb devices
+    devices: list[str] = []
+    # 测量每台设备延迟时的往返次数
+    calibration_samples: int = 8
 
 
 class Control(BaseModel):
@@ -22,6 +30,92 @@ class Control(BaseModel):
 class DB(BaseModel):
     path: str
 
+
+class Library(BaseModel):
+    # 运行时是否监听乐谱目录的变化
+    watch: bool = True
+    # 扫描乐谱目录的间隔，单位秒
+    watch_interval: float = 2.0
+    # 歌曲包所在目录，其中的歌曲包启动时即可选择
+    pack_path: str = 'resources/packs'
+
+
+class Midi(BaseModel):
+    # 移调的半音数
+    transpose: int = 0
+    # 是否自动选择让更多音符落在白键和音域内的移调
+    auto_transpose: bool = True
+    # 超出音域的音符是否按八度折叠到音域内，否则丢弃
+    fold_octaves: bool = True
+    # 黑键的处理方式：lower 降到下方白键，upper 升到上方白键，drop 丢弃
+    accidentals: Literal['lower', 'upper', 'drop'] = 'lower'
+    # 时间量化的粒度，单位毫秒
+    quantize_ms: int = 10
+    # 是否忽略打击乐通道
+    skip_drums: bool = True
+
+
+class Logging(BaseModel):
+    # 未在 levels 中单独设置的模块的日志级别
+    level: str = 'INFO'
+    # 控制台只输出不低于此级别的日志
+    console_level: str = 'INFO'
+    file: str = 'sap.log'
+    # 日志文件每天零点轮转，超过此大小时也会轮转，单位字节，0 表示不限制
+    max_bytes: int = 5 * 1024 * 1024
+    # 保留的轮转文件数
+    backup_count: int = 7
+    # 按模块设置的日志级别，如 sakura.components.player: DEBUG
+    levels: dict[str, str] = {}
+
+
+class Trace(BaseModel):
+    # 是否把每次演奏发出的按键记录到 path 目录下，见 PressTrace
+    enabled: bool = False
+    path: str = 'traces'
+
+
+class Metrics(BaseModel):
+    # 是否在本机提供运行指标，见 sakura.metrics
+    enabled: bool = False
+    host: str = '127.0.0.1'
+    port: int = 9464
+
+
+class Api(BaseModel):
+    # 是否在本机提供 HTTP 和 WebSocket 控制接口，见 sakura.api，只在图形界面中可用
+    enabled: bool = False
+    host: str = '127.0.0.1'
+    port: int = 9465
+    # 通过 WebSocket 推送播放状态的间隔，单位秒
+    push_interval: float = 0.1
+
+
+class Scheduler(BaseModel):
+    # 是否在独立进程中调度音符，界面的操作不再影响按键时间，见 SchedulerProcess，只在图形界面中使用
+    process: bool = False
+    # 界面进程发给调度进程的命令环能容纳的命令数
+    ring_size: int = 256
+    # 性能模式：播放期间冻结并停止垃圾回收，Linux 上固定调度线程的 CPU 并提高优先级，见 Realtime
+    performance: bool = False
+    # 播放期间的垃圾回收，disable 停止，limit 把第 0 代的阈值提高到 gc_threshold
+    gc: str = 'disable'
+    gc_threshold: int = 100000
+    # 调度线程和发送按键的线程固定在哪个 CPU 上，为 None 时不固定
+    cpu: int | None = None
+    # SCHED_FIFO 优先级（1-99），为 0 时不修改，没有权限时改为降低 nice 值
+    priority: int = 10
+
+
+class Capability(BaseModel):
+    # 每秒最多能发送的按键数
+    max_nps: float
+    # 相邻两个和弦之间的最短间隔，单位毫秒
+    min_gap: int = 0
+    # 能同时按下的最多琴键数
+    max_chord: int = 15
+
+
 class Config(BaseModel):
     file_path: str
     region: str
@@ -30,3 +124,17 @@ class Config(BaseModel):
     mapping: Mapping
     control: Control
     db: DB
+    library: Library = Library()
+    midi: Midi = Midi()
+    metrics: Metrics = Metrics()
+    api: Api = Api()
+    scheduler: Scheduler = Scheduler()
+    logging: Logging = Logging()
+    trace: Trace = Trace()
+    # 各播放方式的演奏能力，可通过 main.py measure-backend 实测
+    capabilities: dict[str, Capability] = {
+        'demo': Capability(max_nps=200),
+        'win': Capability(max_nps=60, min_gap=10),
+        'android': Capability(max_nps=5, min_gap=150, max_chord=2),
+        'android_fleet': Capability(max_nps=5, min_gap=150, max_chord=2),
+    }
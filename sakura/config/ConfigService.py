@@ -0,0 +1,230 @@
+import atexit
+import os
+import threading
+import time
+from typing import Callable
+
+import yaml
+
+from sakura.config.Config import Config
+from sakura.config.sakura_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def changed_keys(old: dict, new: dict, prefix: str = '') -> set[str]:
+    """两份配置中取值不同的项，嵌套的配置以 'player.type' 的形式表示"""
+    changed = set()
+    for key in old.keys() | new.keys():
+        path = f'{prefix}{key}'
+        old_value, new_value = old.get(key), new.get(key)
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            changed |= changed_keys(old_value, new_value, f'{path}.')
+        elif old_value != new_value:
+            changed.add(path)
+    return changed
+
+
+class ConfigService:
+    """
+    读取和保存 config.yaml，并在配置变化时通知订阅者
+
+    配置只有一个 Config 实例，重新读取文件时原地更新其各项，已持有 conf 的代码无需重新获取。
+    保存和重新读取后以 (变化的配置项集合) 调用订阅者，回调在发生变化的线程中执行。
+
+    save 只更新内存中的状态并立即通知订阅者，文件由后台线程在最后一次 save 的 save_delay 秒后写入，
+    连续的多次 save（如拖动音量条）只写一次。写入先写临时文件再替换，进程退出时写入尚未保存的修改。
+    """
+    path: str
+    # 文件变化的检查间隔，单位秒
+    interval: float = 1.0
+    # 最后一次 save 之后等待多久写入文件，单位秒
+    save_delay: float = 0.5
+    # 写入失败后等待多久重试，单位秒
+    retry_delay: float = 5.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._config: Config | None = None
+        # 最近一次读取或保存的配置内容，用于计算变化的配置项
+        self._snapshot: dict = {}
+        # 最近一次读取或保存后文件的 (修改时间, 大小)，用于忽略自己写入引起的变化
+        self._file_state: tuple[int, int] | None = None
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        # 等待写入的配置和写入时间
+        self._pending: Config | None = None
+        self._deadline = 0.0
+        self._writer_wakeup = threading.Condition(self._lock)
+        self._writer = None
+        self._write_lock = threading.Lock()
+        atexit.register(self._flush_or_log)
+
+    def _read(self) -> Config:
+        try:
+            with open(self.path, 'r', encoding='UTF-8') as f:
+                data = yaml.safe_load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Configuration file not found")
+        except yaml.YAMLError as e:
+            raise ValueError(f"Error parsing YAML configuration: {e}")
+        try:
+            return Config(**data)
+        except Exception as e:
+            raise ValueError(f"Failed to load configuration: {e}")
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def load(self) -> Config:
+        with self._lock:
+            if self._config is None:
+                self._file_state = self._stat()
+                self._config = self._read()
+                self._snapshot = self._config.model_dump()
+            return self._config
+
+    def subscribe(self, listener: Callable[[set[str]], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[set[str]], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, changed: set[str]):
+        if not changed:
+            return
+        logger.debug('Configuration changed: %s', ', '.join(sorted(changed)))
+        for listener in list(self._listeners):
+            try:
+                listener(changed)
+            except Exception as e:
+                logger.error('Error in configuration listener: %s', e)
+
+    def save(self, c: Config):
+        """记录修改并通知订阅者，文件稍后在后台写入"""
+        with self._lock:
+            data = c.model_dump()
+            changed = changed_keys(self._snapshot, data)
+            self._snapshot = data
+            self._pending = c
+            self._deadline = time.monotonic() + self.save_delay
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_behind, daemon=True, name='ConfigWriter')
+                self._writer.start()
+            self._writer_wakeup.notify()
+        self._notify(changed)
+
+    def flush(self):
+        """立即写入尚未保存的修改，失败时修改仍保留为未保存，抛出 IOError"""
+        with self._write_lock:
+            with self._lock:
+                pending = self._pending
+                if pending is None:
+                    return
+                data = pending.model_dump()
+                self._pending = None
+            try:
+                self._write(data)
+            except IOError:
+                with self._lock:
+                    # 写入期间没有新的修改时恢复，之后重试
+                    if self._pending is None:
+                        self._pending = pending
+                raise
+
+    def _write(self, data: dict):
+        # 在锁外写文件，写入期间 save 不会被阻塞
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='UTF-8') as f:
+                yaml.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            raise IOError(f"Failed to save configuration: {e}")
+        with self._lock:
+            self._file_state = self._stat()
+
+    def _write_behind(self):
+        while True:
+            with self._lock:
+                while self._pending is not None and (remaining := self._deadline - time.monotonic()) > 0:
+                    self._writer_wakeup.wait(remaining)
+                if self._pending is None:
+                    self._writer = None
+                    return
+            try:
+                self.flush()
+            except IOError as e:
+                logger.error('%s, retrying in %gs', e, self.retry_delay)
+                with self._lock:
+                    self._deadline = max(self._deadline, time.monotonic() + self.retry_delay)
+
+    def reload(self) -> set[str]:
+        """
+        重新读取 config.yaml 并原地更新配置，文件内容无效时保留当前配置
+
+        Returns:
+            变化的配置项
+        """
+        with self._lock:
+            config = self.load()
+            # 尚未写入的修改优先，写入后会覆盖外部修改
+            if self._pending is not None:
+                return set()
+            self._file_state = self._stat()
+            try:
+                new = self._read()
+            except (FileNotFoundError, ValueError) as e:
+                logger.error('Ignored invalid configuration: %s', e)
+                return set()
+            data = new.model_dump()
+            changed = changed_keys(self._snapshot, data)
+            for name in type(config).model_fields:
+                setattr(config, name, getattr(new, name))
+            self._snapshot = data
+        self._notify(changed)
+        return changed
+
+    def start_watching(self):
+        """在后台线程中定时检查 config.yaml，被外部修改时重新读取"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True, name='ConfigWatcher')
+        self._thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def close(self):
+        """停止监听并写入尚未保存的修改，写入失败时只记录错误，不抛出"""
+        self.stop_watching()
+        self._flush_or_log()
+
+    def _flush_or_log(self):
+        # 在窗口关闭和进程退出时调用，异常无处处理
+        try:
+            self.flush()
+        except IOError as e:
+            logger.error('%s, unsaved changes are lost', e)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                state = self._stat()
+                changed = state is not None and state != self._file_state
+            if changed:
+                self.reload()
@@ -1,33 +1,30 @@
 import os
 
-import yaml
-
+from sakura.startup import Lazy
 from .Config import Config
+from .ConfigService import ConfigService
+from .sakura_logging import configure_logging
 
-
-def _load_yaml_config():
-    try:
-        with open(os.path.join(os.getcwd(), 'config.yaml'), 'r', encoding='UTF-8') as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Configuration file not found")
-    except yaml.YAMLError as e:
-        raise ValueError(f"Error parsing YAML configuration: {e}")
+# 配置文件的读取、保存和变化通知
+config_service = ConfigService(os.path.join(os.getcwd(), 'config.yaml'))
 
 
 def save_conf(c: Config):
-    try:
-        with open(os.path.join(os.getcwd(), 'config.yaml'), 'w', encoding='UTF-8') as f:
-            yaml.dump(c.model_dump(), f)
-    except Exception as e:
-        raise IOError(f"Failed to save configuration: {e}")
+    config_service.save(c)
 
 
 def load_conf() -> Config:
-    try:
-        data = _load_yaml_config()
-        return Config(**data)
-    except Exception as e:
-        raise ValueError(f"Failed to load configuration: {e}")
+    c = config_service.load()
+    configure_logging(c.logging)
+    return c
+
+
+def _apply_logging(changed: set[str]):
+    if any(key.startswith('logging.') for key in changed):
+        configure_logging(config_service.load().logging)
+
+
+config_service.subscribe(_apply_logging)
 
-conf = load_conf()
+# 首次访问配置项时才读取 config.yaml
+conf: Config = Lazy(load_conf, 'load config')
\ No newline at end of file
@@ -1,20 +1,126 @@
+"""
+日志
+
+记录日志的线程只把日志放入队列，格式化和写文件、控制台都在 QueueListener 的后台线程中进行，
+播放线程上的日志不会因为磁盘或控制台 I/O 而阻塞。请使用 logger.info('... %s', value) 的形式，
+被过滤掉的日志不会格式化参数。
+
+导入时以默认设置开始记录，读取 config.yaml 后由 configure_logging 按 logging 部分重新设置。
+"""
+import atexit
 import logging
-from datetime import datetime
-
-# 配置基本的日志格式和日志级别
-logging.basicConfig(
-    level=logging.INFO,  # 设置日志记录级别
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    # 根据年月日生成日志文件
-    filename=datetime.now().strftime('sap_%Y-%m-%d.log'),
-    filemode='a'  # 追加模式
-)
-
-# 创建一个日志记录器（logger）
-logger = logging.getLogger(__name__)
-
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+import os
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from queue import SimpleQueue
+
+_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """
+    每天零点或文件超过 max_bytes 时轮转
+
+    轮转后的文件名为 sap.log.2025-01-01，同一天内因大小多次轮转时依次为 sap.log.2025-01-01.1、.2……
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0):
+        super().__init__(filename, when='midnight', backupCount=backup_count, encoding='UTF-8', delay=True)
+        self.max_bytes = max_bytes
+        # 日期后面的序号也算作轮转后的文件，超过 backup_count 时删除
+        self.extMatch = re.compile(r'^\d{4}-\d{2}-\d{2}(\.\d+)?$', re.ASCII)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+
+    def rotation_filename(self, default_name: str) -> str:
+        name = default_name
+        index = 0
+        while os.path.exists(name):
+            index += 1
+            name = f'{default_name}.{index}'
+        return super().rotation_filename(name)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """不在调用线程中格式化，同一进程内直接把 LogRecord 交给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_queue: SimpleQueue = SimpleQueue()
+_listener: QueueListener | None = None
+_lock = threading.Lock()
+# 上一次按配置设置的模块，重新设置时恢复为继承上级的级别
+_configured_names: set[str] = set()
+
+
+def _create_handlers(file: str, console_level: str, max_bytes: int, backup_count: int) -> list[logging.Handler]:
+    formatter = logging.Formatter(_FORMAT)
+    # 文件记录所有通过了记录器级别的日志
+    file_handler = SizedTimedRotatingFileHandler(file, max_bytes, backup_count)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    handlers = [file_handler, console_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _start(handlers: list[logging.Handler]):
+    global _listener
+    with _lock:
+        if _listener is not None:
+            # 停止时会先处理完队列中剩余的日志
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def configure_logging(settings) -> None:
+    """
+    按配置重新设置日志，可以在运行时重复调用
+
+    Args:
+        settings: Config.logging
+    """
+    logging.getLogger().setLevel(settings.level.upper())
+    _start(_create_handlers(settings.file, settings.console_level.upper(), settings.max_bytes, settings.backup_count))
+    for name in _configured_names - settings.levels.keys():
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    for name, level in settings.levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+    _configured_names.clear()
+    _configured_names.update(settings.levels)
+
+
+def stop_logging() -> None:
+    """写完队列中剩余的日志，进程退出时自动调用"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """模块的日志记录器，传入 __name__，config.yaml 中 logging.levels 可按模块名设置级别"""
+    return logging.getLogger(name)
+
+
+logging.getLogger().addHandler(_DeferredQueueHandler(_queue))
+logging.getLogger().setLevel(logging.INFO)
+_start(_create_handlers('sap.log', 'INFO', 5 * 1024 * 1024, 7))
+atexit.register(stop_logging)
+
+logger = get_logger(__name__)
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
+
+from sakura.config.sakura_logging import get_logger
+from sakura.db.MidiParser import MidiOptions
+from sakura.db.SheetParser import ParsedFile, parse_sheet_file
+from sakura.db.client.SongClient import SongClient
+
+logger = get_logger(__name__)
+
+
+class ImportTask:
+    """待解析的乐谱文件"""
+    path: str
+    mtime: int
+    size: int
+    # 数据库中记录的文件哈希，新文件为 None
+    known_hash: str | None
+
+    def __init__(self, path: str, mtime: int, size: int, known_hash: str | None = None):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.known_hash = known_hash
+
+
+class ImportResult:
+    """批量导入的结果"""
+    imported: int = 0
+    unchanged: int = 0
+    errors: dict[str, str]
+
+    def __init__(self):
+        self.errors = {}
+
+
+class BulkImporter:
+    """
+    批量导入乐谱
+
+    文件较多时在进程池中并行读取、解析和归一化，解析结果流式交给当前线程，
+    按批次在一个事务中用 executemany 写入数据库。
+    """
+    client: SongClient
+    # 文件数不少于此值时才启用进程池，进程启动本身也有开销
+    parallel_threshold: int = 64
+    # 每个事务写入的文件数
+    batch_size: int = 1000
+    workers: int | None
+    # MIDI 文件的转换选项，会随任务一起传给子进程
+    midi_options: MidiOptions
+
+    def __init__(self, client: SongClient, workers: int = None, midi_options: MidiOptions = MidiOptions()):
+        self.client = client
+        self.workers = workers
+        self.midi_options = midi_options
+
+    def run(self, tasks: list[ImportTask], removed: list[str] = (),
+            progress: Callable[[int, int], None] = None) -> ImportResult:
+        """
+        解析并写入文件，最后删除已移除的文件及不再被引用的歌曲
+
+        Args:
+            tasks: 待解析的文件
+            removed: 已被删除的文件路径
+            progress: 进度回调 (已完成数, 总数)，在调用 run 的线程中执行
+        """
+        result = ImportResult()
+        total = len(tasks)
+        # 进度最多回报约 100 次
+        step = max(1, total // 100)
+        batch: list[ParsedFile] = []
+        done = 0
+        for parsed in self._parse(tasks):
+            done += 1
+            if parsed.error is not None:
+                result.errors[parsed.path] = parsed.error
+                logger.error('Failed to parse %s: %s', parsed.path, parsed.error)
+            elif parsed.row is None:
+                result.unchanged += 1
+            else:
+                result.imported += 1
+            batch.append(parsed)
+            if len(batch) >= self.batch_size:
+                self.client.apply_library_changes(batch, prune=False)
+                batch = []
+            if progress and (done % step == 0 or done == total):
+                progress(done, total)
+        if batch or removed or result.imported:
+            self.client.apply_library_changes(batch, removed)
+        return result
+
+    def _parse(self, tasks: list[ImportTask]) -> Iterator[ParsedFile]:
+        return parse_files(tasks, self.workers, self.midi_options, self.parallel_threshold)
+
+
+def parse_files(tasks: list[ImportTask], workers: int = None, midi_options: MidiOptions = MidiOptions(),
+                parallel_threshold: int = 64) -> Iterator[ParsedFile]:
+    """按任务顺序解析乐谱文件，文件数不少于 parallel_threshold 时在进程池中并行解析"""
+    if len(tasks) < parallel_threshold:
+        for task in tasks:
+            yield parse_sheet_file(task.path, task.mtime, task.size, task.known_hash, midi_options)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(parse_sheet_file,
+                                [t.path for t in tasks], [t.mtime for t in tasks],
+                                [t.size for t in tasks], [t.known_hash for t in tasks],
+                                [midi_options] * len(tasks),
+                                chunksize=max(1, min(64, len(tasks) // (workers * 4))))
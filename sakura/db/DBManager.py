@@ -1,3 +1,5 @@
 from sakura.db.client.SongClient import SongClient
+from sakura.startup import Lazy
 
-song_client = SongClient()
\ No newline at end of file
+# 首次使用时才打开数据库并建表
+song_client: SongClient = Lazy(SongClient, 'open song library')
\ No newline at end of file
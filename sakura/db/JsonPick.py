@@ -1,37 +1,34 @@
-import codecs
-import json
 import os
 
-import chardet
-
-from sakura.config.sakura_logging import logger
+from sakura.config.sakura_logging import get_logger
 from sakura.db.DBManager import song_client
+from sakura.db.SheetParser import ALLOWED_EXTENSIONS, parse_json_bytes
 from sakura.db.model.SongModel import SongModel
 
+logger = get_logger(__name__)
+
 
 # 获取指定目录下的文件列表
 def get_file_list(file_path: str = 'resources') -> list[str]:
     if not os.path.isdir(file_path):
         raise ValueError(f"Directory does not exist: {file_path}")
-    allowed_extensions = ['.json', '.txt', '.skysheet']
     return [
         file
         for root, dirs, files in os.walk(file_path)
         for file in files
-        if os.path.splitext(file)[1].lower() in allowed_extensions
+        if os.path.splitext(file)[1].lower() in ALLOWED_EXTENSIONS
     ]
 
 
 def load_json(file_path: str) -> dict:
     if not os.path.isfile(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
+    with open(file_path, 'rb') as f:
+        raw = f.read()
     try:
-        with open(file_path, 'rb') as f:
-            encoding = chardet.detect(f.read(1024))['encoding']
-        with codecs.open(file_path, 'r', encoding=encoding) as f:
-            return json.load(f)
-    except (UnicodeDecodeError, json.JSONDecodeError) as e:
-        raise ValueError(f"Failed to decode JSON file {file_path} using detected encoding {encoding}: {e}")
+        return parse_json_bytes(raw)
+    except ValueError as e:
+        raise ValueError(f"Failed to decode JSON file {file_path}: {e}")
 
 
 def load_locale_data(file_path: str, file_list: list[str]) -> None:
@@ -0,0 +1,215 @@
+import os
+import threading
+from typing import Callable
+
+from sakura.config.sakura_logging import get_logger
+from sakura.db.BulkImporter import BulkImporter, ImportTask
+from sakura.db.MidiParser import MidiOptions
+from sakura.db.PlayabilityAnalyzer import PlayabilityAnalyzer
+from sakura.db.SheetParser import ALLOWED_EXTENSIONS, MIDI_EXTENSIONS
+from sakura.db.client.SongClient import SongClient
+
+logger = get_logger(__name__)
+
+
+class SyncResult:
+    """一次目录同步的结果"""
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    # 新补充统计信息的歌曲数
+    analyzed: int = 0
+    errors: dict[str, str]
+
+    def __init__(self):
+        self.errors = {}
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.analyzed)
+
+
+def scan_sheet_files(root: str, unreadable: list[str] = None) -> dict[str, tuple[int, int]]:
+    """
+    递归扫描目录下所有乐谱文件的 (修改时间, 大小)
+
+    Args:
+        unreadable: 读取失败的子目录和文件追加到此列表，其中的乐谱既不算存在也不算删除
+
+    Raises:
+        ValueError: root 不是目录
+        OSError: 无法读取 root
+    """
+    if not os.path.isdir(root):
+        raise ValueError(f"Directory does not exist: {root}")
+    found = {}
+    dirs = [root]
+    while dirs:
+        directory = dirs.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            if directory == root:
+                raise
+            logger.warning('Failed to scan %s: %s', directory, e)
+            if unreadable is not None:
+                unreadable.append(directory)
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in ALLOWED_EXTENSIONS:
+                    try:
+                        stat = entry.stat()
+                    except OSError as e:
+                        logger.warning('Failed to stat %s: %s', entry.path, e)
+                        if unreadable is not None:
+                            unreadable.append(entry.path)
+                        continue
+                    found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+class LibraryIndexer:
+    """
+    增量同步乐谱目录到数据库
+
+    每个文件记录路径、修改时间、大小和内容哈希，只有修改时间或大小变化且内容哈希不同的文件才会被重新解析。
+    """
+    root: str
+    client: SongClient
+    importer: BulkImporter
+    analyzer: PlayabilityAnalyzer
+    _lock: threading.Lock
+    # 解析失败的文件，文件未变化时不再重复解析
+    _failed: dict[str, tuple[int, int]]
+    # 最近一次校验 MIDI 文件时使用的转换选项；MIDI 文件的哈希包含转换选项，首次同步或选项变化后即使文件未变化也重新校验
+    _midi_checked: MidiOptions | None = None
+    # 首次同步时为旧版本导入的歌曲补充统计信息，之后导入的歌曲在导入时已计算
+    _analyzed: bool = False
+
+    def __init__(self, client: SongClient, root: str, midi_options: MidiOptions = MidiOptions()):
+        self.client = client
+        self.root = os.path.abspath(root)
+        self.importer = BulkImporter(client, midi_options=midi_options)
+        self.analyzer = PlayabilityAnalyzer(client)
+        self._lock = threading.Lock()
+        self._failed = {}
+
+    def set_midi_options(self, midi_options: MidiOptions) -> None:
+        """config.yaml 中 midi 的选项变化后，下次同步时按新的选项重新转换 MIDI 文件"""
+        if midi_options == self.importer.midi_options:
+            return
+        self.importer.midi_options = midi_options
+        # 之前转换失败的 MIDI 文件换用新的选项后可能成功
+        self._failed = {path: state for path, state in self._failed.items()
+                        if os.path.splitext(path)[1].lower() not in MIDI_EXTENSIONS}
+
+    def scan(self) -> tuple[dict[str, tuple[int, int]], list[str]]:
+        """
+        扫描目录下所有乐谱文件的 (修改时间, 大小)
+
+        Returns:
+            找到的文件，以及读取失败的子目录和文件
+        """
+        unreadable = []
+        return scan_sheet_files(self.root, unreadable), unreadable
+
+    def sync(self, progress: Callable[[int, int], None] = None) -> SyncResult:
+        """
+        同步一次目录，可在任意线程调用
+
+        Args:
+            progress: 解析进度回调 (已完成数, 总数)，在调用 sync 的线程中执行
+        """
+        with self._lock:
+            return self._sync(progress)
+
+    def _sync(self, progress: Callable[[int, int], None]) -> SyncResult:
+        result = SyncResult()
+        midi_options = self.importer.midi_options
+        # 乐谱目录不存在或无法读取时抛出异常，不会把整个乐谱库当作已删除
+        found, unreadable = self.scan()
+        known = self.client.select_files()
+        # 暂时无法读取的子目录中的乐谱保留到下次同步
+        skipped = set(unreadable)
+        skipped_dirs = tuple(path + os.sep for path in unreadable)
+        removed = [path for path in known
+                   if path not in found and path not in skipped and not path.startswith(skipped_dirs)]
+        tasks = []
+        for path, (mtime, size) in found.items():
+            record = known.get(path)
+            if record and record.mtime == mtime and record.size == size and (
+                    self._midi_checked == midi_options or os.path.splitext(path)[1].lower() not in MIDI_EXTENSIONS):
+                result.unchanged += 1
+            elif self._failed.get(path) != (mtime, size):
+                tasks.append(ImportTask(path, mtime, size, record.file_hash if record else None))
+        self._midi_checked = midi_options
+        if tasks or removed:
+            imported = self.importer.run(tasks, removed, progress)
+            for path in imported.errors:
+                self._failed[path] = found[path]
+            result.added = imported.imported
+            result.unchanged += imported.unchanged
+            result.removed = len(removed)
+            result.errors = imported.errors
+            if result.added or result.removed:
+                logger.info('乐谱目录同步完成：新增或更新 %d 个，删除 %d 个', result.added, result.removed)
+        if not self._analyzed:
+            result.analyzed = self.analyzer.run(progress)
+            self._analyzed = True
+        return result
+
+
+class LibraryWatcher:
+    """
+    在后台线程中同步乐谱目录：启动后立即同步一次，开启监听时之后定时重新扫描
+
+    回调均在后台线程中调用
+    """
+    indexer: LibraryIndexer
+    interval: float
+    watch: bool
+    on_change: Callable[[SyncResult], None]
+    on_progress: Callable[[int, int], None]
+
+    def __init__(self, indexer: LibraryIndexer, interval: float, on_change: Callable[[SyncResult], None],
+                 on_progress: Callable[[int, int], None] = None, watch: bool = True):
+        self.indexer = indexer
+        self.interval = interval
+        self.watch = watch
+        self.on_change = on_change
+        self.on_progress = on_progress
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='LibraryWatcher')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def sync_now(self):
+        """在后台线程中立即同步一次，不影响定时同步"""
+        threading.Thread(target=self._sync, daemon=True, name='LibrarySync').start()
+
+    def _run(self):
+        self._sync()
+        while self.watch and not self._stop.wait(self.interval):
+            self._sync()
+
+    def _sync(self):
+        try:
+            result = self.indexer.sync(self.on_progress)
+            if result.changed or result.errors:
+                self.on_change(result)
+        except Exception as e:
+            logger.error('Failed to sync library: %s', e)
@@ -0,0 +1,190 @@
+"""
+MIDI 文件转换为乐谱
+
+解析标准 MIDI 文件（SMF 格式 0/1/2）中的 note-on 事件，按速度表换算为毫秒，
+再映射到游戏中 C4-C6 的 15 个白键上，直接输出 NoteCodec 的紧凑格式。
+与 SheetParser 一样会在导入进程池中运行，不要引入有副作用的模块。
+"""
+import os
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+from sakura.db.NoteCodec import KEY_COUNT, normalize_arrays
+
+# 第一个琴键 C4 的音高
+_BASE_PITCH = 60
+_DEFAULT_TEMPO = 500000
+# 音级到白键序号的映射，-1 为黑键
+_WHITE_DEGREES = np.array([0, -1, 1, -1, 2, 3, -1, 4, -1, 5, -1, 6])
+# 黑键向下、向上取最近白键时的序号
+_LOWER_DEGREES = np.array([0, 0, 1, 1, 2, 3, 3, 4, 4, 5, 5, 6])
+_UPPER_DEGREES = np.array([0, 1, 1, 2, 2, 3, 4, 4, 5, 5, 6, 6])
+
+
+class MidiOptions(NamedTuple):
+    """MIDI 转换选项，对应配置文件中的 midi 部分"""
+    # 移调的半音数
+    transpose: int = 0
+    # 是否在 transpose 的基础上自动选择落在白键和音域内最多的移调
+    auto_transpose: bool = True
+    # 超出音域的音符是否按八度折叠到音域内，否则丢弃
+    fold_octaves: bool = True
+    # 黑键的处理方式：lower 降到下方白键，upper 升到上方白键，drop 丢弃
+    accidentals: str = 'lower'
+    # 时间量化的粒度，单位毫秒，相近的音符会合并为和弦
+    quantize_ms: int = 10
+    # 是否忽略第 10 通道（打击乐）
+    skip_drums: bool = True
+
+
+class MidiEvents(NamedTuple):
+    name: str
+    # note-on 事件的毫秒时间和音高
+    times: np.ndarray
+    pitches: np.ndarray
+    # 第一个速度事件对应的 BPM
+    bpm: int
+
+
+def _read_vlq(data: bytes, pos: int) -> tuple[int, int]:
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+
+def read_midi(raw: bytes, skip_drums: bool = True) -> MidiEvents:
+    """解析 MIDI 文件中的 note-on 事件及速度表"""
+    if raw[:4] != b'MThd':
+        raise ValueError('Not a standard MIDI file')
+    header_length = struct.unpack('>I', raw[4:8])[0]
+    _, track_count, division = struct.unpack('>HHH', raw[8:14])
+    pos = 8 + header_length
+    note_ticks = []
+    pitches = []
+    tempo_ticks = [0]
+    tempos = [_DEFAULT_TEMPO]
+    name = ''
+    for _ in range(track_count):
+        if pos + 8 > len(raw):
+            break
+        chunk_type = raw[pos:pos + 4]
+        length = struct.unpack('>I', raw[pos + 4:pos + 8])[0]
+        pos += 8
+        end = min(pos + length, len(raw))
+        if chunk_type != b'MTrk':
+            pos = end
+            continue
+        tick = 0
+        status = 0
+        p = pos
+        while p < end:
+            delta, p = _read_vlq(raw, p)
+            tick += delta
+            byte = raw[p]
+            if byte == 0xFF:
+                meta_type = raw[p + 1]
+                meta_length, p = _read_vlq(raw, p + 2)
+                payload = raw[p:p + meta_length]
+                p += meta_length
+                if meta_type == 0x51 and meta_length == 3:
+                    tempo_ticks.append(tick)
+                    tempos.append(int.from_bytes(payload, 'big'))
+                elif meta_type == 0x03 and not name and payload:
+                    name = payload.decode('utf-8', errors='replace').strip()
+                elif meta_type == 0x2F:
+                    break
+            elif byte in (0xF0, 0xF7):
+                sysex_length, p = _read_vlq(raw, p + 1)
+                p += sysex_length
+            else:
+                # 省略状态字节时沿用上一个事件的状态
+                if byte & 0x80:
+                    status = byte
+                    p += 1
+                elif not status:
+                    raise ValueError('Running status without a preceding status byte')
+                kind = status & 0xF0
+                if kind in (0xC0, 0xD0):
+                    p += 1
+                    continue
+                if kind == 0x90 and raw[p + 1] > 0 and not (skip_drums and status & 0x0F == 9):
+                    note_ticks.append(tick)
+                    pitches.append(raw[p])
+                p += 2
+        pos = end
+    times = _ticks_to_ms(np.asarray(note_ticks, dtype=np.int64), tempo_ticks, tempos, division)
+    # 第 0 个是默认速度，文件中有速度事件时使用第一个
+    bpm = round(60_000_000 / tempos[1 if len(tempos) > 1 else 0])
+    return MidiEvents(name, times, np.asarray(pitches, dtype=np.int64), bpm)
+
+
+def _ticks_to_ms(ticks: np.ndarray, tempo_ticks: list[int], tempos: list[int], division: int) -> np.ndarray:
+    if division & 0x8000:
+        # SMPTE 时间码：高字节为负的帧率，低字节为每帧的 tick 数
+        fps = 256 - (division >> 8)
+        return ticks * 1000.0 / (fps * (division & 0xFF))
+    order = np.argsort(np.asarray(tempo_ticks, dtype=np.int64), kind='stable')
+    change_ticks = np.asarray(tempo_ticks, dtype=np.int64)[order]
+    change_tempos = np.asarray(tempos, dtype=np.float64)[order]
+    # 每个速度变化点对应的毫秒时间
+    change_ms = np.r_[0.0, np.cumsum(np.diff(change_ticks) * change_tempos[:-1] / (division * 1000.0))]
+    index = np.searchsorted(change_ticks, ticks, side='right') - 1
+    return change_ms[index] + (ticks - change_ticks[index]) * change_tempos[index] / (division * 1000.0)
+
+
+def _white_keys_in_range(pitches: np.ndarray) -> int:
+    return int(np.count_nonzero((_WHITE_DEGREES[pitches % 12] >= 0)
+                                & (pitches >= _BASE_PITCH) & (pitches <= _BASE_PITCH + 24)))
+
+
+def map_pitches(pitches: np.ndarray, options: MidiOptions) -> tuple[np.ndarray, np.ndarray]:
+    """
+    将音高映射为琴键下标
+
+    Returns:
+        琴键下标，以及被保留的音符的布尔掩码
+    """
+    transpose = options.transpose
+    if options.auto_transpose and len(pitches):
+        # 在 ±1 个八度内选择白键且在音域内的音符最多的移调，相同时取移动最少的
+        candidates = sorted(range(-12, 13), key=abs)
+        transpose += max(candidates, key=lambda t: _white_keys_in_range(pitches + options.transpose + t))
+    octaves, pitch_classes = np.divmod(pitches + transpose, 12)
+    degrees = _WHITE_DEGREES[pitch_classes]
+    keep = np.ones(len(pitches), dtype=bool)
+    if options.accidentals == 'upper':
+        degrees = _UPPER_DEGREES[pitch_classes]
+    elif options.accidentals == 'lower':
+        degrees = _LOWER_DEGREES[pitch_classes]
+    else:
+        keep &= degrees >= 0
+    keys = (octaves - _BASE_PITCH // 12) * 7 + degrees
+    if options.fold_octaves:
+        last = KEY_COUNT - 1
+        keys = np.where(keys < 0, keys + 7 * ((-keys + 6) // 7), keys)
+        keys = np.where(keys > last, keys - 7 * ((keys - last + 6) // 7), keys)
+    else:
+        keep &= (keys >= 0) & (keys < KEY_COUNT)
+    return keys, keep
+
+
+def parse_midi(raw: bytes, path: str, options: MidiOptions) -> tuple[str, int, np.ndarray, np.ndarray]:
+    """
+    将 MIDI 文件转换为乐谱
+
+    Returns:
+        歌名（没有音轨名时使用文件名）、BPM、已归一化的 (times, keys)
+    """
+    events = read_midi(raw, options.skip_drums)
+    keys, keep = map_pitches(events.pitches, options)
+    quantum = max(1, options.quantize_ms)
+    times = np.rint(events.times[keep] / quantum).astype(np.int64) * quantum
+    times, keys = normalize_arrays(times, keys[keep])
+    name = events.name or os.path.splitext(os.path.basename(path))[0]
+    return name, events.bpm, times, keys
@@ -0,0 +1,68 @@
+"""
+乐谱音符的紧凑存储格式
+
+songNotes 在 json 乐谱中是 [{"time": 552, "key": "1Key9"}, ...] 形式，前缀 1Key/2Key 对演奏没有区别，
+这里统一归一化为按时间排序的 (time, key) 两个数组，key 为 0-14 的琴键下标，
+存储时打包成每个音符 5 字节的二进制（uint32 毫秒 + uint8 琴键）。
+"""
+import hashlib
+import re
+from typing import Any
+
+import numpy as np
+
+KEY_COUNT = 15
+
+NOTE_DTYPE = np.dtype([('time', '<u4'), ('key', 'u1')])
+
+_KEY_PATTERN = re.compile(r'Key(\d+)$')
+
+
+def normalize_notes(song_notes: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    将 json 中的 songNotes 归一化为按时间排序、去除重复按键的 (times, keys)
+
+    Returns:
+        times: int64 数组，单位毫秒
+        keys: uint8 数组，琴键下标 0-14
+    """
+    times = []
+    keys = []
+    for note in song_notes:
+        match = _KEY_PATTERN.search(str(note.get('key', '')))
+        if match is None or 'time' not in note:
+            continue
+        key = int(match.group(1))
+        if 0 <= key < KEY_COUNT:
+            times.append(round(float(note['time'])))
+            keys.append(key)
+    return normalize_arrays(np.asarray(times, dtype=np.int64), np.asarray(keys, dtype=np.int64))
+
+
+def normalize_arrays(times: np.ndarray, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """按 (time, key) 排序并去重，同一时刻重复按同一个键没有意义"""
+    times = np.clip(np.asarray(times, dtype=np.int64), 0, np.iinfo(np.uint32).max)
+    packed = np.unique(times * KEY_COUNT + np.asarray(keys, dtype=np.int64))
+    return packed // KEY_COUNT, (packed % KEY_COUNT).astype(np.uint8)
+
+
+def encode_notes(times: np.ndarray, keys: np.ndarray) -> bytes:
+    notes = np.empty(len(times), dtype=NOTE_DTYPE)
+    notes['time'] = times
+    notes['key'] = keys
+    return notes.tobytes()
+
+
+def decode_notes(blob: bytes) -> tuple[np.ndarray, np.ndarray]:
+    notes = np.frombuffer(blob, dtype=NOTE_DTYPE)
+    return notes['time'].astype(np.int64), notes['key'].copy()
+
+
+def to_song_notes(times: np.ndarray, keys: np.ndarray) -> list[dict[str, Any]]:
+    """还原为播放器使用的 songNotes 格式"""
+    return [{'time': t, 'key': f'1Key{k}'} for t, k in zip(times.tolist(), keys.tolist())]
+
+
+def notes_hash(blob: bytes) -> str:
+    """音符内容的哈希，用于识别内容相同但文件名或扩展名不同的乐谱"""
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
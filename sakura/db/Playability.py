@@ -0,0 +1,26 @@
+"""
+乐谱可演奏性分析
+
+演奏一首歌对播放方式的要求（每秒按键数、和弦间隔、和弦大小）由 SongStats.compute_stats 在导入时计算，
+这里与各播放方式的演奏能力（配置中的 capabilities）比较。
+"""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sakura.config.Config import Capability
+
+
+def feasibility(peak_nps: float, min_chord_gap: int | None, max_chord: int, capability: 'Capability') -> float:
+    """
+    播放方式能完成的比例，1 表示可以完整演奏，越小越难
+
+    取按键速度、和弦间隔、和弦大小三项中最紧张的一项
+    """
+    ratios = [1.0]
+    if peak_nps > 0:
+        ratios.append(capability.max_nps / peak_nps)
+    if min_chord_gap is not None and capability.min_gap > 0:
+        ratios.append(min_chord_gap / capability.min_gap)
+    if max_chord > 0:
+        ratios.append(capability.max_chord / max_chord)
+    return min(ratios)
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from sakura.config.sakura_logging import get_logger
+from sakura.db.SongStats import stats_or_error
+from sakura.db.client.SongClient import SongClient
+
+logger = get_logger(__name__)
+
+
+class PlayabilityAnalyzer:
+    """
+    为旧版本导入、缺少统计信息的歌曲补充 SONGS 中的统计信息（包括可演奏性使用的最短和弦间隔），
+    新导入的歌曲在导入时已计算
+
+    与 BulkImporter 相同，歌曲较多时在进程池中并行计算，按批次写入数据库，不阻塞打开数据库的线程。
+    """
+    client: SongClient
+    # 歌曲数不少于此值时才启用进程池
+    parallel_threshold: int = 64
+    # 每批读取和写入的歌曲数
+    batch_size: int = 1000
+    workers: int | None
+    # 计算失败的歌曲 ID，之后不再重复计算
+    _failed: set[int]
+
+    def __init__(self, client: SongClient, workers: int = None):
+        self.client = client
+        self.workers = workers
+        self._failed = set()
+
+    def run(self, progress: Callable[[int, int], None] = None) -> int:
+        """
+        Args:
+            progress: 进度回调 (已完成数, 总数)，在调用 run 的线程中执行
+
+        Returns:
+            分析的歌曲数
+        """
+        total = self.client.count_missing_stats() - len(self._failed)
+        if total <= 0:
+            return 0
+        done = 0
+        executor = None
+        try:
+            while rows := self.client.select_missing_stats(self.batch_size, self._failed):
+                notes = [row[1] for row in rows]
+                if len(rows) < self.parallel_threshold:
+                    results = [stats_or_error(n) for n in notes]
+                else:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1)
+                    results = list(executor.map(stats_or_error, notes, chunksize=64))
+                computed = []
+                for (song_id, _), (stats, error) in zip(rows, results):
+                    if stats is not None:
+                        computed.append((song_id, stats))
+                    else:
+                        logger.error('Failed to analyze song %d: %s', song_id, error)
+                        self._failed.add(song_id)
+                self.client.save_stats(computed)
+                done += len(rows)
+                if progress:
+                    progress(min(done, total), total)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        logger.info('已分析 %d 首歌曲的可演奏性', done)
+        return done
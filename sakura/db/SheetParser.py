@@ -0,0 +1,150 @@
+"""
+乐谱文件解析
+
+此模块会在导入进程池的子进程中运行，不要在这里引入数据库、Qt 等有副作用的模块。
+"""
+import codecs
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+import chardet
+
+from sakura.db.MidiParser import MidiOptions, parse_midi
+from sakura.db.NoteCodec import normalize_notes, encode_notes, notes_hash
+from sakura.db.SongStats import compute_stats
+
+# 支持的乐谱文件扩展名
+ALLOWED_EXTENSIONS = ('.json', '.txt', '.skysheet', '.mid', '.midi')
+# 按 MIDI 转换的扩展名
+MIDI_EXTENSIONS = ('.mid', '.midi')
+
+
+class SongRow(NamedTuple):
+    """归一化后的歌曲数据，字段与 SONGS 表对应"""
+    name: str
+    author: str
+    transcriber: str
+    bpm: int
+    pitch_level: int
+    detail: str
+    notes: bytes
+    content_hash: str
+    duration: int
+    note_count: int
+    chord_count: int
+    peak_nps: float
+    max_chord: int
+    min_chord_gap: int | None
+    key_histogram: str
+    density: str
+
+
+class ParsedFile(NamedTuple):
+    """
+    单个乐谱文件的解析结果
+
+    row 为 None 且 error 为 None 表示文件内容与数据库中记录的一致，只需更新修改时间
+    """
+    path: str
+    mtime: int
+    size: int
+    file_hash: str
+    row: SongRow | None
+    error: str | None
+
+
+def parse_json_bytes(raw: bytes):
+    """按 BOM 或检测到的编码解析乐谱文件内容，社区乐谱大多是带 BOM 的 UTF-16"""
+    encoding = _detect_encoding(raw)
+    try:
+        return json.loads(raw.decode(encoding))
+    except (UnicodeDecodeError, LookupError, json.JSONDecodeError) as e:
+        raise ValueError(f"using detected encoding {encoding}: {e}")
+
+
+def _detect_encoding(raw: bytes) -> str:
+    # 编码检测比解析本身还慢，有 BOM 或能按 UTF-8 解码时跳过检测
+    if raw.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        raw.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return chardet.detect(raw[:1024])['encoding'] or 'utf-8'
+
+
+def _as_int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_sheet(raw: bytes) -> SongRow:
+    data = parse_json_bytes(raw)
+    if isinstance(data, list):
+        data = data[0]
+    if not isinstance(data, dict):
+        raise ValueError('Unsupported sheet format')
+    times, keys = normalize_notes(data.get('songNotes') or [])
+    notes = encode_notes(times, keys)
+    return SongRow(
+        name=str(data.get('name') or ''),
+        author=str(data.get('author') or ''),
+        transcriber=str(data.get('transcribedBy') or ''),
+        bpm=_as_int(data.get('bpm'), 300),
+        pitch_level=_as_int(data.get('pitchLevel'), 1),
+        detail=str(data.get('detail') or ''),
+        notes=notes,
+        content_hash=notes_hash(notes),
+        **compute_stats(times, keys)._asdict(),
+    )
+
+
+def parse_midi_sheet(raw: bytes, path: str, options: MidiOptions) -> SongRow:
+    name, bpm, times, keys = parse_midi(raw, path, options)
+    notes = encode_notes(times, keys)
+    return SongRow(
+        name=name,
+        author='',
+        transcriber='',
+        bpm=bpm,
+        pitch_level=0,
+        detail='',
+        notes=notes,
+        content_hash=notes_hash(notes),
+        **compute_stats(times, keys)._asdict(),
+    )
+
+
+def parse_sheet_file(path: str, mtime: int, size: int, known_hash: str | None = None,
+                     midi_options: MidiOptions = MidiOptions()) -> ParsedFile:
+    """
+    读取并解析乐谱文件，异常会作为结果返回而不是抛出，便于在进程池中批量调用
+
+    Args:
+        known_hash: 数据库中记录的文件哈希，与当前内容一致时跳过解析
+        midi_options: MIDI 文件的转换选项
+    """
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        return ParsedFile(path, mtime, size, '', None, str(e))
+    is_midi = os.path.splitext(path)[1].lower() in MIDI_EXTENSIONS
+    file_hash = hashlib.blake2b(raw, digest_size=16)
+    if is_midi:
+        # 转换结果取决于选项，选项变化后即使文件内容相同也要重新转换
+        file_hash.update(repr(tuple(midi_options)).encode())
+    file_hash = file_hash.hexdigest()
+    if file_hash == known_hash:
+        return ParsedFile(path, mtime, size, file_hash, None, None)
+    try:
+        row = parse_midi_sheet(raw, path, midi_options) if is_midi else parse_sheet(raw)
+        return ParsedFile(path, mtime, size, file_hash, row, None)
+    except Exception as e:
+        return ParsedFile(path, mtime, size, file_hash, None, str(e) or type(e).__name__)
@@ -0,0 +1,292 @@
+"""
+只读歌曲包
+
+把一组歌曲打包成一个文件，打开时通过 mmap 映射，不需要导入数据库。文件结构（小端）：
+
+    文件头    64 字节，见 _HEADER
+    索引      按歌名排序的定长记录，见 ENTRY_DTYPE，歌曲 ID 为下标 + 1
+    字符串    歌名、作者等 UTF-8 文本
+    搜索文本  每首歌一段 "歌名\\x1f作者\\x1f扒谱者\\x00"，已 casefold
+    音符      每首歌一段 zlib 压缩的 NoteCodec 二进制
+
+列出和搜索歌曲只会读取索引、字符串和搜索文本所在的页，音符在播放时才解压。
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Callable, Iterable
+
+import numpy as np
+
+from sakura.db.NoteCodec import KEY_COUNT, decode_notes, to_song_notes
+from sakura.db.SheetParser import SongRow
+from sakura.db.SongStats import DENSITY_BINS
+from sakura.db.model.SongModel import SongModel
+from sakura.interface.SongSource import SongSource
+from sakura.metrics import song_loads, timed
+
+PACK_EXTENSION = '.sakurapack'
+
+_MAGIC = b'SAKPACK\0'
+_VERSION = 3
+# 魔数、版本、保留、歌曲数、索引偏移、字符串偏移、字符串长度、搜索文本偏移、搜索文本长度、音符偏移
+_HEADER = struct.Struct('<8sHHI6Q')
+
+ENTRY_DTYPE = np.dtype([
+    ('name_offset', '<u4'), ('name_length', '<u4'),
+    ('author_offset', '<u4'), ('author_length', '<u4'),
+    ('transcriber_offset', '<u4'), ('transcriber_length', '<u4'),
+    ('detail_offset', '<u4'), ('detail_length', '<u4'),
+    # 搜索文本中的偏移，以及其中歌名部分的字节数
+    ('search_offset', '<u4'), ('search_name_length', '<u4'),
+    ('bpm', '<u4'), ('pitch_level', '<i4'),
+    ('duration', '<u4'), ('note_count', '<u4'), ('chord_count', '<u4'), ('max_chord', '<u4'),
+    ('peak_nps', '<f4'),
+    # 相邻和弦的最短间隔，-1 表示少于两个和弦
+    ('min_chord_gap', '<i4'),
+    ('key_histogram', '<u4', (KEY_COUNT,)),
+    # 按时长等分的每段音符数，超过 65535 的记为 65535
+    ('density', '<u2', (DENSITY_BINS,)),
+    # 音符区中的偏移及压缩后的长度
+    ('notes_offset', '<u8'), ('notes_length', '<u4'),
+])
+
+# 每找到多少个匹配检查一次搜索是否被取消
+_CANCEL_CHECK_INTERVAL = 1024
+
+
+def build_pack(path: str, rows: Iterable[SongRow]) -> int:
+    """
+    将歌曲写入歌曲包，音符内容相同的歌曲只保留一首
+
+    先写入临时文件再替换，打包过程中原文件仍可读取。
+
+    Returns:
+        写入的歌曲数
+    """
+    songs = {}
+    for row in rows:
+        if row.content_hash not in songs:
+            songs[row.content_hash] = row._replace(notes=zlib.compress(row.notes, 9))
+    ordered = sorted(songs.values(), key=lambda r: (r.name.casefold(), r.name))
+    index = np.zeros(len(ordered), dtype=ENTRY_DTYPE)
+    strings = bytearray()
+    search = bytearray()
+    notes_offset = 0
+
+    def add_string(text: str) -> tuple[int, int]:
+        data = text.encode('utf-8')
+        strings.extend(data)
+        return len(strings) - len(data), len(data)
+
+    for entry, row in zip(index, ordered):
+        entry['name_offset'], entry['name_length'] = add_string(row.name)
+        entry['author_offset'], entry['author_length'] = add_string(row.author)
+        entry['transcriber_offset'], entry['transcriber_length'] = add_string(row.transcriber)
+        entry['detail_offset'], entry['detail_length'] = add_string(row.detail)
+        search_name = row.name.casefold().encode('utf-8')
+        entry['search_offset'] = len(search)
+        entry['search_name_length'] = len(search_name)
+        search.extend(search_name + b'\x1f' + row.author.casefold().encode('utf-8') + b'\x1f'
+                      + row.transcriber.casefold().encode('utf-8') + b'\x00')
+        entry['bpm'] = row.bpm
+        entry['pitch_level'] = row.pitch_level
+        entry['duration'] = row.duration
+        entry['note_count'] = row.note_count
+        entry['chord_count'] = row.chord_count
+        entry['max_chord'] = row.max_chord
+        entry['peak_nps'] = row.peak_nps
+        entry['min_chord_gap'] = -1 if row.min_chord_gap is None else row.min_chord_gap
+        entry['key_histogram'] = json.loads(row.key_histogram)
+        entry['density'] = np.minimum(json.loads(row.density), 0xFFFF)
+        entry['notes_offset'] = notes_offset
+        entry['notes_length'] = len(row.notes)
+        notes_offset += len(row.notes)
+
+    index_offset = _HEADER.size
+    strings_offset = index_offset + index.nbytes
+    search_offset = strings_offset + len(strings)
+    notes_start = search_offset + len(search)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(ordered), index_offset, strings_offset, len(strings),
+                             search_offset, len(search), notes_start))
+        f.write(index.tobytes())
+        f.write(strings)
+        f.write(search)
+        for row in ordered:
+            f.write(row.notes)
+    os.replace(temp_path, path)
+    return len(ordered)
+
+
+def find_packs(directory: str) -> list[str]:
+    """目录下的所有歌曲包，目录不存在时返回空列表"""
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return []
+    return [os.path.join(directory, n) for n in names if n.lower().endswith(PACK_EXTENSION)]
+
+
+class SongPack(SongSource):
+    """
+    通过 mmap 读取歌曲包，可在多个线程中同时读取
+
+    搜索在已 casefold 的搜索文本上做子串查找，多个关键字需同时匹配，
+    歌名中包含第一个关键字的排在前面，其余按歌名排序。
+    """
+    path: str
+    name: str
+    _count: int
+    _index: np.ndarray
+    # 最近一次搜索的 (关键字, 结果下标)，列表模型会先查总数再查第一页
+    _last_match: tuple[str, np.ndarray] | None = None
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except ValueError:
+            self._mm.close()
+            raise
+
+    def _read_header(self) -> None:
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"Not a song pack: {self.path}")
+        (magic, version, _, count, index_offset, strings_offset, strings_size,
+         search_offset, search_size, notes_offset) = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a song pack: {self.path}")
+        if version != _VERSION:
+            raise ValueError(f"Unsupported song pack version {version}: {self.path}")
+        if index_offset + count * ENTRY_DTYPE.itemsize > len(self._mm) or notes_offset > len(self._mm):
+            raise ValueError(f"Truncated song pack: {self.path}")
+        self._count = count
+        self._index = np.frombuffer(self._mm, dtype=ENTRY_DTYPE, count=count, offset=index_offset)
+        self._strings_offset = strings_offset
+        self._search_start = search_offset
+        self._search_end = search_offset + search_size
+        self._notes_offset = notes_offset
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._index = None
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def select_by_name(self, name: str, limit: int = 200, offset: int = 0,
+                       cancelled: Callable[[], bool] = None) -> list[SongModel]:
+        """
+        与 SongClient.select_by_name 相同，被取消时返回空列表
+        """
+        matches = self._match(name, cancelled)
+        if matches is None:
+            return []
+        end = None if limit < 0 else offset + limit
+        return [self._to_info_model(i) for i in matches[offset:end].tolist()]
+
+    def count_by_name(self, name: str, cancelled: Callable[[], bool] = None) -> int:
+        matches = self._match(name, cancelled)
+        return 0 if matches is None else len(matches)
+
+    @timed(song_loads, 'pack')
+    def select_by_id(self, song_id: int) -> SongModel:
+        if not 1 <= song_id <= self._count:
+            raise ValueError(f"Song {song_id} not found in {self.path}")
+        entry = self._index[song_id - 1]
+        start = self._notes_offset + int(entry['notes_offset'])
+        try:
+            blob = zlib.decompress(self._mm[start:start + int(entry['notes_length'])])
+        except zlib.error as e:
+            raise ValueError(f"Corrupt notes for song {song_id} in {self.path}: {e}")
+        model = self._to_info_model(song_id - 1)
+        model.songNotes = to_song_notes(*decode_notes(blob))
+        model.density = entry['density'].tolist()
+        return model
+
+    def _string(self, entry: np.void, field: str) -> str:
+        start = self._strings_offset + int(entry[field + '_offset'])
+        return self._mm[start:start + int(entry[field + '_length'])].decode('utf-8')
+
+    def _to_info_model(self, i: int) -> SongModel:
+        entry = self._index[i]
+        return SongModel(id=i + 1, name=self._string(entry, 'name'), author=self._string(entry, 'author'),
+                         transcribedBy=self._string(entry, 'transcriber'), detail=self._string(entry, 'detail'),
+                         bpm=int(entry['bpm']), pitchLevel=int(entry['pitch_level']),
+                         duration=int(entry['duration']), noteCount=int(entry['note_count']),
+                         chordCount=int(entry['chord_count']), peakNps=float(entry['peak_nps']),
+                         maxChord=int(entry['max_chord']), keyHistogram=entry['key_histogram'].tolist(),
+                         minChordGap=None if entry['min_chord_gap'] < 0 else int(entry['min_chord_gap']))
+
+    def _match(self, name: str, cancelled: Callable[[], bool] | None) -> np.ndarray | None:
+        """
+        Returns:
+            按结果顺序排列的歌曲下标，被取消时返回 None
+        """
+        keywords = name.casefold().split()
+        if not keywords:
+            return np.arange(self._count)
+        query = ' '.join(keywords)
+        last = self._last_match
+        if last is not None and last[0] == query:
+            return last[1]
+        result = None
+        name_hits = None
+        for keyword in keywords:
+            hits = self._find(keyword.encode('utf-8'), cancelled)
+            if hits is None:
+                return None
+            entries, positions = hits
+            if result is None:
+                result = entries
+                # 第一个关键字出现在歌名部分的歌曲排在前面
+                name_hits = positions + len(keyword.encode('utf-8')) <= (
+                        self._index['search_offset'][entries] + self._index['search_name_length'][entries])
+            else:
+                keep = np.isin(result, entries, assume_unique=True)
+                result = result[keep]
+                name_hits = name_hits[keep]
+            if not len(result):
+                break
+        result = result[np.lexsort((result, ~name_hits))]
+        self._last_match = (query, result)
+        return result
+
+    def _find(self, token: bytes, cancelled: Callable[[], bool] | None) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        在搜索文本中查找子串，每首歌只取第一次出现的位置
+
+        Returns:
+            匹配到的歌曲下标（升序）及出现位置（相对搜索文本开头），被取消时返回 None
+        """
+        find = self._mm.find
+        start = self._search_start
+        end = self._search_end
+        positions = []
+        while True:
+            pos = find(token, start, end)
+            if pos < 0:
+                break
+            positions.append(pos - self._search_start)
+            if cancelled is not None and len(positions) % _CANCEL_CHECK_INTERVAL == 0 and cancelled():
+                return None
+            # 跳到下一首歌的搜索文本
+            start = find(b'\x00', pos + len(token), end) + 1
+            if start <= 0:
+                break
+        positions = np.asarray(positions, dtype=np.int64)
+        entries = np.searchsorted(self._index['search_offset'], positions, side='right') - 1
+        return entries, positions
@@ -0,0 +1,77 @@
+import json
+from typing import NamedTuple
+
+import numpy as np
+
+from sakura.db.NoteCodec import KEY_COUNT, decode_notes, normalize_notes
+
+# 音符密度分布的段数，整首歌按时长等分
+DENSITY_BINS = 128
+
+
+class SongStats(NamedTuple):
+    """歌曲统计信息，导入时计算并保存在 SONGS 表中，列表和排序不需要读取音符数据"""
+    # 最后一个音符的时间，单位毫秒
+    duration: int
+    note_count: int
+    chord_count: int
+    # 任意 1 秒内最多的音符数
+    peak_nps: float
+    # 同时按下的最多琴键数
+    max_chord: int
+    # 相邻两个和弦之间的最短间隔，单位毫秒，少于两个和弦时为 None
+    min_chord_gap: int | None
+    # 每个琴键被按下的次数，json 数组
+    key_histogram: str
+    # 每段时间内的音符数，json 数组，长度为 DENSITY_BINS
+    density: str
+
+
+def compute_stats(times: np.ndarray, keys: np.ndarray) -> SongStats:
+    """
+    根据归一化后的音符计算统计信息
+
+    Args:
+        times: 已排序的音符时间，单位毫秒
+        keys: 琴键下标
+    """
+    count = len(times)
+    if count == 0:
+        return SongStats(0, 0, 0, 0.0, 0, None, json.dumps([0] * KEY_COUNT), json.dumps([0] * DENSITY_BINS))
+    # 时间相同的音符为一个和弦
+    chord_starts = np.flatnonzero(np.r_[True, np.diff(times) != 0])
+    chord_sizes = np.diff(np.r_[chord_starts, count])
+    gaps = np.diff(times[chord_starts])
+    # 以每个音符为起点的 1 秒窗口内的音符数
+    window_ends = np.searchsorted(times, times + 1000, side='left')
+    peak_nps = int((window_ends - np.arange(count)).max())
+    histogram = np.bincount(keys, minlength=KEY_COUNT)[:KEY_COUNT]
+    # 时间 [0, duration] 等分为 DENSITY_BINS 段
+    duration = int(times[-1])
+    density = np.bincount(times * DENSITY_BINS // (duration + 1), minlength=DENSITY_BINS)
+    return SongStats(
+        duration=duration,
+        note_count=count,
+        chord_count=len(chord_starts),
+        peak_nps=float(peak_nps),
+        max_chord=int(chord_sizes.max()),
+        min_chord_gap=int(gaps.min()) if len(gaps) else None,
+        key_histogram=json.dumps(histogram.tolist()),
+        density=json.dumps(density.tolist()),
+    )
+
+
+def stats_or_error(notes: bytes | str) -> tuple[SongStats | None, str | None]:
+    """
+    SONGS 表中保存的音符的统计信息，旧版本以 json 文本保存
+
+    在 PlayabilityAnalyzer 的进程池中运行，单首歌的错误不应中断整批计算，异常作为结果返回，由调用方记录日志
+
+    Returns:
+        (统计信息, 错误信息)
+    """
+    try:
+        times, keys = decode_notes(notes) if isinstance(notes, bytes) else normalize_notes(json.loads(notes or '[]'))
+        return compute_stats(times, keys), None
+    except Exception as e:
+        return None, str(e)
@@ -1,12 +1,52 @@
 import json
 import sqlite3
+from typing import Callable, Collection, Iterator
 
 from sakura.config import conf
+from sakura.config.Config import Capability
+from sakura.config.sakura_logging import get_logger
+from sakura.db.NoteCodec import normalize_notes, encode_notes, decode_notes, to_song_notes, notes_hash
+from sakura.db.SheetParser import ParsedFile, SongRow
+from sakura.db.SongStats import SongStats, compute_stats
 from sakura.db.model.SongModel import SongModel
+from sakura.interface.SongSource import SongSource
+from sakura.metrics import db_query_duration, song_loads, timed
 
+logger = get_logger(__name__)
 
-class SongClient:
+
+class FileRecord:
+    """已索引的乐谱文件，用于判断文件是否需要重新解析"""
+    mtime: int
+    size: int
+    file_hash: str
+    song_id: int
+
+    def __init__(self, mtime: int, size: int, file_hash: str, song_id: int):
+        self.mtime = mtime
+        self.size = size
+        self.file_hash = file_hash
+        self.song_id = song_id
+
+
+class SongClient(SongSource):
     __DB_PATH__: str
+    # trigram 分词器需要 SQLite >= 3.34，不可用时退回到 LIKE 查询
+    _fts_enabled: bool = False
+    # trigram 分词器只能匹配长度不小于 3 的词
+    _FTS_MIN_TOKEN = 3
+    # 可排序的字段，均建有索引
+    _SORT_COLUMNS = {
+        'name': 'NAME',
+        'duration': 'DURATION',
+        'notes': 'NOTE_COUNT',
+        'chords': 'CHORD_COUNT',
+        'density': 'PEAK_NPS',
+        'max_chord': 'MAX_CHORD',
+    }
+    # 不含音符数据的歌曲字段
+    _INFO_COLUMNS = ('ID', 'NAME', 'AUTHOR', 'TRANSCRIBER', 'BPM', 'PITCH_LEVEL', 'DURATION', 'NOTE_COUNT',
+                     'CHORD_COUNT', 'PEAK_NPS', 'MAX_CHORD', 'KEY_HISTOGRAM', 'MIN_CHORD_GAP')
 
     def __init__(self):
         self.__DB_PATH__ = conf.db.path
@@ -14,42 +54,364 @@ class SongClient:
 
     def _create_table(self):
         with sqlite3.connect(self.__DB_PATH__) as conn:
+            # WAL 模式下后台导入时界面仍可以读取
+            conn.execute('PRAGMA journal_mode = WAL')
             conn.execute('''
                          CREATE TABLE IF NOT EXISTS SONGS
                          (
-                             ID          INTEGER PRIMARY KEY AUTOINCREMENT,
-                             NAME        TEXT,
-                             AUTHOR      TEXT,
-                             BPM         INTEGER,
-                             PITCH_LEVEL INTEGER,
-                             SONG_NOTES  TEXT,
-                             DETAIL      TEXT
+                             ID            INTEGER PRIMARY KEY AUTOINCREMENT,
+                             NAME          TEXT,
+                             AUTHOR        TEXT,
+                             TRANSCRIBER   TEXT,
+                             BPM           INTEGER,
+                             PITCH_LEVEL   INTEGER,
+                             SONG_NOTES    TEXT,
+                             DETAIL        TEXT,
+                             CONTENT_HASH  TEXT,
+                             DURATION      INTEGER,
+                             NOTE_COUNT    INTEGER,
+                             CHORD_COUNT   INTEGER,
+                             PEAK_NPS      REAL,
+                             MAX_CHORD     INTEGER,
+                             MIN_CHORD_GAP INTEGER,
+                             KEY_HISTOGRAM TEXT,
+                             DENSITY       TEXT
+                         )
+                         ''')
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS FILES
+                         (
+                             PATH      TEXT PRIMARY KEY,
+                             MTIME     INTEGER,
+                             SIZE      INTEGER,
+                             FILE_HASH TEXT,
+                             SONG_ID   INTEGER
                          )
                          ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS FILES_SONG_ID ON FILES (SONG_ID)')
+            self._add_missing_columns(conn)
+            # 相同音符内容的乐谱只保存一份
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS SONGS_CONTENT_HASH ON SONGS (CONTENT_HASH)')
+            for column in self._SORT_COLUMNS.values():
+                conn.execute(f'CREATE INDEX IF NOT EXISTS SONGS_{column} ON SONGS ({column})')
+            self._fts_enabled = self._create_fts_table(conn)
+
+    @staticmethod
+    def _add_missing_columns(conn: sqlite3.Connection):
+        """旧版本创建的数据库缺少的列"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(SONGS)')}
+        for column, column_type in (('TRANSCRIBER', 'TEXT'), ('CONTENT_HASH', 'TEXT'), ('DURATION', 'INTEGER'),
+                                    ('NOTE_COUNT', 'INTEGER'), ('CHORD_COUNT', 'INTEGER'), ('PEAK_NPS', 'REAL'),
+                                    ('MAX_CHORD', 'INTEGER'), ('KEY_HISTOGRAM', 'TEXT'),
+                                    ('DENSITY', 'TEXT'), ('MIN_CHORD_GAP', 'INTEGER')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE SONGS ADD COLUMN {column} {column_type}')
+
+    @staticmethod
+    def _create_fts_table(conn: sqlite3.Connection) -> bool:
+        """
+        创建 NAME、AUTHOR、TRANSCRIBER 的 FTS5 全文索引，并通过触发器与 SONGS 表保持同步
+
+        Returns:
+            全文索引是否可用
+        """
+        exists = conn.execute('''
+                              SELECT 1
+                              FROM sqlite_master
+                              WHERE type = 'table' AND name = 'SONGS_FTS'
+                              ''').fetchone()
+        if not exists:
+            try:
+                conn.execute('''
+                             CREATE VIRTUAL TABLE SONGS_FTS USING fts5
+                             (
+                                 NAME, AUTHOR, TRANSCRIBER,
+                                 content = 'SONGS',
+                                 content_rowid = 'ID',
+                                 tokenize = 'trigram'
+                             )
+                             ''')
+            except sqlite3.OperationalError as e:
+                logger.warning('FTS5 trigram index unavailable, falling back to LIKE search: %s', e)
+                return False
+            # 已有数据的旧数据库需要重建一次索引
+            conn.execute("INSERT INTO SONGS_FTS (SONGS_FTS) VALUES ('rebuild')")
+        conn.executescript('''
+                           CREATE TRIGGER IF NOT EXISTS SONGS_FTS_AI AFTER INSERT ON SONGS
+                           BEGIN
+                               INSERT INTO SONGS_FTS (rowid, NAME, AUTHOR, TRANSCRIBER)
+                               VALUES (new.ID, new.NAME, new.AUTHOR, new.TRANSCRIBER);
+                           END;
+                           CREATE TRIGGER IF NOT EXISTS SONGS_FTS_AD AFTER DELETE ON SONGS
+                           BEGIN
+                               INSERT INTO SONGS_FTS (SONGS_FTS, rowid, NAME, AUTHOR, TRANSCRIBER)
+                               VALUES ('delete', old.ID, old.NAME, old.AUTHOR, old.TRANSCRIBER);
+                           END;
+                           CREATE TRIGGER IF NOT EXISTS SONGS_FTS_AU AFTER UPDATE OF NAME, AUTHOR, TRANSCRIBER ON SONGS
+                           BEGIN
+                               INSERT INTO SONGS_FTS (SONGS_FTS, rowid, NAME, AUTHOR, TRANSCRIBER)
+                               VALUES ('delete', old.ID, old.NAME, old.AUTHOR, old.TRANSCRIBER);
+                               INSERT INTO SONGS_FTS (rowid, NAME, AUTHOR, TRANSCRIBER)
+                               VALUES (new.ID, new.NAME, new.AUTHOR, new.TRANSCRIBER);
+                           END;
+                           ''')
+        return True
 
     def insert(self, model: SongModel) -> int:
         with sqlite3.connect(self.__DB_PATH__) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                           INSERT INTO SONGS (NAME, AUTHOR, BPM,
-                                              PITCH_LEVEL,
-                                              SONG_NOTES, DETAIL)
-                           VALUES (?, ?, ?, ?, ?, ?)
-                           ''',
-                           (model.name, model.author, model.bpm,
-                            model.pitchLevel, json.dumps(model.songNotes), model.detail))
+            song_id = self._upsert_song(conn, model, encode_notes(*normalize_notes(model.songNotes)))
             conn.commit()
+            return song_id
+
+    @staticmethod
+    def _upsert_song(conn: sqlite3.Connection, model: SongModel, notes: bytes) -> int:
+        """插入歌曲，音符内容已存在时直接返回已有歌曲的 ID"""
+        content_hash = notes_hash(notes)
+        cursor = conn.execute('''
+                              INSERT INTO SONGS (NAME, AUTHOR, TRANSCRIBER, BPM,
+                                                 PITCH_LEVEL,
+                                                 SONG_NOTES, DETAIL, CONTENT_HASH,
+                                                 DURATION, NOTE_COUNT, CHORD_COUNT, PEAK_NPS, MAX_CHORD,
+                                                 MIN_CHORD_GAP, KEY_HISTOGRAM, DENSITY)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                              ON CONFLICT (CONTENT_HASH) DO NOTHING
+                              ''',
+                              (model.name, model.author, model.transcribedBy, model.bpm,
+                               model.pitchLevel, notes, model.detail, content_hash,
+                               *compute_stats(*decode_notes(notes))))
+        if cursor.rowcount:
             return cursor.lastrowid
+        return conn.execute('SELECT ID FROM SONGS WHERE CONTENT_HASH = ?', (content_hash,)).fetchone()[0]
 
-    def select_by_name(self, name: str) -> list[SongModel]:
+    def select_files(self) -> dict[str, FileRecord]:
         with sqlite3.connect(self.__DB_PATH__) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                           SELECT ID, NAME
+                           SELECT PATH, MTIME, SIZE, FILE_HASH, SONG_ID
+                           FROM FILES
+                           ''')
+            return {row[0]: FileRecord(*row[1:]) for row in cursor.fetchall()}
+
+    def apply_library_changes(self, parsed: list[ParsedFile], removed: list[str] = (),
+                              prune: bool = True) -> None:
+        """
+        在一个事务中批量写入乐谱目录的变化
+
+        Args:
+            parsed: 解析结果，row 为 None 的只更新修改时间，解析失败的会被忽略
+            removed: 已被删除的文件路径
+            prune: 是否删除不再被任何文件引用的歌曲（包括旧版本导入、没有文件记录的歌曲）
+        """
+        touched = [(f.mtime, f.size, f.path) for f in parsed if f.row is None and f.error is None]
+        rows = [f for f in parsed if f.row is not None]
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.executemany('UPDATE FILES SET MTIME = ?, SIZE = ? WHERE PATH = ?', touched)
+            conn.executemany('''
+                             INSERT INTO SONGS (NAME, AUTHOR, TRANSCRIBER, BPM, PITCH_LEVEL,
+                                                DETAIL, SONG_NOTES, CONTENT_HASH,
+                                                DURATION, NOTE_COUNT, CHORD_COUNT, PEAK_NPS, MAX_CHORD,
+                                                MIN_CHORD_GAP, KEY_HISTOGRAM, DENSITY)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                             ON CONFLICT (CONTENT_HASH) DO NOTHING
+                             ''', [f.row for f in rows])
+            conn.executemany('''
+                             INSERT OR REPLACE INTO FILES (PATH, MTIME, SIZE, FILE_HASH, SONG_ID)
+                             VALUES (?, ?, ?, ?, (SELECT ID FROM SONGS WHERE CONTENT_HASH = ?))
+                             ''', [(f.path, f.mtime, f.size, f.file_hash, f.row.content_hash) for f in rows])
+            conn.executemany('DELETE FROM FILES WHERE PATH = ?', [(path,) for path in removed])
+            if prune:
+                conn.execute('''
+                             DELETE
+                             FROM SONGS
+                             WHERE NOT EXISTS (SELECT 1 FROM FILES WHERE FILES.SONG_ID = SONGS.ID)
+                             ''')
+            conn.commit()
+
+    @timed(db_query_duration)
+    def select_by_name(self, name: str, limit: int = 200, offset: int = 0,
+                       cancelled: Callable[[], bool] = None) -> list[SongModel]:
+        """
+        按歌名、作者、扒谱者搜索，结果按相关度排序，关键字为空时按歌名排序返回所有歌曲
+
+        Args:
+            name: 搜索关键字，多个关键字用空格分隔，需同时匹配
+            limit: 最多返回的条数，-1 表示不限制
+            offset: 跳过的条数，用于分页
+            cancelled: 查询过程中定期调用，返回 True 时中断查询并抛出 sqlite3.OperationalError
+        """
+        source, where, params, order, order_params = self._search_clause(name)
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            self._set_cancel_handler(conn, cancelled)
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                           SELECT {', '.join('SONGS.' + c for c in self._INFO_COLUMNS)}
+                           FROM {source}
+                           WHERE {where}
+                           ORDER BY {order}
+                           LIMIT ? OFFSET ?
+                           ''', (*params, *order_params, limit, offset))
+            return [self._to_info_model(row) for row in cursor.fetchall()]
+
+    @timed(db_query_duration)
+    def count_by_name(self, name: str, cancelled: Callable[[], bool] = None) -> int:
+        """select_by_name 不分页时的结果数"""
+        source, where, params, _, _ = self._search_clause(name)
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            self._set_cancel_handler(conn, cancelled)
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                           SELECT COUNT(*)
+                           FROM {source}
+                           WHERE {where}
+                           ''', params)
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _set_cancel_handler(conn: sqlite3.Connection, cancelled: Callable[[], bool] | None):
+        if cancelled is not None:
+            # 每执行约 1000 条虚拟机指令检查一次
+            conn.set_progress_handler(cancelled, 1000)
+
+    def _search_clause(self, name: str) -> tuple[str, str, list, str, list]:
+        """
+        Returns:
+            搜索使用的 FROM、WHERE 及其参数、ORDER BY 及其参数
+        """
+        keywords = name.split()
+        if not keywords:
+            return 'SONGS', '1 = 1', [], 'SONGS.NAME, SONGS.ID', []
+        fts_keywords = [k for k in keywords if len(k) >= self._FTS_MIN_TOKEN]
+        if not self._fts_enabled or not fts_keywords:
+            # 关键字过短或全文索引不可用时回退到 LIKE 查询，歌名以关键字开头的排在前面
+            like_sql, like_params = self._like_clause(keywords, 'SONGS.')
+            return ('SONGS', '1 = 1' + like_sql, like_params,
+                    'INSTR(LOWER(SONGS.NAME), LOWER(?)) = 0, INSTR(LOWER(SONGS.NAME), LOWER(?)), SONGS.ID',
+                    [keywords[0], keywords[0]])
+        like_sql, like_params = self._like_clause([k for k in keywords if len(k) < self._FTS_MIN_TOKEN], 'SONGS.')
+        # 每个关键字作为短语匹配，trigram 分词下即为子串匹配
+        match = ' AND '.join('"' + k.replace('"', '""') + '"' for k in fts_keywords)
+        # 得分相同的歌曲按编号排序，分页时顺序稳定，不会重复或遗漏
+        return ('SONGS_FTS JOIN SONGS ON SONGS.ID = SONGS_FTS.rowid', 'SONGS_FTS MATCH ?' + like_sql,
+                [match, *like_params], 'bm25(SONGS_FTS, 10.0, 2.0, 1.0), SONGS.ID', [])
+
+    @staticmethod
+    def _like_clause(keywords: list[str], prefix: str = '') -> tuple[str, list[str]]:
+        sql = ''
+        params = []
+        for keyword in keywords:
+            pattern = '%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            sql += (f" AND ({prefix}NAME LIKE ? ESCAPE '\\' OR {prefix}AUTHOR LIKE ? ESCAPE '\\'"
+                    f" OR {prefix}TRANSCRIBER LIKE ? ESCAPE '\\')")
+            params += [pattern] * 3
+        return sql, params
+
+    @timed(db_query_duration)
+    def select_songs(self, order_by: str = 'name', descending: bool = False, limit: int = -1, offset: int = 0,
+                     max_duration: int = None, max_peak_nps: float = None) -> list[SongModel]:
+        """
+        查询歌曲信息及统计数据，不读取音符数据
+
+        Args:
+            order_by: 排序字段，可选 name、duration、notes、chords、density、max_chord
+            descending: 是否降序
+            limit: 最多返回的条数，-1 表示不限制
+            offset: 跳过的条数
+            max_duration: 只返回时长不超过此值的歌曲，单位毫秒
+            max_peak_nps: 只返回每秒最多音符数不超过此值的歌曲
+        """
+        column = self._SORT_COLUMNS.get(order_by)
+        if column is None:
+            raise ValueError(f"Unsupported sort field: {order_by}")
+        where = ''
+        params = []
+        if max_duration is not None:
+            where += ' AND SONGS.DURATION <= ?'
+            params.append(max_duration)
+        if max_peak_nps is not None:
+            where += ' AND SONGS.PEAK_NPS <= ?'
+            params.append(max_peak_nps)
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                           SELECT {', '.join('SONGS.' + c for c in self._INFO_COLUMNS)}
                            FROM SONGS
-                           WHERE NAME like '%' || ? || '%'
-                           ''', (name,))
-            return [SongModel(id=row[0], name=row[1]) for row in cursor.fetchall()]
+                           WHERE 1 = 1 {where}
+                           ORDER BY SONGS.{column} {'DESC' if descending else 'ASC'}, SONGS.ID
+                           LIMIT ? OFFSET ?
+                           ''', (*params, limit, offset))
+            return [self._to_info_model(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _to_info_model(row: tuple) -> SongModel:
+        return SongModel(id=row[0], name=row[1] or '', author=row[2] or '', transcribedBy=row[3] or '',
+                         bpm=row[4] or 0, pitchLevel=row[5] or 0, duration=row[6] or 0, noteCount=row[7] or 0,
+                         chordCount=row[8] or 0, peakNps=row[9] or 0, maxChord=row[10] or 0,
+                         keyHistogram=json.loads(row[11]) if row[11] else [], minChordGap=row[12])
+
+    # 旧版本导入、尚未计算统计信息的歌曲，统计信息总是一起写入
+    _MISSING_STATS = 'DURATION IS NULL'
+
+    def count_missing_stats(self) -> int:
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            return conn.execute(f'''
+                                SELECT COUNT(*)
+                                FROM SONGS
+                                WHERE {self._MISSING_STATS}
+                                ''').fetchone()[0]
+
+    def select_missing_stats(self, limit: int, skip: Collection[int] = ()) -> list[tuple[int, bytes | str]]:
+        """
+        尚未计算统计信息的歌曲的 (ID, 音符数据)
+
+        Args:
+            skip: 计算失败、不再读取的歌曲 ID
+        """
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            return conn.execute(f'''
+                                SELECT ID, SONG_NOTES
+                                FROM SONGS
+                                WHERE {self._MISSING_STATS}
+                                  AND ID NOT IN ({', '.join('?' * len(skip))})
+                                LIMIT ?
+                                ''', (*skip, limit)).fetchall()
+
+    def save_stats(self, rows: list[tuple[int, SongStats]]) -> None:
+        """保存 (歌曲 ID, 统计信息)"""
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            conn.executemany('''
+                             UPDATE SONGS
+                             SET DURATION = ?, NOTE_COUNT = ?, CHORD_COUNT = ?, PEAK_NPS = ?, MAX_CHORD = ?,
+                                 MIN_CHORD_GAP = ?, KEY_HISTOGRAM = ?, DENSITY = ?
+                             WHERE ID = ?
+                             ''', [(*stats, song_id) for song_id, stats in rows])
+            conn.commit()
+
+    @timed(db_query_duration)
+    def select_by_feasibility(self, capability: Capability, limit: int = -1,
+                              offset: int = 0) -> list[tuple[SongModel, float]]:
+        """
+        按可演奏比例从低到高列出已分析的歌曲，计算方式与 Playability.feasibility 相同
+
+        Returns:
+            (歌曲信息, 可演奏比例)
+        """
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                           SELECT {', '.join('SONGS.' + c for c in self._INFO_COLUMNS)},
+                                  MIN(1.0,
+                                      CASE WHEN PEAK_NPS > 0 THEN ? / PEAK_NPS ELSE 1.0 END,
+                                      CASE WHEN MIN_CHORD_GAP IS NOT NULL AND ? > 0
+                                               THEN MIN_CHORD_GAP * 1.0 / ? ELSE 1.0 END,
+                                      CASE WHEN MAX_CHORD > 0 THEN ? * 1.0 / MAX_CHORD ELSE 1.0 END) AS SCORE
+                           FROM SONGS
+                           WHERE NOT ({self._MISSING_STATS})
+                           ORDER BY SCORE, SONGS.NAME
+                           LIMIT ? OFFSET ?
+                           ''', (capability.max_nps, capability.min_gap, capability.min_gap, capability.max_chord,
+                                 limit, offset))
+            return [(self._to_info_model(row), row[13]) for row in cursor.fetchall()]
 
     def select_all(self) -> list[SongModel]:
         with sqlite3.connect(self.__DB_PATH__) as conn:
@@ -60,16 +422,37 @@ class SongClient:
                            ''')
             return [SongModel(id=row[0], name=row[1]) for row in cursor.fetchall()]
 
+    @timed(song_loads, 'library')
     def select_by_id(self, song_id: int) -> SongModel:
         with sqlite3.connect(self.__DB_PATH__) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                           SELECT NAME, SONG_NOTES, ID
+                           SELECT NAME, SONG_NOTES, ID, DURATION, DENSITY
                            FROM SONGS
                            WHERE ID = ?
                            ''', (song_id,))
             v = cursor.fetchone()
-            return SongModel(name=v[0], songNotes=json.loads(v[1]), id=v[2])
+            if v is None:
+                raise ValueError(f"Song {song_id} not found")
+            # 旧版本以 json 文本保存 songNotes
+            song_notes = to_song_notes(*decode_notes(v[1])) if isinstance(v[1], bytes) else json.loads(v[1])
+            return SongModel(name=v[0], songNotes=song_notes, id=v[2], duration=v[3] or 0,
+                             density=json.loads(v[4]) if v[4] else [])
+
+    def iter_song_rows(self) -> Iterator[SongRow]:
+        """按歌名顺序读取所有歌曲的完整数据，用于打包"""
+        with sqlite3.connect(self.__DB_PATH__) as conn:
+            cursor = conn.execute('''
+                                  SELECT NAME, AUTHOR, TRANSCRIBER, BPM, PITCH_LEVEL, DETAIL, SONG_NOTES
+                                  FROM SONGS
+                                  ORDER BY NAME, ID
+                                  ''')
+            for name, author, transcriber, bpm, pitch_level, detail, notes in cursor:
+                # 旧版本以 json 文本保存 songNotes
+                times, keys = decode_notes(notes) if isinstance(notes, bytes) else normalize_notes(json.loads(notes))
+                blob = encode_notes(times, keys)
+                yield SongRow(name or '', author or '', transcriber or '', bpm or 0, pitch_level or 0, detail or '',
+                              blob, notes_hash(blob), *compute_stats(times, keys))
 
     def db_is_null(self) -> bool:
         with sqlite3.connect(self.__DB_PATH__) as conn:
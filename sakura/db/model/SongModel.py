@@ -7,9 +7,21 @@ class SongModel(BaseModel):
     id: int = None
     name: str = ''
     author: str = ''
+    transcribedBy: str = ''
     bpm: int = 300
     pitchLevel: int = 1
     songNotes: list[dict[str, Any]] = []
     detail: str = ''
     # 外部数据id
     sid: int = None
+    # 以下为导入时计算的统计信息，时长单位毫秒
+    duration: int = 0
+    noteCount: int = 0
+    chordCount: int = 0
+    peakNps: float = 0
+    maxChord: int = 0
+    keyHistogram: list[int] = []
+    # 按时长等分的每段音符数，只在读取单首歌曲时填充
+    density: list[int] = []
+    # 相邻两个和弦之间的最短间隔，单位毫秒，旧版本导入、尚未补充或少于两个和弦时为 None
+    minChordGap: int = None
@@ -11,5 +11,9 @@ player_mapper = {
     "demo": {
         "class": "DemoPlayer",
         "module": "sakura.components.player.DemoPlayer"
+    },
+    "android_fleet": {
+        "class": "AndroidFleetPlayer",
+        "module": "sakura.components.player.AndroidFleet"
     }
 }
\ No newline at end of file
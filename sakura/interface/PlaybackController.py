@@ -0,0 +1,46 @@
+from abc import ABC, abstractmethod
+
+
+class PlaybackController(ABC):
+    """
+    控制接口操作播放器的方式，方法在控制接口的线程中调用，实现需要自行切换到播放器所在的线程
+
+    参数不合法时抛出 ValueError。
+    """
+
+    @abstractmethod
+    def play(self, song_id: int = None) -> None:
+        """播放指定歌曲，未指定时继续播放当前歌曲"""
+        pass
+
+    @abstractmethod
+    def pause(self) -> None:
+        pass
+
+    @abstractmethod
+    def seek(self, time_ms: int) -> None:
+        pass
+
+    @abstractmethod
+    def set_rate(self, rate: float) -> None:
+        """播放速度倍率，1 为原速"""
+        pass
+
+    @abstractmethod
+    def enqueue(self, song_id: int) -> None:
+        """当前歌曲播放完后依次播放队列中的歌曲"""
+        pass
+
+    @abstractmethod
+    def clear_queue(self) -> None:
+        pass
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """按关键字搜索歌曲，返回 id、name、author、duration"""
+        pass
+
+    @abstractmethod
+    def state(self) -> dict:
+        """当前的播放状态，会被频繁调用，不能阻塞"""
+        pass
@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from sakura.db.model.SongModel import SongModel
+
+
+class SongSource(ABC):
+    """歌曲列表和播放器读取歌曲的来源，例如乐谱库数据库或歌曲包"""
+
+    @abstractmethod
+    def select_by_name(self, name: str, limit: int = 200, offset: int = 0,
+                       cancelled: Callable[[], bool] = None) -> list[SongModel]:
+        """按关键字搜索歌曲信息（不含音符），关键字为空时按歌名返回所有歌曲"""
+        pass
+
+    @abstractmethod
+    def count_by_name(self, name: str, cancelled: Callable[[], bool] = None) -> int:
+        pass
+
+    @abstractmethod
+    def select_by_id(self, song_id: int) -> SongModel:
+        """读取包含 songNotes 的完整歌曲，歌曲不存在时抛出 ValueError"""
+        pass
@@ -1,9 +1,16 @@
 # 一个按键只负责一个功能，新注册的按键会覆盖旧的按键
-from typing import Callable, Any
+import statistics
+import threading
+import time
+from collections import deque
+from queue import SimpleQueue
+from typing import Callable, Any, NamedTuple
 
 from pynput import keyboard
 
-from sakura.config.sakura_logging import logger
+from sakura.config.sakura_logging import get_logger
+
+logger = get_logger(__name__)
 
 
 class ListenerDetail:
@@ -15,19 +22,117 @@ class ListenerDetail:
         self.func = func
 
 
+class HotkeyEvent(NamedTuple):
+    key: Any
+    # 键盘钩子收到按键的时间，time.perf_counter()
+    pressed_at: float
+
+
+class HotkeyStats(NamedTuple):
+    count: int
+    # 从按下到开始执行回调的耗时，单位毫秒
+    median_ms: float
+    max_ms: float
+
+
 listener_dict: dict[Any, ListenerDetail] = {}
 
 
-def listener(key):
-    logger.debug(f'按键 {key} 被按下')
-    if key in listener_dict:
-        listener_dict[key].func()
+class HotkeyDispatcher:
+    """
+    快捷键分发
+
+    键盘钩子线程中只过滤已注册的按键并放入队列，不执行回调，避免阻塞系统的键盘输入。
+    分发线程从队列取出事件后交给 deliver，默认直接在分发线程中执行回调，
+    图形界面通过 set_delivery 改为经 Qt 排队连接在界面线程中执行 run_event。
+    按住按键时系统的重复按键会被忽略，debounce 秒内的再次按下也会被忽略。
+    钩子可能漏掉松开事件（如切换窗口时），超过 hold_timeout 秒没有收到同一按键的事件时，下一次按下视为新的按下。
+    """
+    debounce: float = 0.15
+    # 按住时系统重复按键的间隔远小于此值
+    hold_timeout: float = 1.0
+    # 每个按键保留的最近延迟数
+    history: int = 256
+
+    def __init__(self):
+        self._queue: SimpleQueue[HotkeyEvent] = SimpleQueue()
+        # 按住的按键及最近一次收到其按下或重复事件的时间
+        self._held: dict[Any, float] = {}
+        self._last_press: dict[Any, float] = {}
+        self._latencies: dict[Any, deque[float]] = {}
+        self._deliver: Callable[[HotkeyEvent], None] = self.run_event
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def on_press(self, key):
+        # 在键盘钩子线程中执行，只做字典查找和入队
+        if key not in listener_dict:
+            return
+        now = time.perf_counter()
+        last_seen = self._held.get(key)
+        self._held[key] = now
+        if last_seen is not None and now - last_seen < self.hold_timeout:
+            return
+        if now - self._last_press.get(key, float('-inf')) < self.debounce:
+            return
+        self._last_press[key] = now
+        self._queue.put(HotkeyEvent(key, now))
+
+    def on_release(self, key):
+        self._held.pop(key, None)
+
+    def set_delivery(self, deliver: Callable[[HotkeyEvent], None]):
+        self._deliver = deliver
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='HotkeyDispatcher')
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                self._deliver(event)
+            except Exception as e:
+                logger.error('Error delivering hotkey %s: %s', event.key, e)
+
+    def run_event(self, event: HotkeyEvent):
+        """执行按键的回调并记录从按下到执行的延迟"""
+        detail = listener_dict.get(event.key)
+        if detail is None:
+            return
+        latency = (time.perf_counter() - event.pressed_at) * 1000
+        with self._lock:
+            self._latencies.setdefault(event.key, deque(maxlen=self.history)).append(latency)
+        logger.debug('Hotkey %s (%s) dispatched after %.1fms', event.key, detail.describe, latency)
+        detail.func()
+
+    def latency_stats(self) -> dict[Any, HotkeyStats]:
+        with self._lock:
+            latencies = {key: list(values) for key, values in self._latencies.items()}
+        return {key: HotkeyStats(len(values), statistics.median(values), max(values))
+                for key, values in latencies.items() if values}
+
+
+dispatcher = HotkeyDispatcher()
+
+# 全局键盘钩子，注册第一个按键时才开始监听
+_keyboard_listener: keyboard.Listener | None = None
+_start_lock = threading.Lock()
 
 
-# 开始监听
-keyboard.Listener(on_press=listener).start()
+def _ensure_listening():
+    global _keyboard_listener
+    with _start_lock:
+        if _keyboard_listener is None:
+            dispatcher.start()
+            _keyboard_listener = keyboard.Listener(on_press=dispatcher.on_press, on_release=dispatcher.on_release)
+            _keyboard_listener.start()
 
 
 # 注册监听
 def register_listener(key, func: Callable, describe: str = ''):
     listener_dict[key] = ListenerDetail(func, describe)
+    _ensure_listening()
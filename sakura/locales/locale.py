@@ -1,23 +1,69 @@
 import json
 import os
+import threading
+from typing import Callable
 
-from sakura.config import conf
+from sakura.config import conf, config_service
 
 
 class Locale:
+    name: str
+    region: str
     __messages__: dict[str, str]
 
     def messages(self, title: str) -> str:
         return self.__messages__[title]
 
 
-def load_locale_messages(name: str) -> Locale:
+# 已加载的语言文件，切换语言时原地替换其中的文本
+_locales: dict[str, Locale] = {}
+_locales_lock = threading.Lock()
+_listeners: list[Callable[[], None]] = []
+
+
+def _read_messages(region: str, name: str) -> dict[str, str]:
     try:
-        with open(os.path.join(os.getcwd(), f'resources/locales/{conf.region}/{name}.json'), 'r', encoding='UTF-8') as f:
-            locale = Locale()
-            locale.__messages__ = json.load(f)
-            return locale
+        with open(os.path.join(os.getcwd(), f'resources/locales/{region}/{name}.json'), 'r', encoding='UTF-8') as f:
+            return json.load(f)
     except FileNotFoundError:
         raise FileNotFoundError(f"json file not found")
     except json.JSONDecodeError as e:
         raise ValueError(f"Error parsing json file: {e}")
+
+
+def load_locale_messages(name: str) -> Locale:
+    with _locales_lock:
+        locale = _locales.get(name)
+        if locale is None:
+            locale = Locale()
+            locale.name = name
+            locale.region = conf.region
+            locale.__messages__ = _read_messages(locale.region, name)
+            _locales[name] = locale
+        return locale
+
+
+def add_locale_listener(listener: Callable[[], None]):
+    """注册切换语言后的回调，回调在切换语言的线程中执行"""
+    _listeners.append(listener)
+
+
+def switch_locale(region: str):
+    """切换所有已加载的语言文件，任意一个读取失败时保持原语言"""
+    with _locales_lock:
+        locales = [locale for locale in _locales.values() if locale.region != region]
+        messages = [_read_messages(region, locale.name) for locale in locales]
+        for locale, locale_messages in zip(locales, messages):
+            locale.region = region
+            locale.__messages__ = locale_messages
+    if locales:
+        for listener in list(_listeners):
+            listener()
+
+
+def _config_changed(changed: set[str]):
+    if 'region' in changed:
+        switch_locale(conf.region)
+
+
+config_service.subscribe(_config_changed)
\ No newline at end of file
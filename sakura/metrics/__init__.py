@@ -0,0 +1,256 @@
+"""
+运行指标
+
+计数器、直方图和仪表盘，可通过 start_server 在本机以 Prometheus 文本格式（/metrics）和 JSON（/metrics.json）读取。
+记录指标时不加锁：每个线程只写自己的分片，读取时再把各线程的分片相加，播放线程上只有一次字典查找和列表元素自增。
+"""
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from sakura.config.sakura_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 以秒为单位的默认分桶，覆盖 0.1 毫秒到 2.5 秒
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _Sharded:
+    """按线程分片的计数，size 为每个分片的长度"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._shards: dict[int, list] = {}
+
+    def _shard(self) -> list:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            # 只有当前线程会写入自己的分片，setdefault 在 GIL 下是原子的
+            shard = self._shards.setdefault(threading.get_ident(), [0] * self._size)
+        return shard
+
+    def _sum(self) -> list:
+        total = [0] * self._size
+        for shard in list(self._shards.values()):
+            for i, value in enumerate(shard):
+                total[i] += value
+        return total
+
+
+class Counter(_Sharded):
+    """只增不减的计数"""
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shard()[0] += amount
+
+    def value(self) -> float:
+        return self._sum()[0]
+
+
+class Histogram(_Sharded):
+    """按分桶统计的观测值，分片依次为各分桶的计数、超出最大分桶的计数、总和"""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        super().__init__(len(buckets) + 2)
+        self.buckets = buckets
+
+    def observe(self, value: float) -> None:
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> tuple[list[int], int, float]:
+        """
+        Returns:
+            (各分桶的累计计数, 总数, 总和)
+        """
+        total = self._sum()
+        cumulative = []
+        count = 0
+        for value in total[:-1]:
+            count += value
+            cumulative.append(count)
+        return cumulative[:-1], count, total[-1]
+
+
+class Gauge:
+    """当前值，可以直接设置，也可以在读取时调用 func 获取"""
+
+    def __init__(self, func: Callable[[], float] = None):
+        self._value = 0
+        self._func = func
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def value(self) -> float:
+        return self._func() if self._func else self._value
+
+
+class Metric:
+    """一个指标及其按标签值区分的各个子项"""
+    kinds = {'counter': Counter, 'histogram': Histogram, 'gauge': Gauge}
+
+    def __init__(self, kind: str, name: str, describe: str, label_names: tuple[str, ...] = (), **options):
+        self.kind = kind
+        self.name = name
+        self.describe = describe
+        self.label_names = label_names
+        self._options = options
+        self._children: dict[tuple[str, ...], Counter | Histogram | Gauge] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """标签值对应的子项，调用方应保存返回值，避免在热路径上重复查找"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self.kinds[self.kind](**self._options))
+        return child
+
+    def children(self) -> list[tuple[dict[str, str], Counter | Histogram | Gauge]]:
+        return [(dict(zip(self.label_names, values)), child) for values, child in list(self._children.items())]
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = 'sakura_'):
+        self.prefix = prefix
+        self._metrics: list[Metric] = []
+
+    def _add(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, describe: str, label_names: tuple[str, ...] = ()) -> Metric:
+        return self._add(Metric('counter', self.prefix + name, describe, label_names))
+
+    def histogram(self, name: str, describe: str, label_names: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Metric:
+        return self._add(Metric('histogram', self.prefix + name, describe, label_names, buckets=buckets))
+
+    def gauge(self, name: str, describe: str, func: Callable[[], float] = None) -> Metric:
+        return self._add(Metric('gauge', self.prefix + name, describe, func=func))
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.describe}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labels, child in metric.children():
+                if isinstance(child, Histogram):
+                    cumulative, count, total = child.snapshot()
+                    for bound, value in zip(child.buckets, cumulative):
+                        lines.append(f'{metric.name}_bucket{_format_labels(labels, le=repr(bound))} {value}')
+                    lines.append(f'{metric.name}_bucket{_format_labels(labels, le="+Inf")} {count}')
+                    lines.append(f'{metric.name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{metric.name}_count{_format_labels(labels)} {count}')
+                else:
+                    lines.append(f'{metric.name}{_format_labels(labels)} {child.value()}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> dict:
+        result = {}
+        for metric in self._metrics:
+            values = []
+            for labels, child in metric.children():
+                if isinstance(child, Histogram):
+                    cumulative, count, total = child.snapshot()
+                    values.append({'labels': labels, 'count': count, 'sum': total,
+                                   'buckets': dict(zip(map(str, child.buckets), cumulative))})
+                else:
+                    values.append({'labels': labels, 'value': child.value()})
+            result[metric.name] = {'type': metric.kind, 'help': metric.describe, 'values': values}
+        return result
+
+
+def _format_labels(labels: dict[str, str], **extra: str) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items.items()) + '}'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def timed(metric: Metric, *label_values: str):
+    """记录函数耗时的装饰器，未指定标签值时以函数名作为标签值"""
+
+    def decorator(func):
+        child = metric.labels(*(label_values or (func.__name__,)))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+# 晚于计划时间多少秒的音符计入 late_notes
+LATE_THRESHOLD = 0.005
+
+registry = MetricsRegistry()
+
+# 没有标签的指标直接保存其唯一的子项
+chords_scheduled = registry.counter('chords_scheduled_total', 'Chords dispatched to the backend').labels()
+late_notes = registry.counter('late_notes_total', 'Notes dispatched more than 5ms after their deadline').labels()
+dropped_notes = registry.counter('dropped_notes_total', 'Notes skipped because their time had already passed').labels()
+scheduler_lateness = registry.histogram('scheduler_lateness_seconds',
+                                        'Delay between a chord deadline and its dispatch').labels()
+press_duration = registry.histogram('backend_press_seconds', 'Time spent in Player.press', ('backend',))
+queue_depth = registry.gauge('queue_depth', 'Chords waiting in the playback queue').labels()
+active_threads = registry.gauge('active_threads', 'Live Python threads', threading.active_count).labels()
+db_query_duration = registry.histogram('db_query_seconds', 'Song library query time', ('query',))
+song_loads = registry.histogram('song_load_seconds', 'Time to load the notes of a song', ('source',))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = registry.to_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(registry.to_json()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug('Metrics request: ' + format, *args)
+
+
+def start_server(host: str, port: int) -> ThreadingHTTPServer | None:
+    """在后台线程中提供指标，返回的服务器可通过 shutdown() 停止，端口被占用时返回 None"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error('Failed to serve metrics on %s:%d: %s', host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='MetricsServer').start()
+    logger.info('Serving metrics on http://%s:%d/metrics', host, server.server_port)
+    return server
+
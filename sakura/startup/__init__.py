@@ -0,0 +1,158 @@
+"""
+启动相关的工具：延迟创建的对象和启动耗时分析
+
+命令行带 --profile-startup 或设置环境变量 SAKURA_PROFILE_STARTUP=1 时，会统计之后每个模块的导入耗时
+和 profiler.step 标记的各步骤耗时，调用 profiler.report() 时输出。
+本模块只依赖标准库，需要在其他模块之前导入才能统计到它们的导入耗时。
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec
+from typing import Callable, Generic, TypeVar, Iterator
+
+PROFILE_FLAG = '--profile-startup'
+
+T = TypeVar('T')
+
+
+class _TimedLoader:
+    """包装模块的 loader，记录 exec_module 的耗时，其余属性转发给原 loader"""
+
+    def __init__(self, loader, profiler: 'StartupProfiler'):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec: ModuleSpec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.importing(module.__name__):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+
+class _TimingFinder(MetaPathFinder):
+    """用其余的 finder 查找模块，并把找到的 loader 替换为 _TimedLoader"""
+
+    def __init__(self, profiler: 'StartupProfiler'):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self._profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    enabled: bool
+    # (模块名, 自身耗时, 含子模块的总耗时)，单位秒
+    imports: list[tuple[str, float, float]]
+    # (步骤名, 耗时)，单位秒
+    steps: list[tuple[str, float]]
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.imports = []
+        self.steps = []
+        self._started = time.perf_counter()
+        # 正在导入的模块：[模块名, 开始时间, 子模块耗时]
+        self._stack: list[list] = []
+        self._lock = threading.Lock()
+        if enabled:
+            sys.meta_path.insert(0, _TimingFinder(self))
+
+    @contextmanager
+    def importing(self, name: str) -> Iterator[None]:
+        # 只统计主线程的导入，避免后台线程打乱嵌套关系
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            total = time.perf_counter() - frame[1]
+            if self._stack:
+                self._stack[-1][2] += total
+            self.imports.append((name, total - frame[2], total))
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append((name, time.perf_counter() - start))
+
+    def report(self, title: str = 'startup', top: int = 20) -> None:
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - self._started
+        imported = sum(self_time for _, self_time, _ in self.imports)
+        lines = [f'{title}: {elapsed * 1000:.1f}ms since profiling started, '
+                 f'{len(self.imports)} module(s) imported in {imported * 1000:.1f}ms']
+        lines.append('  slowest imports (self / cumulative):')
+        for name, self_time, total in sorted(self.imports, key=lambda i: i[1], reverse=True)[:top]:
+            lines.append(f'    {self_time * 1000:8.1f}ms {total * 1000:8.1f}ms  {name}')
+        lines.append('  steps:')
+        with self._lock:
+            steps = list(self.steps)
+        for name, duration in steps:
+            lines.append(f'    {duration * 1000:8.1f}ms  {name}')
+        print('\n'.join(lines), file=sys.stderr)
+
+
+profiler = StartupProfiler(PROFILE_FLAG in sys.argv or os.environ.get('SAKURA_PROFILE_STARTUP') == '1')
+
+
+class Lazy(Generic[T]):
+    """
+    首次访问属性时才调用 factory 创建对象，之后所有属性的读写都转发给该对象
+
+    用于替代导入时就创建的模块级单例，如配置和数据库连接，使导入本身不产生副作用。
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _get(self) -> T:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    with profiler.step(self._name):
+                        instance = self._factory()
+                    object.__setattr__(self, '_instance', instance)
+        return instance
+
+    def __getattr__(self, item):
+        return getattr(self._get(), item)
+
+    def __setattr__(self, key, value):
+        setattr(self._get(), key, value)
+
+    def __repr__(self):
+        instance = self._instance
+        return f'<lazy {self._name}>' if instance is None else repr(instance)
@@ -0,0 +1,109 @@
+"""
+用于测试多设备演奏的 adb 替身，只依赖标准库，可以直接作为 adb.path 使用：
+
+    adb:
+      path: tests/FakeAdb.py
+      devices: [fake1, fake2, fake3]
+
+只支持 adb -s <serial> shell，从标准输入逐行读取命令，每行在模拟的传输延迟后执行。支持的命令：
+echo（其中的 $(date +%s%N) 替换为模拟设备的时间）、变量赋值 a=$(date +%s%N)、input tap、input keyevent，
+以 ; 或 & 分隔。通过环境变量设置各设备的表现，值为 "serial=毫秒,..."，未列出的设备使用 default：
+
+    FAKE_ADB_LATENCY   单程传输延迟，命令和输出都会推迟，默认 default=20
+    FAKE_ADB_OFFSET    设备时钟相对电脑的偏差，默认 default=0
+    FAKE_ADB_INPUT     input 命令的启动耗时，默认 default=80
+    FAKE_ADB_LOG       每次 input tap 实际生效时，以 "serial 电脑时间纳秒 x y" 追加写入此文件
+"""
+import os
+import re
+import sys
+import threading
+import time
+from queue import Queue
+
+_DATE = re.compile(r'\$\(date \+%s%N\)')
+_VARIABLE = re.compile(r'\$(\w+)')
+
+
+def _setting(name: str, serial: str, default: float) -> float:
+    values = dict(item.split('=', 1) for item in os.environ.get(name, '').split(',') if '=' in item)
+    return float(values.get(serial, values.get('default', default))) / 1000
+
+
+class FakeDevice:
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.latency = _setting('FAKE_ADB_LATENCY', serial, 20)
+        self.offset_ns = int(_setting('FAKE_ADB_OFFSET', serial, 0) * 1e9)
+        self.input_cost = _setting('FAKE_ADB_INPUT', serial, 80)
+        log = os.environ.get('FAKE_ADB_LOG')
+        self.log = open(log, 'a', buffering=1) if log else None
+        self.variables: dict[str, str] = {}
+        self.output: Queue = Queue()
+        threading.Thread(target=self._write_output, daemon=True).start()
+
+    def now(self) -> str:
+        return str(time.time_ns() + self.offset_ns)
+
+    def _write_output(self):
+        while True:
+            due, line = self.output.get()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+    def run_line(self, line: str) -> None:
+        # 以 & 结尾的命令在后台执行，不阻塞同一行之后的命令
+        for match in re.finditer(r'([^;&]+)([;&]?)', line):
+            command = match.group(1).strip()
+            if not command:
+                continue
+            if match.group(2) == '&':
+                threading.Thread(target=self.run_command, args=(command,), daemon=True).start()
+            else:
+                self.run_command(command)
+
+    def run_command(self, command: str) -> None:
+        command = _DATE.sub(lambda _: self.now(), command)
+        if (match := re.fullmatch(r'(\w+)=(\S*)', command)) is not None:
+            self.variables[match.group(1)] = match.group(2)
+            return
+        command = _VARIABLE.sub(lambda m: self.variables.get(m.group(1), ''), command)
+        args = command.split()
+        if args[0] == 'echo':
+            self.output.put((time.perf_counter() + self.latency, ' '.join(args[1:])))
+        elif args[0] == 'input':
+            time.sleep(self.input_cost)
+            if args[1:2] == ['tap'] and self.log is not None:
+                self.log.write(f'{self.serial} {time.time_ns()} {args[2]} {args[3]}\n')
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 3 or argv[0] != '-s' or argv[2] != 'shell':
+        sys.stderr.write('usage: FakeAdb.py -s <serial> shell\n')
+        return 1
+    device = FakeDevice(argv[1])
+    pending: Queue = Queue()
+
+    def execute():
+        while (item := pending.get()) is not None:
+            due, line = item
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            device.run_line(line)
+
+    worker = threading.Thread(target=execute, daemon=True)
+    worker.start()
+    for line in sys.stdin:
+        # 传输延迟固定，按接收顺序执行即可
+        pending.put((time.perf_counter() + device.latency, line.strip()))
+    pending.put(None)
+    worker.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
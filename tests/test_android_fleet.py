@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from sakura.components.player.AndroidFleet import _Fleet, adb_command
+from sakura.config import conf
+from sakura.config.sakura_logging import configure_logging
+
+FAKE_ADB = os.path.join(os.path.dirname(__file__), 'FakeAdb.py')
+SERIALS = [f'fake{i}' for i in range(8)]
+
+
+@pytest.fixture(autouse=True, scope='module')
+def log_to_tmp(tmp_path_factory):
+    """测量结果写入临时目录的日志，不在工作目录中留下 sap.log"""
+    configure_logging(conf.logging.model_copy(update={'file': str(tmp_path_factory.mktemp('logs') / 'sap.log')}))
+
+
+@pytest.fixture
+def tap_log(tmp_path, monkeypatch):
+    """8 台传输延迟为 5 到 40 毫秒的模拟设备，返回记录点击的文件"""
+    log = tmp_path / 'taps.log'
+    monkeypatch.setenv('FAKE_ADB_LATENCY', ','.join(f'{serial}={5 + 5 * i}' for i, serial in enumerate(SERIALS)))
+    monkeypatch.setenv('FAKE_ADB_LOG', str(log))
+    return log
+
+
+def read_taps(log) -> list[tuple[str, int, str]]:
+    """(设备, 电脑时间纳秒, 坐标)"""
+    if not log.exists():
+        return []
+    return [(serial, int(ns), f'{x} {y}') for serial, ns, x, y in map(str.split, log.read_text().splitlines())]
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_taps_land_together_on_all_devices(tap_log):
+    fleet = _Fleet(adb_command(FAKE_ADB), SERIALS, 3)
+    try:
+        assert fleet.ready.wait(20)
+        assert len(fleet.shells) == len(SERIALS)
+        # 各设备的延迟不同，传输越快的推迟越久
+        assert max(fleet.delays_ns) - min(fleet.delays_ns) > 20_000_000
+        for chord in range(1, 4):
+            assert fleet.press(f'input tap {chord} {chord}', owner=1)
+            assert wait_for(lambda: len(read_taps(tap_log)) >= chord * len(SERIALS))
+    finally:
+        fleet.close()
+    taps = read_taps(tap_log)
+    assert len(taps) == 3 * len(SERIALS)
+    for chord in range(1, 4):
+        times = {serial: ns for serial, ns, position in taps if position == f'{chord} {chord}'}
+        assert sorted(times) == SERIALS
+        assert (max(times.values()) - min(times.values())) / 1e6 < 10
+
+
+def test_presses_before_calibration_are_skipped(tap_log):
+    fleet = _Fleet(adb_command(FAKE_ADB), SERIALS[:2], 3)
+    try:
+        assert not fleet.press('input tap 1 1', owner=1)
+        assert fleet.ready.wait(20)
+        time.sleep(0.2)
+    finally:
+        fleet.close()
+    assert read_taps(tap_log) == []
+
+
+def test_discard_drops_only_the_owner_taps(tap_log):
+    fast, slow = SERIALS[0], SERIALS[-1]
+    fleet = _Fleet(adb_command(FAKE_ADB), [fast, slow], 3)
+    try:
+        assert fleet.ready.wait(20)
+        fleet.press('input tap 1 1', owner=1)
+        fleet.press('input tap 2 2', owner=2)
+        # 传输较快的设备推迟约 35 毫秒，它的点击尚未发出
+        fleet.discard(1)
+        assert wait_for(lambda: any(serial == fast for serial, _, _ in read_taps(tap_log)))
+        time.sleep(0.2)
+    finally:
+        fleet.close()
+    assert [position for serial, _, position in read_taps(tap_log) if serial == fast] == ['2 2']
@@ -0,0 +1,108 @@
+import struct
+
+import pytest
+
+from sakura.db.MidiParser import MidiOptions, parse_midi, read_midi
+
+
+def vlq(value: int) -> bytes:
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | value & 0x7F)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def track(*events: tuple[int, bytes]) -> bytes:
+    """(距上一个事件的 tick 数, 事件内容) 组成的 MTrk 块，末尾自动加上结束事件"""
+    data = b''.join(vlq(delta) + event for delta, event in events) + vlq(0) + b'\xff\x2f\x00'
+    return b'MTrk' + struct.pack('>I', len(data)) + data
+
+
+def smf(*tracks: bytes, division: int = 480, file_format: int = 1) -> bytes:
+    return b'MThd' + struct.pack('>IHHH', 6, file_format, len(tracks), division) + b''.join(tracks)
+
+
+def note_on(pitch: int, channel: int = 0, velocity: int = 100) -> bytes:
+    return bytes([0x90 | channel, pitch, velocity])
+
+
+def tempo(us_per_beat: int) -> bytes:
+    return b'\xff\x51\x03' + us_per_beat.to_bytes(3, 'big')
+
+
+def name(text: str) -> bytes:
+    data = text.encode('utf-8')
+    return b'\xff\x03' + vlq(len(data)) + data
+
+
+PLAIN = MidiOptions(auto_transpose=False)
+
+
+def test_maps_white_keys_and_chords():
+    raw = smf(track((0, name('Scale')), (0, tempo(500_000)),
+                    (0, note_on(60)), (0, note_on(64)), (480, note_on(62)), (480, note_on(84))))
+    title, bpm, times, keys = parse_midi(raw, 'scale.mid', PLAIN)
+    assert (title, bpm) == ('Scale', 120)
+    assert times.tolist() == [0, 0, 500, 1000]
+    assert keys.tolist() == [0, 2, 1, 14]
+
+
+def test_tempo_changes_and_tracks_are_merged():
+    # 第一轨只有速度表：第 1 拍后从 120 BPM 变为 60 BPM
+    conductor = track((0, tempo(500_000)), (480, tempo(1_000_000)))
+    melody = track((0, note_on(60)), (480, note_on(62)), (480, note_on(64)))
+    _, bpm, times, keys = parse_midi(smf(conductor, melody), 'two.mid', PLAIN)
+    assert bpm == 120
+    assert times.tolist() == [0, 500, 1500]
+    assert keys.tolist() == [0, 1, 2]
+
+
+def test_running_status_and_zero_velocity_note_off():
+    events = (0, note_on(60)), (240, bytes([62, 100])), (0, bytes([60, 0])), (240, bytes([64, 100]))
+    _, _, times, keys = parse_midi(smf(track(*events)), 'running.mid', PLAIN)
+    assert times.tolist() == [0, 250, 500]
+    assert keys.tolist() == [0, 1, 2]
+
+
+def test_drums_are_skipped_unless_requested():
+    raw = smf(track((0, note_on(60)), (0, note_on(62, channel=9))))
+    assert parse_midi(raw, 'drums.mid', PLAIN)[3].tolist() == [0]
+    assert parse_midi(raw, 'drums.mid', PLAIN._replace(skip_drums=False))[3].tolist() == [0, 1]
+
+
+@pytest.mark.parametrize('accidentals, expected', [('lower', [0]), ('upper', [1]), ('drop', [])])
+def test_accidentals(accidentals, expected):
+    raw = smf(track((0, note_on(61))))
+    assert parse_midi(raw, 'sharp.mid', PLAIN._replace(accidentals=accidentals))[3].tolist() == expected
+
+
+def test_out_of_range_notes_fold_or_drop():
+    raw = smf(track((0, note_on(48)), (480, note_on(96))))
+    assert parse_midi(raw, 'wide.mid', PLAIN)[3].tolist() == [0, 14]
+    assert parse_midi(raw, 'wide.mid', PLAIN._replace(fold_octaves=False))[3].tolist() == []
+
+
+def test_transpose_and_auto_transpose():
+    # 一个八度以下的 C 大调音阶，自动移调后落在音域内
+    low = [48, 50, 52, 53, 55, 57, 59]
+    raw = smf(track(*((0 if i == 0 else 480, note_on(pitch)) for i, pitch in enumerate(low))))
+    assert parse_midi(raw, 'low.mid', MidiOptions())[3].tolist() == list(range(7))
+    assert parse_midi(raw, 'low.mid', PLAIN._replace(transpose=12))[3].tolist() == list(range(7))
+
+
+def test_quantize_merges_close_notes():
+    raw = smf(track((0, note_on(60)), (7, note_on(62))), division=1000)
+    # 默认 120 BPM 下每 tick 0.5 毫秒，两个音相差 3.5 毫秒
+    assert parse_midi(raw, 'close.mid', PLAIN)[2].tolist() == [0, 0]
+    assert parse_midi(raw, 'close.mid', PLAIN._replace(quantize_ms=1))[2].tolist() == [0, 4]
+
+
+def test_uses_file_name_without_track_name():
+    assert parse_midi(smf(track((0, note_on(60)))), '/songs/untitled.mid', PLAIN)[0] == 'untitled'
+
+
+def test_rejects_other_files():
+    with pytest.raises(ValueError):
+        read_midi(b'RIFF' + bytes(20))
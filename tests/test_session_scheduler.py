@@ -0,0 +1,157 @@
+import math
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from sakura.components.player.SessionScheduler import SessionScheduler, Timeline
+from sakura.interface.Player import Player
+
+KEY_NAMES = [f'key{i}' for i in range(15)]
+
+
+class CountingPlayer(Player):
+    """只统计按键次数"""
+
+    def __init__(self):
+        super().__init__(None)
+        self.presses = 0
+
+    def press(self, key, conf):
+        self.presses += 1
+
+    def cleanup(self):
+        pass
+
+
+def timeline(*times: int) -> Timeline:
+    """每个时间一个单音和弦"""
+    return Timeline(np.array(times), np.zeros(len(times), dtype=int), KEY_NAMES)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = SessionScheduler(press_workers=0, spin_us=200)
+    yield scheduler
+    scheduler.close()
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+def test_timeline_groups_chords():
+    line = Timeline(np.array([0, 0, 50, 80, 80]), np.array([1, 2, 3, 4, 5]), KEY_NAMES)
+    assert line.times == [0, 50, 80]
+    assert line.presses == [(('key1', 1), ('key2', 2)), (('key3', 3),), (('key4', 4), ('key5', 5))]
+    assert line.duration == 80
+    assert len(Timeline(np.array([], dtype=int), np.array([], dtype=int), KEY_NAMES)) == 0
+
+
+def test_play_to_end(scheduler):
+    player = CountingPlayer()
+    finished = threading.Event()
+    session = scheduler.create_session(timeline(0, 20, 40), player, finished.set)
+    session.play()
+    assert finished.wait(2)
+    assert player.presses == 3
+    assert session.is_finished and not session.is_playing
+    assert session.position() == 40
+
+
+def test_pause_and_resume(scheduler):
+    player = CountingPlayer()
+    finished = threading.Event()
+    session = scheduler.create_session(timeline(0, 150, 300), player, finished.set)
+    session.play()
+    assert wait_for(lambda: player.presses == 1)
+    session.pause()
+    position = session.position()
+    time.sleep(0.4)
+    assert player.presses == 1
+    assert session.position() == position
+    session.resume()
+    assert finished.wait(2)
+    assert player.presses == 3
+
+
+def test_seek_skips_earlier_chords(scheduler):
+    player = CountingPlayer()
+    finished = threading.Event()
+    session = scheduler.create_session(timeline(0, 100, 200, 300), player, finished.set)
+    session.pause()
+    session.seek(150)
+    assert session.position() == 150
+    session.play(150)
+    assert finished.wait(2)
+    assert player.presses == 2
+
+
+def test_rate(scheduler):
+    player = CountingPlayer()
+    finished = threading.Event()
+    session = scheduler.create_session(timeline(0, 400), player, finished.set, rate=4.0)
+    start = time.perf_counter()
+    session.play()
+    assert finished.wait(2)
+    assert time.perf_counter() - start < 0.3
+    assert player.presses == 2
+
+
+@pytest.mark.parametrize('rate', [0, -1, math.nan, math.inf])
+def test_invalid_rate(scheduler, rate):
+    session = scheduler.create_session(timeline(0), CountingPlayer())
+    with pytest.raises(ValueError):
+        session.set_rate(rate)
+    assert session.rate == 1.0
+
+
+def test_close_stops_session(scheduler):
+    player = CountingPlayer()
+    called = threading.Event()
+    session = scheduler.create_session(timeline(0, 100, 200), player, called.set)
+    session.play()
+    assert wait_for(lambda: player.presses == 1)
+    session.close()
+    time.sleep(0.3)
+    assert player.presses == 1
+    assert not called.is_set()
+
+
+def test_sessions_are_independent(scheduler):
+    line = timeline(0, 50, 100)
+    players = [CountingPlayer() for _ in range(20)]
+    sessions = [scheduler.create_session(line, player) for player in players]
+    for session in sessions:
+        session.play()
+    sessions[0].pause()
+    assert wait_for(lambda: all(player.presses == 3 for player in players[1:]))
+    assert players[0].presses < 3
+
+
+@pytest.mark.parametrize('change', ['pause', 'rate'])
+def test_change_during_spin_keeps_chord(change):
+    # 忙等覆盖整个和弦间隔，暂停或改变速度一定发生在忙等期间
+    scheduler = SessionScheduler(press_workers=0, spin_us=500_000)
+    try:
+        player = CountingPlayer()
+        finished = threading.Event()
+        session = scheduler.create_session(timeline(0, 300, 600), player, finished.set)
+        session.play()
+        assert wait_for(lambda: player.presses == 1)
+        time.sleep(0.1)
+        if change == 'pause':
+            session.pause()
+            session.resume()
+        else:
+            session.set_rate(1.5)
+        assert finished.wait(2)
+        assert player.presses == 3
+    finally:
+        scheduler.close()
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from sakura.components.player.SharedRing import Command, SharedRing, Status
+
+
+@pytest.fixture
+def rings():
+    """同一块共享内存的写入方（界面进程）和读取方（调度进程）"""
+    writer = SharedRing(capacity=4, create=True)
+    reader = SharedRing(writer.name)
+    yield writer, reader
+    reader.close()
+    writer.close(unlink=True)
+
+
+def test_commands_round_trip_in_order(rings):
+    writer, reader = rings
+    assert reader.get() is None
+    commands = [Command(1, 2, -3, 4, 0.5, 'song'), Command(2), Command(3, text='中文歌名')]
+    for command in commands:
+        writer.put(command)
+    assert [reader.get() for _ in commands] == commands
+    assert reader.get() is None
+
+
+def test_ring_wraps_around(rings):
+    writer, reader = rings
+    for i in range(writer.capacity * 3):
+        writer.put(Command(1, i))
+        assert reader.get() == Command(1, i)
+
+
+def test_put_times_out_when_full(rings):
+    writer, reader = rings
+    for i in range(writer.capacity):
+        writer.put(Command(1, i))
+    with pytest.raises(TimeoutError):
+        writer.put(Command(1), timeout=0.05)
+    assert reader.get() == Command(1, 0)
+    writer.put(Command(1, 99), timeout=0.05)
+
+
+def test_put_waits_for_the_reader(rings):
+    writer, reader = rings
+    for i in range(writer.capacity):
+        writer.put(Command(1, i))
+    drained = []
+    timer = threading.Timer(0.05, lambda: drained.append(reader.get()))
+    timer.start()
+    writer.put(Command(1, 99), timeout=1)
+    timer.join()
+    assert drained == [Command(1, 0)]
+
+
+def test_text_longer_than_32_bytes_is_rejected(rings):
+    writer, _ = rings
+    with pytest.raises(ValueError):
+        writer.put(Command(1, text='x' * 33))
+
+
+def test_status_is_published_to_the_other_side(rings):
+    writer, reader = rings
+    assert writer.read_status() == Status(0, False, 0, 0, 0)
+    reader.publish(Status(1234, True, 1, 42, 2))
+    assert writer.read_status() == Status(1234, True, 1, 42, 2)
+    reader.publish(Status(-5, False, 2, 43))
+    assert writer.read_status() == Status(-5, False, 2, 43, 0)
+
+
+def test_read_status_times_out_while_a_write_is_in_progress(rings):
+    writer, reader = rings
+    # 写入方在两次写入序号之间退出，序号停留在奇数
+    reader._buf[0] = 1
+    with pytest.raises(TimeoutError):
+        writer.read_status(timeout=0.02)
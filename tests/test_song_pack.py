@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from sakura.db.SheetParser import parse_sheet
+from sakura.db.SongPack import SongPack, build_pack
+from sakura.db.SongStats import DENSITY_BINS
+
+
+def sheet(name: str, author: str = '', notes: list[tuple[int, int]] = ((0, 0), (500, 1))) -> bytes:
+    return json.dumps({'name': name, 'author': author, 'bpm': 240,
+                       'songNotes': [{'time': t, 'key': f'1Key{k}'} for t, k in notes]}).encode('utf-8')
+
+
+@pytest.fixture
+def pack(tmp_path):
+    rows = [
+        parse_sheet(sheet('Moonlight Sonata', 'Beethoven', [(0, 0), (0, 4), (250, 2), (1000, 7)])),
+        parse_sheet(sheet('Canon', 'Pachelbel', [(0, 1), (300, 3)])),
+        parse_sheet(sheet('Clair de Lune', 'Debussy', [(0, 2), (400, 5)])),
+        parse_sheet(sheet('Song for the Moon', 'Anonymous', [(0, 3), (200, 6)])),
+        parse_sheet(sheet('Waltz', 'Chopin', [(0, 8), (150, 9)])),
+        parse_sheet(sheet('Chopsticks', 'Anonymous', [(0, 8), (150, 10)])),
+        # 音符与 Canon 相同，只保留一首
+        parse_sheet(sheet('Canon copy', 'Someone', [(0, 1), (300, 3)])),
+    ]
+    rows += [parse_sheet(sheet(f'Etude {i:02d}', 'Chopin', [(0, i % 15), (100 + i, 14)])) for i in range(30)]
+    path = str(tmp_path / 'songs.sakurapack')
+    assert build_pack(path, rows) == 36
+    with SongPack(path) as pack:
+        yield pack
+
+
+def test_lists_all_songs_sorted_by_name(pack):
+    names = [song.name for song in pack.select_by_name('', limit=-1)]
+    assert len(pack) == pack.count_by_name('') == len(names) == 36
+    assert names == sorted(names, key=str.casefold)
+    assert 'Canon copy' not in names
+
+
+def test_search_matches_every_keyword_case_insensitively(pack):
+    assert [song.name for song in pack.select_by_name('MOON')] == ['Moonlight Sonata', 'Song for the Moon']
+    assert [song.name for song in pack.select_by_name('moon beethoven')] == ['Moonlight Sonata']
+    assert pack.count_by_name('debussy') == 1
+    assert pack.select_by_name('nothing like this') == []
+
+
+def test_name_matches_come_before_author_matches(pack):
+    names = [song.name for song in pack.select_by_name('chop')]
+    # 只有 Chopsticks 的歌名包含关键字，其余是作者 Chopin 的歌曲，按歌名排序
+    assert names[0] == 'Chopsticks'
+    assert names[1:] == [f'Etude {i:02d}' for i in range(30)] + ['Waltz']
+
+
+def test_paging_covers_every_result_once(pack):
+    total = pack.count_by_name('etude')
+    pages = [pack.select_by_name('etude', limit=7, offset=offset) for offset in range(0, total, 7)]
+    names = [song.name for page in pages for song in page]
+    assert total == 30
+    assert names == [f'Etude {i:02d}' for i in range(30)]
+    assert pack.select_by_name('etude', limit=7, offset=total) == []
+
+
+def test_select_by_id_restores_notes_and_stats(pack):
+    song = pack.select_by_name('moonlight')[0]
+    loaded = pack.select_by_id(song.id)
+    assert loaded.name == 'Moonlight Sonata'
+    assert loaded.author == 'Beethoven'
+    assert loaded.bpm == 240
+    assert loaded.songNotes == [{'time': 0, 'key': '1Key0'}, {'time': 0, 'key': '1Key4'},
+                                {'time': 250, 'key': '1Key2'}, {'time': 1000, 'key': '1Key7'}]
+    assert (loaded.duration, loaded.noteCount, loaded.chordCount, loaded.maxChord) == (1000, 4, 3, 2)
+    assert loaded.minChordGap == 250
+    assert loaded.keyHistogram[0] == loaded.keyHistogram[4] == 1
+
+
+def test_density_counts_every_note(pack):
+    loaded = pack.select_by_id(pack.select_by_name('moonlight')[0].id)
+    assert len(loaded.density) == DENSITY_BINS
+    assert sum(loaded.density) == 4
+    assert loaded.density[0] == 2
+    assert loaded.density[-1] == 1
+
+
+def test_unknown_id_raises(pack):
+    with pytest.raises(ValueError):
+        pack.select_by_id(len(pack) + 1)
+    with pytest.raises(ValueError):
+        pack.select_by_id(0)
+
+
+def test_rejects_files_that_are_not_packs(tmp_path):
+    path = tmp_path / 'bad.sakurapack'
+    path.write_bytes(b'not a pack' * 10)
+    with pytest.raises(ValueError):
+        SongPack(str(path))
+
+
+def test_truncated_notes_raise_value_error(tmp_path):
+    path = str(tmp_path / 'short.sakurapack')
+    build_pack(path, [parse_sheet(sheet('A')), parse_sheet(sheet('B', notes=[(0, 1), (200, 2)]))])
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 4)
+    with SongPack(path) as pack:
+        assert pack.select_by_id(1).name == 'A'
+        with pytest.raises(ValueError):
+            pack.select_by_id(2)